@@ -10,6 +10,10 @@ import os
 import re
 from pathlib import Path
 
+# Marpスライドのパーサーは親リポジトリの scripts/marp_parser.py を共有する
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+from marp_parser import load_deck
+
 
 def parse_slides(slide_file):
     """
@@ -21,22 +25,9 @@ def parse_slides(slide_file):
     Returns:
         (header, slides) のタプル
     """
-    with open(slide_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # ヘッダー部分を抽出
-    parts = content.split('---\n')
-
-    # 最初の2つはヘッダー
-    header = '---\n' + parts[1] + '---\n'
-
-    # 残りはスライド
-    slides = []
-    for i in range(2, len(parts)):
-        if parts[i].strip():
-            slides.append(parts[i].strip())
-
-    return header, slides
+    deck = load_deck(slide_file)
+    header = '---\n' + deck.front_matter + '---\n' if deck.front_matter is not None else ''
+    return header, [slide.body for slide in deck.slides]
 
 
 def embed_images_in_slides(slide_file, image_dir, topic_name, output_file, use_server_url=False):
@@ -11,6 +11,10 @@ import re
 from pathlib import Path
 from google import genai
 
+# Marpスライドのパーサーは親リポジトリの scripts/marp_parser.py を共有する
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "scripts"))
+from marp_parser import load_deck
+
 
 def parse_slides(slide_file):
     """
@@ -22,27 +26,7 @@ def parse_slides(slide_file):
     Returns:
         ページごとの内容のリスト
     """
-    with open(slide_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # ヘッダー部分を除去
-    parts = content.split('---\n')
-
-    # 最初の2つはヘッダーなので除外
-    slides = []
-    current_slide = []
-
-    for i, part in enumerate(parts):
-        if i == 0:  # 最初の空の部分
-            continue
-        if i == 1:  # Marpヘッダー
-            continue
-
-        # 空でない部分はスライドとして追加
-        if part.strip():
-            slides.append(part.strip())
-
-    return slides
+    return [slide.body for slide in load_deck(slide_file).slides]
 
 
 def generate_image_prompt(slide_content, slide_number, api_key):
@@ -1,8 +1,11 @@
 import { Composition } from "remotion";
 import { Video } from "./Video";
 
-// タイミングデータをインポート
-// ビルド時にこのファイルが存在することを前提としています
+// タイミングデータとスライド画像のメタデータをインポート
+// これはRemotion Studio・npm run build 用の既定値で、バンドルした時点のファイルの内容が埋め込まれます
+// バンドル済みのプロジェクトでレンダリングする場合は、--props で渡した値（create_video.py が
+// timings.json と slides_metadata.json から作る render_props.json）が優先されるため、
+// 同じバンドルを別のデッキでも使い回せます
 let timingsData: any;
 try {
   timingsData = require("../timings.json");
@@ -15,8 +18,15 @@ try {
   };
 }
 
+let slidesMetadata: any;
+try {
+  slidesMetadata = require("../slides_metadata.json");
+} catch (error) {
+  slidesMetadata = { total_slides: 0, slides: [] };
+}
+
 export const RemotionRoot = () => {
-  const { fps, totalFrames, slides } = timingsData;
+  const { fps, totalFrames, slides, frameIndex, narrationFile } = timingsData;
 
   return (
     <>
@@ -31,7 +41,15 @@ export const RemotionRoot = () => {
           slides: slides || [],
           fps: fps || 30,
           totalFrames: totalFrames || 150,
+          frameIndex,
+          narrationFile,
+          slidesMetadata,
         }}
+        // 長さとfpsは渡されたタイミングデータから決める
+        calculateMetadata={({ props }) => ({
+          durationInFrames: props.totalFrames || 150,
+          fps: props.fps || 30,
+        })}
       />
     </>
   );
@@ -19,14 +19,6 @@ const talkImages = [
   staticFile("talk6.png"),
 ];
 
-// スライド画像のメタデータをインポート
-let slidesMetadata: any;
-try {
-  slidesMetadata = require("../slides_metadata.json");
-} catch (error) {
-  slidesMetadata = { total_slides: 0, slides: [] };
-}
-
 interface Subtitle {
   text: string;
   start: number;
@@ -47,27 +39,84 @@ interface SlideData {
   endFrame: number;
   subtitles: Subtitle[];
   fullScript: string;
+  audioStart?: number;
+}
+
+// フレーム番号 -> 表示中のスライド・字幕のランレングス索引（generate_timings.pyが生成）
+// starts[i]から次の区間の直前まで、slides[i]番目のスライドとそのsubtitles[i]番目の字幕を表示（-1は表示なし）
+interface FrameIndex {
+  starts: number[];
+  slides: number[];
+  subtitles: number[];
+}
+
+// スライド画像のメタデータ（prepare_slides_for_video.pyが生成するslides_metadata.json）
+interface SlidesMetadata {
+  total_slides: number;
+  slides: { index: number; filename: string }[];
 }
 
 interface VideoProps {
   slides: SlideData[];
   fps: number;
   totalFrames: number;
+  frameIndex?: FrameIndex;
+  narrationFile?: string;
+  slidesMetadata?: SlidesMetadata;
 }
 
-export const Video: React.FC<VideoProps> = ({ slides, fps, totalFrames }) => {
+// スライド番号に対応する画像のパス（メタデータにない場合は slide_XX.png）
+const slideImagePath = (index: number, slidesMetadata?: SlidesMetadata): string => {
+  const entry = slidesMetadata?.slides.find((slide) => slide.index === index);
+  return `slides/${entry ? entry.filename : `slide_${String(index).padStart(2, '0')}.png`}`;
+};
+
+// 現在のスライドと字幕を取得する
+// 索引がある場合は二分探索、古いタイミングファイルの場合は先頭から探す
+const lookupFrame = (
+  slides: SlideData[],
+  frame: number,
+  frameIndex?: FrameIndex
+): [SlideData | undefined, Subtitle | undefined] => {
+  if (!frameIndex) {
+    const slide = slides.find(
+      (s) => frame >= s.startFrame && frame < s.endFrame
+    );
+    const subtitle = slide?.subtitles.find(
+      (s) => frame >= s.startFrame && frame < s.endFrame
+    );
+    return [slide, subtitle];
+  }
+
+  // frame以下で最大のstartsを探す
+  const { starts } = frameIndex;
+  let lo = 0;
+  let hi = starts.length - 1;
+  let run = -1;
+  while (lo <= hi) {
+    const mid = (lo + hi) >> 1;
+    if (starts[mid] <= frame) {
+      run = mid;
+      lo = mid + 1;
+    } else {
+      hi = mid - 1;
+    }
+  }
+
+  if (run < 0 || frameIndex.slides[run] < 0) {
+    return [undefined, undefined];
+  }
+  const slide = slides[frameIndex.slides[run]];
+  const subtitlePosition = frameIndex.subtitles[run];
+  return [slide, subtitlePosition >= 0 ? slide.subtitles[subtitlePosition] : undefined];
+};
+
+export const Video: React.FC<VideoProps> = ({ slides, fps, totalFrames, frameIndex, narrationFile, slidesMetadata }) => {
   const frame = useCurrentFrame();
   const { width, height } = useVideoConfig();
 
-  // 現在のスライドを見つける
-  const currentSlide = slides.find(
-    (slide) => frame >= slide.startFrame && frame < slide.endFrame
-  );
-
-  // 現在の字幕を見つける（セグメント方式）
-  const currentSubtitle = currentSlide?.subtitles.find(
-    (subtitle) => frame >= subtitle.startFrame && frame < subtitle.endFrame
-  );
+  // 現在のスライドと字幕（セグメント方式）を見つける
+  const [currentSlide, currentSubtitle] = lookupFrame(slides, frame, frameIndex);
 
   // 音声が再生中かどうかを判定（字幕が表示されている時のみ話している）
   const isTalking = currentSubtitle !== undefined;
@@ -81,7 +130,7 @@ export const Video: React.FC<VideoProps> = ({ slides, fps, totalFrames }) => {
 
   // 現在のスライド画像を取得
   const currentSlideImage = currentSlide
-    ? staticFile(`slides/slide_${String(currentSlide.index).padStart(2, '0')}.png`)
+    ? staticFile(slideImagePath(currentSlide.index, slidesMetadata))
     : null;
 
   // スライドアニメーション用の計算
@@ -181,16 +230,20 @@ export const Video: React.FC<VideoProps> = ({ slides, fps, totalFrames }) => {
         </div>
       )}
 
-      {/* 音声 */}
-      {slides.map((slide) => (
-        <Sequence
-          key={slide.index}
-          from={slide.startFrame}
-          durationInFrames={slide.durationFrames}
-        >
-          <Audio src={staticFile(slide.audioFile)} />
-        </Sequence>
-      ))}
+      {/* 音声（全スライドを連結したナレーションがある場合は1つだけ再生する） */}
+      {narrationFile ? (
+        <Audio src={staticFile(narrationFile)} />
+      ) : (
+        slides.map((slide) => (
+          <Sequence
+            key={slide.index}
+            from={slide.startFrame}
+            durationInFrames={slide.durationFrames}
+          >
+            <Audio src={staticFile(slide.audioFile)} />
+          </Sequence>
+        ))
+      )}
     </div>
   );
 };
@@ -0,0 +1,792 @@
+#!/usr/bin/env python3
+"""
+音声ファイルの解析ユーティリティ
+音声全体をデコードせずに、MP3のフレームヘッダーやWAVのチャンクから長さを取得します
+また、PCMサンプルをNumPy配列として読み込み、無音区間の検出や速度変更・エンコードを行います
+"""
+
+import io
+import os
+import struct
+import subprocess
+import wave
+import numpy as np
+
+# ヘッダー解析のために読み込むファイル先頭のバイト数（ID3v2タグ込み）
+PROBE_HEAD_SIZE = 256 * 1024
+
+# MPEGバージョン（ヘッダーの2ビット値 -> 名前）
+MPEG_VERSIONS = {0: '2.5', 2: '2', 3: '1'}
+
+# ビットレート表（kbps）: (バージョン系列, レイヤー) -> インデックス順の値
+BITRATES = {
+    ('1', 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    ('1', 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    ('1', 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    ('2', 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    ('2', 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    ('2', 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+# サンプリングレート表（Hz）
+SAMPLE_RATES = {
+    '1': [44100, 48000, 32000],
+    '2': [22050, 24000, 16000],
+    '2.5': [11025, 12000, 8000],
+}
+
+
+def parse_mp3_frame_header(header):
+    """
+    MP3フレームヘッダー（4バイト）を解析
+
+    Args:
+        header: 4バイトのヘッダー
+
+    Returns:
+        フレーム情報の辞書、不正なヘッダーの場合はNone
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version = MPEG_VERSIONS.get((header[1] >> 3) & 0x03)
+    layer = 4 - ((header[1] >> 1) & 0x03)
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0x03
+
+    if version is None or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    family = '1' if version == '1' else '2'
+    bitrate = BITRATES[(family, layer)][bitrate_index] * 1000
+    sample_rate = SAMPLE_RATES[version][sample_rate_index]
+    padding = (header[2] >> 1) & 0x01
+    mono = (header[3] >> 6) == 3
+
+    if layer == 1:
+        samples_per_frame = 384
+        frame_length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or version == '1':
+        samples_per_frame = 1152
+        frame_length = 144 * bitrate // sample_rate + padding
+    else:
+        samples_per_frame = 576
+        frame_length = 72 * bitrate // sample_rate + padding
+
+    # Xing/Infoタグはサイド情報の直後に置かれる
+    if version == '1':
+        side_info = 17 if mono else 32
+    else:
+        side_info = 9 if mono else 17
+
+    return {
+        'version': version,
+        'layer': layer,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'samples_per_frame': samples_per_frame,
+        'frame_length': frame_length,
+        'xing_offset': 4 + side_info,
+    }
+
+
+def _skip_id3v2(data):
+    """ID3v2タグのサイズを返す（タグがない場合は0）"""
+    if len(data) >= 10 and data[:3] == b'ID3':
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def _find_first_frame(data, offset):
+    """offset以降で、次のフレームヘッダーとも整合する最初のフレーム位置を探す"""
+    end = len(data) - 4
+    pos = data.find(b'\xff', offset)
+    while 0 <= pos < end:
+        info = parse_mp3_frame_header(data[pos:pos + 4])
+        if info:
+            next_pos = pos + info['frame_length']
+            if next_pos + 4 > len(data) or parse_mp3_frame_header(data[next_pos:next_pos + 4]):
+                return pos, info
+        pos = data.find(b'\xff', pos + 1)
+    return None, None
+
+
+def _read_vbr_header(data, pos, info):
+    """
+    先頭フレームのXing/Info（LAMEタグ含む）またはVBRIヘッダーを読む
+
+    Returns:
+        (フレーム数, エンコーダー遅延+パディングのサンプル数)、ヘッダーがない場合はNone
+    """
+    xing = pos + info['xing_offset']
+    tag = data[xing:xing + 4]
+    if tag in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', data[xing + 4:xing + 8])[0]
+        if not flags & 0x01:
+            return None
+        frames = struct.unpack('>I', data[xing + 8:xing + 12])[0]
+
+        # LAMEタグ（Xingデータの後ろ）からエンコーダー遅延とパディングを取得
+        lame = xing + 8
+        for flag, size in ((0x01, 4), (0x02, 4), (0x04, 100), (0x08, 4)):
+            if flags & flag:
+                lame += size
+        trim = 0
+        if data[lame:lame + 4] in (b'LAME', b'Lavf', b'Lavc', b'L3.9'):
+            b = data[lame + 21:lame + 24]
+            if len(b) == 3:
+                delay = (b[0] << 4) | (b[1] >> 4)
+                padding = ((b[1] & 0x0F) << 8) | b[2]
+                trim = delay + padding
+        return frames, trim
+
+    vbri = pos + 36
+    if data[vbri:vbri + 4] == b'VBRI':
+        frames = struct.unpack('>I', data[vbri + 14:vbri + 18])[0]
+        return frames, 0
+
+    return None
+
+
+def _scan_mp3_frames(data, pos):
+    """フレームヘッダーを順に辿ってフレーム数を数える（デコードはしない）"""
+    frames = 0
+    end = len(data)
+    while pos + 4 <= end:
+        info = parse_mp3_frame_header(data[pos:pos + 4])
+        if info is None:
+            # ID3v1/APEタグに到達したら終了、それ以外は再同期
+            if data[pos:pos + 3] == b'TAG' or data[pos:pos + 8] == b'APETAGEX':
+                break
+            pos, info = _find_first_frame(data, pos + 1)
+            if pos is None:
+                break
+        frames += 1
+        pos += info['frame_length']
+    return frames
+
+
+def probe_mp3_duration(data, read_rest=None):
+    """
+    MP3データの長さをフレームヘッダーから計算
+
+    Args:
+        data: MP3ファイルのバイト列（先頭部分のみでも可）
+        read_rest: フレーム走査が必要になった場合に残りのバイト列を返す関数
+
+    Returns:
+        音声の長さ（秒）、MP3として解析できない場合はNone
+    """
+    pos, info = _find_first_frame(data, _skip_id3v2(data))
+    if pos is None:
+        return None
+
+    sample_rate = info['sample_rate']
+    samples_per_frame = info['samples_per_frame']
+
+    vbr = _read_vbr_header(data, pos, info)
+    if vbr:
+        frames, trim = vbr
+    else:
+        # VBRヘッダーがない場合はフレームを走査
+        if read_rest:
+            data += read_rest()
+        frames = _scan_mp3_frames(data, pos)
+        trim = 0
+
+    samples = max(frames * samples_per_frame - trim, 0)
+    return samples / sample_rate
+
+
+def probe_wav_duration(data, file_size=None):
+    """
+    WAV（RIFF/PCM）データの長さをチャンクヘッダーから計算
+
+    Args:
+        data: WAVファイルのバイト列（先頭部分のみでも可）
+        file_size: ファイル全体のサイズ（dataが先頭部分のみの場合に指定）
+
+    Returns:
+        音声の長さ（秒）、WAVとして解析できない場合はNone
+    """
+    if len(data) < 12 or data[:4] != b'RIFF' or data[8:12] != b'WAVE':
+        return None
+
+    byte_rate = None
+    pos = 12
+    while pos + 8 <= len(data):
+        chunk_id = data[pos:pos + 4]
+        chunk_size = struct.unpack('<I', data[pos + 4:pos + 8])[0]
+        body = pos + 8
+
+        if chunk_id == b'fmt ':
+            byte_rate = struct.unpack('<I', data[body + 8:body + 12])[0]
+        elif chunk_id == b'data':
+            if not byte_rate:
+                return None
+            # ストリーミング出力ではサイズが未設定（0xFFFFFFFF）のことがある
+            available = (file_size or len(data)) - body
+            if chunk_size == 0xFFFFFFFF or chunk_size > available:
+                chunk_size = available
+            return chunk_size / byte_rate
+
+        pos = body + chunk_size + (chunk_size & 1)
+
+    return None
+
+
+def probe_flac_duration(data):
+    """
+    FLACデータの長さをSTREAMINFOブロックから計算
+
+    Args:
+        data: FLACファイルのバイト列（先頭部分のみでも可）
+
+    Returns:
+        音声の長さ（秒）、FLACとして解析できない場合や総サンプル数が未設定の場合はNone
+    """
+    # "fLaC" の直後の最初のメタデータブロックは必ずSTREAMINFO
+    if len(data) < 26 or data[:4] != b'fLaC' or (data[4] & 0x7F) != 0:
+        return None
+
+    # サンプリングレート(20bit)・チャンネル数(3bit)・ビット数(5bit)・総サンプル数(36bit)
+    packed = int.from_bytes(data[18:26], 'big')
+    sample_rate = packed >> 44
+    total_samples = packed & ((1 << 36) - 1)
+    if not sample_rate or not total_samples:
+        return None
+    return total_samples / sample_rate
+
+
+def probe_duration(audio_file):
+    """
+    音声ファイルの長さをヘッダーのみから取得（デコードなし）
+
+    Args:
+        audio_file: 音声ファイルのパス
+
+    Returns:
+        音声の長さ（秒）、対応していない形式の場合はNone
+    """
+    with open(audio_file, 'rb') as f:
+        # ヘッダー解析には先頭部分だけで足りる
+        head = f.read(PROBE_HEAD_SIZE)
+
+        if head[:4] == b'RIFF':
+            return probe_wav_duration(head, os.fstat(f.fileno()).st_size)
+
+        if head[:4] == b'fLaC':
+            return probe_flac_duration(head)
+
+        return probe_mp3_duration(head, f.read)
+
+
+def load_pcm(audio_file):
+    """
+    音声ファイルをモノラルのPCMサンプル配列として読み込む（1回だけデコード）
+
+    Args:
+        audio_file: 音声ファイルのパス
+
+    Returns:
+        (サンプル配列（float32、-1.0〜1.0）, サンプリングレート)
+    """
+    with open(audio_file, 'rb') as f:
+        is_wav = f.read(4) == b'RIFF'
+
+    if is_wav:
+        try:
+            with wave.open(str(audio_file), 'rb') as w:
+                return pcm_to_float(w.readframes(w.getnframes()), w.getsampwidth(), w.getnchannels()), w.getframerate()
+        except wave.Error:
+            pass  # 浮動小数点WAVなどはpydubに任せる
+
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(audio_file)
+    return pcm_to_float(audio.raw_data, audio.sample_width, audio.channels), audio.frame_rate
+
+
+def pcm_to_float(raw_data, sample_width, channels):
+    """
+    インターリーブされた整数PCMバイト列をモノラルのfloat32配列に変換
+
+    Args:
+        raw_data: PCMバイト列
+        sample_width: 1サンプルのバイト数
+        channels: チャンネル数
+
+    Returns:
+        サンプル配列（float32、-1.0〜1.0）
+    """
+    if sample_width == 1:
+        samples = np.frombuffer(raw_data, dtype=np.uint8).astype(np.float32) - 128.0
+    elif sample_width == 2:
+        samples = np.frombuffer(raw_data, dtype='<i2').astype(np.float32)
+    elif sample_width == 4:
+        samples = np.frombuffer(raw_data, dtype='<i4').astype(np.float32)
+    else:
+        raise ValueError(f"対応していないサンプル幅です: {sample_width}")
+
+    samples /= float(2 ** (8 * sample_width - 1))
+
+    if channels > 1:
+        samples = samples[:len(samples) - len(samples) % channels].reshape(-1, channels).mean(axis=1)
+
+    return samples
+
+
+def float_to_pcm16(samples):
+    """
+    float32のサンプル配列を16bit PCMのバイト列に変換
+
+    Args:
+        samples: サンプル配列（-1.0〜1.0、範囲外はクリップ）
+
+    Returns:
+        リトルエンディアンの16bit PCMバイト列
+    """
+    return (np.clip(samples, -1.0, 1.0) * 32767.0).round().astype('<i2').tobytes()
+
+
+def _run_ffmpeg(args, input_data):
+    """
+    ffmpegにパイプでデータを渡して実行し、標準出力を返す（一時ファイルを使わない）
+
+    Args:
+        args: 入出力の指定を含むffmpegの引数
+        input_data: 標準入力に渡すバイト列
+
+    Returns:
+        標準出力のバイト列
+    """
+    result = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-y', *args],
+        input=input_data, capture_output=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpegの実行に失敗しました: {result.stderr.decode('utf-8', 'replace')[:200]}")
+    return result.stdout
+
+
+def decode_audio_bytes(data):
+    """
+    メモリ上の音声データ（WAV/MP3）をモノラルのPCMサンプル配列にデコード
+    MP3はffmpegにパイプで渡してデコードする
+
+    Args:
+        data: 音声ファイルの内容
+
+    Returns:
+        (サンプル配列（float32、-1.0〜1.0）, サンプリングレート)
+    """
+    if data[:4] == b'RIFF':
+        with wave.open(io.BytesIO(data), 'rb') as w:
+            return pcm_to_float(w.readframes(w.getnframes()), w.getsampwidth(), w.getnchannels()), w.getframerate()
+
+    # サンプリングレートはフレームヘッダーから取得し、そのままのレートでデコードする
+    _, info = _find_first_frame(data, _skip_id3v2(data))
+    if info is None:
+        raise ValueError("MP3フレームが見つかりません")
+
+    sample_rate = info['sample_rate']
+    raw_data = _run_ffmpeg(['-f', 'mp3', '-i', 'pipe:0', '-f', 's16le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1'], data)
+    return pcm_to_float(raw_data, 2, 1), sample_rate
+
+
+def encode_audio(samples, sample_rate, output_file):
+    """
+    サンプル配列を出力ファイルの拡張子の形式（.wav/.flac/.mp3）で1回だけエンコードして保存
+
+    Args:
+        samples: サンプル配列（float32、-1.0〜1.0）
+        sample_rate: サンプリングレート
+        output_file: 出力ファイルパス
+    """
+    suffix = os.path.splitext(str(output_file))[1].lower()
+
+    if suffix == '.wav':
+        with open(output_file, 'wb') as f:
+            f.write(wav_bytes(samples, sample_rate))
+        return
+
+    if suffix not in ('.mp3', '.flac'):
+        raise ValueError(f"対応していない出力形式です: {output_file}")
+
+    pcm_data = float_to_pcm16(samples)
+    _run_ffmpeg(['-f', 's16le', '-ar', str(sample_rate), '-ac', '1', '-i', 'pipe:0', str(output_file)], pcm_data)
+
+
+def wav_bytes(samples, sample_rate):
+    """
+    サンプル配列を16bitモノラルWAVのバイト列にする
+
+    Args:
+        samples: サンプル配列（float32、-1.0〜1.0）
+        sample_rate: サンプリングレート
+
+    Returns:
+        WAVファイルの内容
+    """
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(float_to_pcm16(samples))
+    return buffer.getvalue()
+
+
+def concatenate_segments(chunks, gap_duration):
+    """
+    セグメントごとの音声を無音を挟んで連結し、各セグメントの位置を返す
+    サンプリングレートが異なるセグメントは最初のセグメントのレートに合わせる
+
+    Args:
+        chunks: (サンプル配列, サンプリングレート) のリスト
+        gap_duration: セグメント間の無音（秒）
+
+    Returns:
+        (連結したサンプル配列, サンプリングレート, [(開始秒, 終了秒), ...])
+    """
+    sample_rate = chunks[0][1]
+    gap = np.zeros(int(round(gap_duration * sample_rate)), np.float32)
+
+    parts = []
+    offsets = []
+    position = 0
+    for i, (samples, chunk_rate) in enumerate(chunks):
+        if chunk_rate != sample_rate:
+            samples = resample_speed(samples, chunk_rate / sample_rate)
+        if i:
+            parts.append(gap)
+            position += len(gap)
+        parts.append(np.asarray(samples, dtype=np.float32))
+        offsets.append((position / sample_rate, (position + len(samples)) / sample_rate))
+        position += len(samples)
+
+    return np.concatenate(parts), sample_rate, offsets
+
+
+def resample_speed(samples, speed_factor):
+    """
+    再生速度を変える（ピッチも同じ倍率で変わる）
+    speed_factor倍のレートで再生した音声を元のレートで再サンプリングするのと同じ
+
+    Args:
+        samples: サンプル配列
+        speed_factor: 速度の倍率（1.2 = 1.2倍速）
+
+    Returns:
+        速度を変えたサンプル配列（長さは約 1/speed_factor）
+    """
+    if speed_factor == 1.0 or len(samples) < 2:
+        return samples
+
+    positions = np.arange(int((len(samples) - 1) / speed_factor) + 1) * speed_factor
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def _periodic_hann(size):
+    """オーバーラップ加算で和が一定になる周期的ハン窓"""
+    return (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(size) / size)).astype(np.float32)
+
+
+def wsola(samples, speed_factor, sample_rate, frame_duration=0.04, tolerance_duration=0.005):
+    """
+    WSOLA（波形類似度に基づくオーバーラップ加算）でピッチを変えずに再生速度を変える
+    各フレームの切り出し位置を、前のフレームの自然な続きと最も相関が高い位置に合わせる
+    位置の探索は前のフレームに依存するためフレーム単位のループだが、相関計算はNumPyで一括して行う
+
+    Args:
+        samples: サンプル配列（float32）
+        speed_factor: 速度の倍率（1.2 = 1.2倍速）
+        sample_rate: サンプリングレート
+        frame_duration: フレーム長（秒）、フレームは50%ずつ重ねる
+        tolerance_duration: 切り出し位置の探索範囲（±秒）
+
+    Returns:
+        速度を変えたサンプル配列（長さは約 1/speed_factor）
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    frame = max(int(sample_rate * frame_duration) // 2 * 2, 4)
+    hop = frame // 2
+    tolerance = max(int(sample_rate * tolerance_duration), 1)
+    output_length = int(round(len(samples) / speed_factor))
+    frame_count = output_length // hop + 2
+
+    # 先頭・末尾のフレームも探索範囲を確保できるように無音を足す
+    pad = frame + tolerance
+    tail = int(frame_count * hop * speed_factor) + pad + frame - len(samples)
+    x = np.concatenate([np.zeros(pad, np.float32), samples, np.zeros(max(tail, 0) + pad, np.float32)])
+
+    # 出力フレームkは出力の (k - 1) * hop から始まり、入力の k * hop * speed_factor を中心とする
+    nominal = pad - hop + np.round(np.arange(frame_count) * hop * speed_factor).astype(np.int64)
+    window = _periodic_hann(frame)
+    output = np.zeros((frame_count + 1) * hop, np.float32)
+
+    start = nominal[0]
+    for k in range(frame_count):
+        if k:
+            # 前のフレームの後半（自然な続き）と重なり部分の相関が最大になる位置を選ぶ
+            template = x[start + hop:start + frame]
+            lo = nominal[k] - tolerance
+            correlation = np.correlate(x[lo:nominal[k] + tolerance + hop], template, 'valid')
+            start = lo + int(np.argmax(correlation))
+        output[k * hop:k * hop + frame] += window * x[start:start + frame]
+
+    return output[hop:hop + output_length]
+
+
+def phase_vocoder(samples, speed_factor, frame_size=1024, hop=256, block_frames=2048):
+    """
+    位相ボコーダでピッチを変えずに再生速度を変える（フレーム単位のループなしで一括計算）
+    分析フレームを速度の倍率で間引き・補間し、位相は周波数ごとの位相進みの累積和で合成する
+    長い音声でもメモリを抑えるため block_frames 個の出力フレームずつ処理する
+
+    Args:
+        samples: サンプル配列（float32）
+        speed_factor: 速度の倍率（1.2 = 1.2倍速）
+        frame_size: FFTのフレーム長（hopの4倍）
+        hop: フレームの間隔
+        block_frames: 1回に処理する出力フレーム数
+
+    Returns:
+        速度を変えたサンプル配列（長さは約 1/speed_factor）
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    overlap = frame_size // hop
+    output_length = int(round(len(samples) / speed_factor))
+
+    # 中央揃えのSTFTにするため前後にフレーム長の半分の無音を足す
+    half = frame_size // 2
+    x = np.concatenate([np.zeros(half, np.float32), samples, np.zeros(half + frame_size, np.float32)])
+    input_frames = (len(x) - frame_size) // hop + 1
+    frames_view = np.lib.stride_tricks.sliding_window_view(x, frame_size)[::hop]
+
+    window = _periodic_hann(frame_size)
+    expected = (2 * np.pi * hop * np.arange(frame_size // 2 + 1) / frame_size).astype(np.float32)
+
+    # 出力フレームtは入力フレーム steps[t]（小数）の位置を補間して作る
+    steps = np.arange(0, input_frames - 1, speed_factor)
+    output = np.zeros((len(steps) + overlap) * hop, np.float32)
+    phase = None
+
+    for begin in range(0, len(steps), block_frames):
+        block = steps[begin:begin + block_frames]
+        base = block.astype(np.int64)
+        first = base[0]
+        spectrum = np.fft.rfft(frames_view[first:base[-1] + 2] * window, axis=1)
+        left = spectrum[base - first]
+        right = spectrum[base - first + 1]
+
+        alpha = (block - base)[:, None].astype(np.float32)
+        magnitude = (1 - alpha) * np.abs(left) + alpha * np.abs(right)
+
+        # 期待される位相進みからのずれを[-π, π]に折り返して瞬時周波数を求める
+        deviation = np.angle(right) - np.angle(left) - expected
+        deviation -= 2 * np.pi * np.round(deviation / (2 * np.pi))
+        advance = expected + deviation
+
+        if phase is None:
+            phase = np.angle(left[0])
+        phases = phase + np.concatenate([np.zeros((1, advance.shape[1]), np.float32), np.cumsum(advance[:-1], axis=0)])
+        phase = phases[-1] + advance[-1]
+
+        # 逆FFTして窓を掛け、hopずつずらして重ね合わせる
+        frames = (np.fft.irfft(magnitude * np.exp(1j * phases), n=frame_size, axis=1) * window).astype(np.float32)
+        frames = frames.reshape(len(block), overlap, hop)
+        offset = begin * hop
+        for j in range(overlap):
+            output[offset + j * hop:offset + (j + len(block)) * hop] += frames[:, j, :].reshape(-1)
+
+    # 窓の二乗和で正規化（ハン窓を75%重ねると一定値になる）
+    output /= float(np.sum(window ** 2) / hop)
+    return output[half:half + output_length]
+
+
+def frame_levels(samples, sample_rate, frame_duration=0.01):
+    """
+    フレームごとの平均パワーとピークを1回の走査で計算
+
+    Args:
+        samples: サンプル配列
+        sample_rate: サンプリングレート
+        frame_duration: フレーム長（秒）
+
+    Returns:
+        (平均パワーの配列, ピーク（絶対値の最大）の配列)
+    """
+    hop = max(int(sample_rate * frame_duration), 1)
+    frame_count = -(-len(samples) // hop)
+    padded = np.zeros(frame_count * hop, np.float32)
+    padded[:len(samples)] = samples
+    frames = padded.reshape(frame_count, hop)
+    return np.einsum('ij,ij->i', frames, frames) / hop, np.abs(frames).max(axis=1, initial=0.0)
+
+
+def trim_silence(samples, sample_rate, levels, pad=0.1, threshold_db=-40.0, frame_duration=0.01):
+    """
+    先頭と末尾の無音を pad 秒だけ残して削る
+
+    Args:
+        samples: サンプル配列
+        sample_rate: サンプリングレート
+        levels: frame_levelsの結果
+        pad: 残す無音（秒）
+        threshold_db: 最も大きいフレームからこのdB以内のフレームを音声とみなす
+        frame_duration: levelsのフレーム長（秒）
+
+    Returns:
+        (削ったサンプル配列, 削った範囲のlevels)
+    """
+    powers, peaks = levels
+    if not len(powers) or powers.max() <= 1e-12:
+        return samples, levels  # 全体が無音
+
+    power_db = 10 * np.log10(powers + 1e-12)
+    voiced = np.flatnonzero(power_db >= power_db.max() + threshold_db)
+
+    hop = max(int(sample_rate * frame_duration), 1)
+    pad_samples = int(pad * sample_rate)
+    first, last = voiced[0], voiced[-1] + 1
+    start = max(first * hop - pad_samples, 0)
+    end = min(last * hop + pad_samples, len(samples))
+    return samples[start:end], (powers[first:last], peaks[first:last])
+
+
+def gated_loudness(powers, absolute_gate_db=-70.0, relative_gate_db=-10.0):
+    """
+    ゲート付きの平均レベル（dBFS）
+    ITU-R BS.1770の2段階ゲート（絶対ゲートと、平均から relative_gate_db 下の相対ゲート）を
+    周波数重み付けなしでフレームのパワーに適用する（無音やブレスは平均に含めない）
+
+    Args:
+        powers: フレームごとの平均パワー（複数クリップをまとめる場合は連結した配列）
+
+    Returns:
+        平均レベル（dBFS）、音声のフレームがない場合はNone
+    """
+    powers = np.asarray(powers)
+    gated = powers[powers > 10 ** (absolute_gate_db / 10)]
+    if not len(gated):
+        return None
+
+    threshold = np.mean(gated) * 10 ** (relative_gate_db / 10)
+    gated = gated[gated > threshold]
+    return float(10 * np.log10(np.mean(gated)))
+
+
+def loudness_gain(loudness_db, peak, target_db=-20.0, peak_db=-1.0):
+    """
+    平均レベルを目標に合わせるゲイン（倍率）
+    ピークが peak_db を超えないようにゲインを抑える
+
+    Args:
+        loudness_db: gated_loudnessの結果
+        peak: サンプルの絶対値の最大
+        target_db: 目標の平均レベル（dBFS）
+        peak_db: ピークの上限（dBFS）
+
+    Returns:
+        サンプルに掛けるゲイン
+    """
+    if loudness_db is None:
+        return 1.0
+    gain = 10 ** ((target_db - loudness_db) / 20)
+    if peak > 0:
+        gain = min(gain, 10 ** (peak_db / 20) / peak)
+    return gain
+
+
+# 速度変更の方式: resample（ピッチも変わる、従来の方式）/ wsola / phase_vocoder（ピッチを保つ）
+SPEED_MODES = ('resample', 'wsola', 'phase_vocoder')
+
+
+def change_speed(samples, sample_rate, speed_factor, mode='resample'):
+    """
+    指定した方式で再生速度を変える
+
+    Args:
+        samples: サンプル配列
+        sample_rate: サンプリングレート
+        speed_factor: 速度の倍率（1.2 = 1.2倍速）
+        mode: SPEED_MODESのいずれか
+
+    Returns:
+        速度を変えたサンプル配列
+    """
+    if speed_factor == 1.0:
+        return samples
+    if mode == 'resample':
+        return resample_speed(samples, speed_factor)
+    if mode == 'wsola':
+        return wsola(samples, speed_factor, sample_rate)
+    if mode == 'phase_vocoder':
+        return phase_vocoder(samples, speed_factor)
+    raise ValueError(f"対応していない速度変更の方式です: {mode}")
+
+
+def frame_features(samples, sample_rate, frame_duration=0.01):
+    """
+    フレームごとのRMS（dB）とゼロ交差率をまとめて計算
+
+    Args:
+        samples: サンプル配列
+        sample_rate: サンプリングレート
+        frame_duration: フレーム長（秒）
+
+    Returns:
+        (RMS dB配列, ゼロ交差率配列)
+    """
+    frame_size = max(int(sample_rate * frame_duration), 1)
+    frame_count = len(samples) // frame_size
+    if frame_count == 0:
+        return np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32)
+
+    frames = samples[:frame_count * frame_size].reshape(frame_count, frame_size)
+
+    rms = np.sqrt(np.mean(np.square(frames, dtype=np.float64), axis=1))
+    rms_db = 20.0 * np.log10(rms + 1e-10)
+
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / frame_size
+
+    return rms_db, zcr
+
+
+def detect_pauses(samples, sample_rate, threshold_db=-35.0, min_pause=0.15, frame_duration=0.01):
+    """
+    フレームエネルギーとゼロ交差率から無音区間（ポーズ）を検出
+
+    Args:
+        samples: サンプル配列
+        sample_rate: サンプリングレート
+        threshold_db: 発話レベル（上位5%のRMS）に対する無音判定の閾値（dB）
+        min_pause: 無音区間とみなす最短の長さ（秒）
+        frame_duration: 解析フレーム長（秒）
+
+    Returns:
+        無音区間 (開始秒, 終了秒) のリスト
+    """
+    rms_db, zcr = frame_features(samples, sample_rate, frame_duration)
+    if len(rms_db) == 0:
+        return []
+
+    speech_level = np.percentile(rms_db, 95)
+    noise_floor = np.percentile(rms_db, 5)
+    silent = rms_db < speech_level + threshold_db
+
+    # 摩擦音（さ行など）はエネルギーが低くてもゼロ交差率が高いので発話として扱う
+    silent &= ~((zcr > 0.3) & (rms_db > noise_floor + 10.0))
+
+    # 無音フレームの連続区間を求める
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+
+    min_frames = max(int(round(min_pause / frame_duration)), 1)
+    keep = (ends - starts) >= min_frames
+
+    return [(start * frame_duration, end * frame_duration) for start, end in zip(starts[keep], ends[keep])]
@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+処理速度のベンチマークスクリプト
+各ステップの高速化前後の実装を同じデータで比較します
+"""
+
+import sys
+import re
+import json
+import random
+import shutil
+import tempfile
+import time
+import argparse
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+SAMPLE_AUDIO_DIR = ROOT_DIR / "presentations" / "audio_output"
+SAMPLE_SCRIPTS_DIR = ROOT_DIR / "presentations" / "scripts_output"
+
+
+def measure(func, items):
+    """
+    全要素に関数を適用した合計時間を計測
+
+    Returns:
+        (経過秒数, 結果のリスト)
+    """
+    start = time.perf_counter()
+    results = [func(item) for item in items]
+    return time.perf_counter() - start, results
+
+
+def report(name, elapsed, count):
+    """計測結果を表示"""
+    print(f"  {name}: {elapsed:.3f}秒 ({elapsed / count * 1000:.2f}ms/件)")
+
+
+def bench_probe(args):
+    """音声長さ取得: ヘッダー解析 vs pydubによる全体デコード"""
+    from audio_utils import probe_duration
+
+    sources = sorted(SAMPLE_AUDIO_DIR.glob("*.mp3"))
+    if not sources:
+        print(f"エラー: サンプル音声が見つかりません: {SAMPLE_AUDIO_DIR}")
+        sys.exit(1)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # サンプル音声を繰り返し使ってスライド数分の音声セットを作る
+        files = []
+        for i in range(args.slides):
+            dst = Path(temp_dir) / f"slide_{i + 1:03d}.mp3"
+            shutil.copy(sources[i % len(sources)], dst)
+            files.append(dst)
+
+        print(f"音声長さ取得ベンチマーク: {len(files)}スライド")
+
+        elapsed, header_durations = measure(probe_duration, files)
+        report("ヘッダー解析", elapsed, len(files))
+
+        try:
+            from pydub import AudioSegment
+            elapsed_decode, decoded = measure(lambda f: len(AudioSegment.from_file(f)) / 1000.0, files)
+        except Exception as e:
+            print(f"  pydub: 計測できません（{str(e)[:100]}）")
+            return
+
+        report("pydub（全体デコード）", elapsed_decode, len(files))
+        print(f"  速度比: {elapsed_decode / elapsed:.1f}倍")
+
+        max_diff = max(abs(a - b) for a, b in zip(header_durations, decoded))
+        print(f"  長さの最大差: {max_diff * 1000:.1f}ms")
+
+
+def load_script_corpus(size):
+    """サンプル原稿を繰り返してsize文字のコーパスを作る"""
+    texts = []
+    for script_file in sorted(SAMPLE_SCRIPTS_DIR.glob("*_script.json")):
+        with open(script_file, 'r', encoding='utf-8') as f:
+            texts.extend(slide['script'] for slide in json.load(f)['slides'])
+
+    if not texts:
+        print(f"エラー: サンプル原稿が見つかりません: {SAMPLE_SCRIPTS_DIR}")
+        sys.exit(1)
+
+    text = '\n'.join(texts)
+    return (text * (size // len(text) + 1))[:size]
+
+
+def legacy_split_sentence(sentence, max_chars_per_line=31, max_lines=2):
+    """改行エンジン導入前の1文のセグメント化（比較用）"""
+    def find_line_break_position(text, max_chars):
+        if len(text) <= max_chars:
+            return None
+        break_candidates = []
+        for match in re.finditer(r'、', text[:max_chars + 5]):
+            pos = match.end()
+            if pos <= max_chars:
+                break_candidates.append((pos, 3))
+        particles = ['は', 'が', 'を', 'に', 'で', 'と', 'へ', 'や', 'の', 'から', 'まで', 'より', 'も', 'し', 'ば', 'て']
+        formal_nouns = ['こと', 'もの', 'ため', 'よう', 'ところ', 'はず', 'わけ']
+        for particle in particles:
+            for match in re.finditer(re.escape(particle), text[:max_chars + 5]):
+                pos = match.end()
+                if pos > max_chars:
+                    continue
+                next_text = text[pos:pos + 3]
+                if not any(next_text.startswith(fn) for fn in formal_nouns):
+                    break_candidates.append((pos, 2))
+        if break_candidates:
+            ideal_pos = max_chars * 0.6
+            break_candidates.sort(key=lambda x: (-x[1], abs(x[0] - ideal_pos)))
+            return break_candidates[0][0]
+        return None
+
+    def split_into_two_lines(text, max_chars):
+        if len(text) <= max_chars:
+            return text
+        if len(text) > max_chars * 2:
+            return None
+        break_pos = find_line_break_position(text, max_chars)
+        if break_pos:
+            line1 = text[:break_pos].strip()
+            line2 = text[break_pos:].strip()
+            if len(line2) <= max_chars:
+                return line1 + '\n' + line2
+        for i in range(max_chars, max(max_chars // 2, len(text) - max_chars), -1):
+            if i < len(text) and text[i] in ['、', '。', ' ', '　']:
+                line1 = text[:i + 1].strip('、。 　')
+                line2 = text[i + 1:].strip('、。 　')
+                if len(line2) <= max_chars:
+                    return line1 + '\n' + line2
+        return text[:max_chars] + '\n' + text[max_chars:]
+
+    if len(sentence) <= max_chars_per_line:
+        return [sentence]
+    if len(sentence) <= max_chars_per_line * max_lines:
+        result = split_into_two_lines(sentence, max_chars_per_line)
+        if result:
+            return [result]
+        return [sentence[:max_chars_per_line] + '\n' + sentence[max_chars_per_line:max_chars_per_line * 2]]
+
+    segments = []
+    parts = sentence.split('、')
+    current_segment = ""
+    for i, part in enumerate(parts):
+        part_with_comma = part + ('、' if i < len(parts) - 1 else '')
+        test_segment = current_segment + part_with_comma
+        if len(test_segment) <= max_chars_per_line * max_lines:
+            current_segment = test_segment
+        else:
+            if current_segment:
+                result = split_into_two_lines(current_segment.rstrip('、'), max_chars_per_line)
+                segments.append(result if result else current_segment.rstrip('、'))
+            current_segment = part_with_comma
+    if current_segment:
+        result = split_into_two_lines(current_segment.rstrip('、'), max_chars_per_line)
+        segments.append(result if result else current_segment.rstrip('、'))
+    return segments
+
+
+def legacy_split_text_into_segments(text, max_chars_per_line=31, max_lines=2):
+    """改行エンジン導入前のテキスト全体のセグメント化（1文字ずつ文を区切ってから1文ずつ処理、比較用）"""
+    sentences = []
+    current = ""
+    for char in text:
+        current += char
+        if char in ['。', '！', '？', '\n']:
+            if current.strip():
+                sentences.append(current.strip())
+            current = ""
+    if current.strip():
+        sentences.append(current.strip())
+    return [segment for sentence in sentences
+            for segment in legacy_split_sentence(sentence, max_chars_per_line, max_lines)]
+
+
+def count_overflows(segments, max_chars_per_line=31, max_lines=2):
+    """行数・1行の文字数の上限を超えたセグメント数を数える"""
+    return sum(
+        1 for segment in segments
+        if segment.count('\n') >= max_lines or any(len(line) > max_chars_per_line for line in segment.split('\n'))
+    )
+
+
+def bench_linebreak(args):
+    """字幕の改行: 改行エンジン vs 導入前の助詞ごとの走査"""
+    import subtitle_segments
+    from subtitle_segments import layout_sentence, split_text_into_segments
+
+    corpus = load_script_corpus(args.chars)
+    sentences = [s.strip() for s in re.split(r'(?<=[。！？\n])', corpus) if s.strip()]
+    print(f"字幕改行ベンチマーク: {len(corpus)}文字 / {len(sentences)}文")
+
+    # 弱い助詞の区別は導入前にない規則のため、外した場合（同じ改行規則どうし）も計測する
+    modes = {"改行エンジン": True, "改行エンジン（弱い助詞なし）": False}
+    best_legacy = best_legacy_text = None
+    best_engine = dict.fromkeys(modes)
+    best_engine_text = dict.fromkeys(modes)
+    engine = {}
+    try:
+        for _ in range(args.repeat):
+            elapsed_legacy, legacy = measure(legacy_split_sentence, sentences)
+            elapsed_legacy_text, _ = measure(legacy_split_text_into_segments, [corpus])
+            best_legacy = min(best_legacy or elapsed_legacy, elapsed_legacy)
+            best_legacy_text = min(best_legacy_text or elapsed_legacy_text, elapsed_legacy_text)
+            for name, weak in modes.items():
+                subtitle_segments.WEAK_BREAKS = weak
+                elapsed_engine, engine[name] = measure(layout_sentence, sentences)
+                elapsed_engine_text, _ = measure(split_text_into_segments, [corpus])
+                best_engine[name] = min(best_engine[name] or elapsed_engine, elapsed_engine)
+                best_engine_text[name] = min(best_engine_text[name] or elapsed_engine_text, elapsed_engine_text)
+    finally:
+        subtitle_segments.WEAK_BREAKS = True
+
+    print("コーパス全体（split_text_into_segments、文の区切りを含む）")
+    report("導入前", best_legacy_text, len(sentences))
+    for name in modes:
+        report(name, best_engine_text[name], len(sentences))
+        print(f"  速度比: {best_legacy_text / best_engine_text[name]:.1f}倍")
+    print("1文ずつの改行のみ")
+    report("導入前", best_legacy, len(sentences))
+    for name in modes:
+        report(name, best_engine[name], len(sentences))
+        print(f"  速度比: {best_legacy / best_engine[name]:.1f}倍")
+
+    legacy_segments = [segment for result in legacy for segment in result]
+    for name in modes:
+        engine_segments = [segment for result in engine[name] for segment in result]
+        print(f"{name}")
+        print(f"  セグメント数: {len(legacy_segments)} -> {len(engine_segments)}")
+        print(f"  上限超過: {count_overflows(legacy_segments)} -> {count_overflows(engine_segments)}")
+
+
+def legacy_clean_declarative_phrases(script):
+    """パターンを結合する前の宣言的フレーズの削除（比較用）"""
+    patterns_to_remove = [
+        r'^.*?原稿を作成.*?[。\n]',
+        r'^.*?スライド\d+.*?[。\n]',
+        r'^(では|それでは|次に|続いて|さて|それから)[、，]?.*?[。\n]',
+        r'^.*?(このスライド|今回|今日|本日|ここ)(では|で|から|について).*?[。\n]',
+        r'^.*?(ご紹介|説明|見て|ご覧|解説)(します|いたします|しましょう|ください).*?[。\n]',
+    ]
+    cleaned = script
+    for pattern in patterns_to_remove:
+        cleaned = re.sub(pattern, '', cleaned, flags=re.MULTILINE | re.IGNORECASE)
+    return cleaned.lstrip('\n').strip()
+
+
+# Geminiの応答によく含まれる宣言的な文（ベンチマークの原稿の先頭・途中に混ぜる）
+DECLARATIVE_SENTENCES = [
+    "それでは、原稿を作成します。", "では、始めましょう。", "このスライドでは全体像を説明します。",
+    "次に、具体例を見ていきます。", "今回はスライド3の内容をご紹介します。", "本日のテーマを見てください。",
+]
+
+# 削除の条件に関わる断片（同等性の確認に使うランダムな原稿の材料）
+CLEAN_FRAGMENTS = [
+    '原稿を作成', 'スライド', '3', '１', 'では', 'それでは', '次に', '続いて', 'さて', 'それから', '、', '，',
+    'このスライド', '今回', '今日', '本日', 'ここ', 'で', 'から', 'について', 'ご紹介', '説明', '見て', 'ご覧',
+    '解説', 'します', 'いたします', 'しましょう', 'ください', '。', '\n', '\n\n', ' ', 'AI', '技術', 'です',
+]
+
+
+def bench_clean(args):
+    """宣言的フレーズの削除: パターンごとの re.sub vs 結合したパターンによる行ごとの1回の走査"""
+    from generate_script import clean_declarative_phrases
+
+    random.seed(0)
+    corpus = load_script_corpus(args.scripts * 300)
+    scripts = []
+    for i in range(args.scripts):
+        # 応答らしく、宣言的な文を先頭や段落の途中に混ぜる
+        body = corpus[i * 300:(i + 1) * 300].split('。')
+        for _ in range(random.randint(0, 3)):
+            body.insert(random.randint(0, len(body)), random.choice(DECLARATIVE_SENTENCES).rstrip('。') + '\n')
+        scripts.append('。'.join(body))
+    print(f"宣言的フレーズ削除ベンチマーク: {len(scripts)}件（1件あたり約300文字）")
+
+    best_legacy = best_combined = None
+    for _ in range(args.repeat):
+        elapsed_legacy, legacy = measure(legacy_clean_declarative_phrases, scripts)
+        elapsed_combined, combined = measure(clean_declarative_phrases, scripts)
+        best_legacy = min(best_legacy or elapsed_legacy, elapsed_legacy)
+        best_combined = min(best_combined or elapsed_combined, elapsed_combined)
+
+    report("パターンごとの re.sub", best_legacy, len(scripts))
+    report("結合したパターン", best_combined, len(scripts))
+    print(f"  速度比: {best_legacy / best_combined:.1f}倍")
+    print(f"  結果の不一致: {sum(1 for a, b in zip(legacy, combined) if a != b)}件")
+
+    # 削除が連鎖する場合（削除後に行頭に来た文・改行まで削除してつながった行）も同じ結果になるかを確認する
+    mismatches = 0
+    for _ in range(args.fuzz):
+        text = ''.join(random.choice(CLEAN_FRAGMENTS) for _ in range(random.randint(0, 30)))
+        if legacy_clean_declarative_phrases(text) != clean_declarative_phrases(text):
+            mismatches += 1
+    print(f"  ランダムな原稿 {args.fuzz}件での不一致: {mismatches}件")
+
+
+def legacy_parse_marp_slides(slide_file):
+    """以前の generate_script.parse_marp_slides（ファイル全体を「---」で分割）"""
+    with open(slide_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    slides = []
+    for slide_raw in content.split('---'):
+        slide_raw = slide_raw.strip()
+        if not slide_raw or slide_raw.startswith('marp:'):
+            continue
+        title = ''
+        content_lines = []
+        for line in slide_raw.split('\n'):
+            if line.startswith('# '):
+                title = line[2:].strip()
+            elif line.strip():
+                content_lines.append(line)
+        slides.append({'index': len(slides) + 1, 'title': title, 'content': '\n'.join(content_lines)})
+    return slides
+
+
+def bench_marp(args):
+    """スライドの解析: 「---」での分割 vs 1行ずつの1回の走査 vs 隣に保存した解析結果の読み込み"""
+    import os
+    from marp_parser import load_deck, cache_path
+
+    sample = (ROOT_DIR / "slides" / "最新のAI業界の動向2025_slide.md").read_text(encoding='utf-8')
+    parts = sample.split('\n---\n')
+    header = parts[0] + '\n---\n'
+    bodies = [body.strip() for body in parts[1:] if body.strip()]
+    code = "```python\n# 設定\nprint('---')\n```"
+
+    temp_dir = Path(tempfile.mkdtemp())
+    try:
+        slide_file = temp_dir / "deck.md"
+        deck_slides = [bodies[i % len(bodies)] + (f"\n\n{code}" if i % 10 == 9 else '') for i in range(args.slides)]
+        slide_file.write_text(header + '\n' + '\n\n---\n\n'.join(deck_slides) + '\n', encoding='utf-8')
+        print(f"スライド解析ベンチマーク: {args.slides}枚 / {slide_file.stat().st_size / 1024:.0f}KB（10枚に1枚はコードブロック入り）")
+
+        def best_of(func):
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                result = func()
+                elapsed = time.perf_counter() - start
+                best = min(best or elapsed, elapsed)
+            return best, result
+
+        def cold():
+            cache_path(slide_file).unlink(missing_ok=True)
+            return load_deck(slide_file)
+
+        def touched():
+            os.utime(slide_file)
+            return load_deck(slide_file)
+
+        elapsed_legacy, legacy = best_of(lambda: legacy_parse_marp_slides(slide_file))
+        elapsed_parse, deck = best_of(lambda: load_deck(slide_file, use_cache=False))
+        elapsed_cold, _ = best_of(cold)
+        elapsed_warm, _ = best_of(lambda: load_deck(slide_file))
+        elapsed_touched, _ = best_of(touched)
+
+        print(f"  「---」で分割（以前の実装）: {elapsed_legacy * 1000:.1f}ms（{len(legacy)}枚として解析）")
+        print(f"  1回の走査: {elapsed_parse * 1000:.1f}ms（{len(deck.slides)}枚）")
+        print(f"  走査して解析結果を保存: {elapsed_cold * 1000:.1f}ms")
+        print(f"  保存した解析結果の読み込み: {elapsed_warm * 1000:.1f}ms")
+        print(f"  更新時刻だけが変わった場合: {elapsed_touched * 1000:.1f}ms")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def synthetic_speech(seconds, sample_rate):
+    """ピッチと音量が揺れる有声音と無音が交互に続く、音声に似た信号を作る"""
+    import numpy as np
+
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 150 + 40 * np.sin(2 * np.pi * 0.7 * t)
+    voiced = sum(np.sin(2 * np.pi * k * np.cumsum(pitch) / sample_rate) / k for k in range(1, 6))
+    envelope = np.clip(np.sin(2 * np.pi * 0.4 * t) + 0.3, 0, None)
+    return (0.2 * voiced * envelope).astype(np.float32)
+
+
+def bench_stretch(args):
+    """速度変更: 再サンプリング（ピッチも変わる）vs ピッチを保つ伸縮（WSOLA・位相ボコーダ）"""
+    from audio_utils import change_speed, SPEED_MODES
+
+    samples = synthetic_speech(args.minutes * 60, args.sample_rate)
+    print(f"速度変更ベンチマーク: {args.minutes}分 / {args.sample_rate}Hz / {args.speed}倍速")
+
+    for mode in SPEED_MODES:
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            change_speed(samples, args.sample_rate, args.speed, mode)
+            elapsed = time.perf_counter() - start
+            best = min(best or elapsed, elapsed)
+        print(f"  {mode}: {best:.2f}秒（実時間の{args.minutes * 60 / best:.0f}倍速）")
+
+
+def bench_tts(args):
+    """音声生成: ローカルのgTTS形式サーバーに対するスループットと1スライドあたりの待ち時間"""
+    import io
+    import contextlib
+    from generate_audio import generate_all_audio
+    from tts_backends import get_backend
+    from tts_stub_server import start_server
+
+    server, url = start_server(latency=args.latency, error_rate=args.error_rate)
+    backend = get_backend('http', url=url)
+    print(f"音声生成ベンチマーク: {args.slides}スライド / 遅延 {args.latency}秒 / エラー率 {args.error_rate}")
+
+    texts = load_script_corpus(args.slides * 200)
+    slides = [{'index': i + 1, 'title': f"スライド{i + 1}", 'script': texts[i * 200:(i + 1) * 200]}
+              for i in range(args.slides)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        script_file = Path(temp_dir) / "bench_script.json"
+        with open(script_file, 'w', encoding='utf-8') as f:
+            json.dump({'slides': slides, 'total_slides': len(slides)}, f, ensure_ascii=False)
+
+        for workers in args.workers:
+            for chunking in ('slide', 'segment'):
+                output_dir = Path(temp_dir) / f"audio_{workers}_{chunking}"
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    generate_all_audio(script_file, output_dir, workers=workers, rate=args.rate, burst=args.burst,
+                                       audio_format='wav', chunking=chunking, backend=backend)
+                elapsed = time.perf_counter() - start
+                print(f"  並列数 {workers} / {chunking}: {elapsed:.2f}秒（{args.slides / elapsed:.1f}スライド/秒、"
+                      f"{elapsed / args.slides * 1000:.0f}ms/スライド）")
+
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="処理速度のベンチマーク")
+    subparsers = parser.add_subparsers(dest='target', required=True)
+
+    probe_parser = subparsers.add_parser('probe', help="音声長さ取得")
+    probe_parser.add_argument('--slides', type=int, default=100, help="スライド数")
+    probe_parser.set_defaults(func=bench_probe)
+
+    linebreak_parser = subparsers.add_parser('linebreak', help="字幕の改行")
+    linebreak_parser.add_argument('--chars', type=int, default=100000, help="コーパスの文字数")
+    linebreak_parser.add_argument('--repeat', type=int, default=3, help="計測回数（最速値を採用）")
+    linebreak_parser.set_defaults(func=bench_linebreak)
+
+    clean_parser = subparsers.add_parser('clean', help="宣言的フレーズの削除")
+    clean_parser.add_argument('--scripts', type=int, default=5000, help="原稿の件数")
+    clean_parser.add_argument('--fuzz', type=int, default=20000, help="同等性を確認するランダムな原稿の件数")
+    clean_parser.add_argument('--repeat', type=int, default=3, help="計測回数（最速値を採用）")
+    clean_parser.set_defaults(func=bench_clean)
+
+    marp_parser = subparsers.add_parser('marp', help="スライドの解析")
+    marp_parser.add_argument('--slides', type=int, default=1000, help="スライド数")
+    marp_parser.add_argument('--repeat', type=int, default=5, help="計測回数（最速値を採用）")
+    marp_parser.set_defaults(func=bench_marp)
+
+    stretch_parser = subparsers.add_parser('stretch', help="速度変更")
+    stretch_parser.add_argument('--minutes', type=float, default=10, help="音声の長さ（分）")
+    stretch_parser.add_argument('--sample-rate', type=int, default=24000, help="サンプリングレート")
+    stretch_parser.add_argument('--speed', type=float, default=1.2, help="速度の倍率")
+    stretch_parser.add_argument('--repeat', type=int, default=3, help="計測回数（最速値を採用）")
+    stretch_parser.set_defaults(func=bench_stretch)
+
+    tts_parser = subparsers.add_parser('tts', help="音声生成（ローカルのgTTS形式サーバー）")
+    tts_parser.add_argument('--slides', type=int, default=50, help="スライド数")
+    tts_parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 16], help="並列数（複数指定可）")
+    tts_parser.add_argument('--latency', type=float, default=0.3, help="サーバーの1リクエストごとの遅延（秒）")
+    tts_parser.add_argument('--error-rate', type=float, default=0.0, help="サーバーが429を返す割合")
+    tts_parser.add_argument('--rate', type=float, default=50, help="TTSリクエストの上限（回/秒）")
+    tts_parser.add_argument('--burst', type=int, default=10, help="連続で送れるTTSリクエスト数")
+    tts_parser.set_defaults(func=bench_tts)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
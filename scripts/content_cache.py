@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+内容アドレス方式のファイルキャッシュの共通部分
+キーのハッシュごとに1ファイルを保存し、一時ファイル経由の書き込み・ヒット率の集計・
+容量上限を超えた分の削除（最後に使われてから古い順）を行います
+音声キャッシュ（tts_cache.py）と原稿キャッシュ（script_cache.py）で共有します
+"""
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+
+def cache_key(**params):
+    """
+    条件からキャッシュキーを作る
+
+    Args:
+        **params: 結果に影響する条件（text, lang, speed_factor, backend など）
+
+    Returns:
+        SHA-256の16進文字列
+    """
+    payload = json.dumps(params, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ContentCache:
+    """
+    ファイルを <キャッシュディレクトリ>/<キーの先頭2文字>/<キー><拡張子> に保存するキャッシュ
+    使用時に更新時刻を更新してLRUの順序として使う
+    """
+
+    # 拡張子を指定しない場合の拡張子（サブクラスで決める）
+    SUFFIX = ''
+
+    def __init__(self, cache_dir, max_bytes):
+        """
+        Args:
+            cache_dir: キャッシュディレクトリ
+            max_bytes: キャッシュの容量上限（バイト）
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def path_for(self, key, suffix=None):
+        """キーに対応するキャッシュファイルのパス"""
+        return self.cache_dir / key[:2] / f"{key}{self.SUFFIX if suffix is None else suffix}"
+
+    def _count(self, hit):
+        """ヒット・ミスを集計する"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def read(self, key, suffix=None):
+        """
+        キャッシュの内容をバイト列で取得する
+
+        Args:
+            key: キャッシュキー
+            suffix: キャッシュファイルの拡張子（Noneの場合はSUFFIX）
+
+        Returns:
+            キャッシュの内容、ない場合はNone
+        """
+        cached = self.path_for(key, suffix)
+        try:
+            os.utime(cached)
+            data = cached.read_bytes()
+        except FileNotFoundError:
+            data = None
+
+        self._count(data is not None)
+        return data
+
+    def write(self, key, data, suffix=None):
+        """
+        バイト列をキャッシュに保存する
+
+        Args:
+            key: キャッシュキー
+            data: 保存する内容
+            suffix: キャッシュファイルの拡張子（Noneの場合はSUFFIX）
+        """
+        self._write_atomic(self.path_for(key, suffix), lambda temp_file: temp_file.write_bytes(data))
+
+    def _write_atomic(self, cached, write):
+        """一時ファイルに書き込んでからキャッシュファイルに置き換える（途中で壊れない）"""
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = cached.with_name(f"{cached.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            write(temp_file)
+            os.replace(temp_file, cached)
+        except BaseException:
+            temp_file.unlink(missing_ok=True)
+            raise
+
+    def evict(self):
+        """
+        容量上限を超えた分を最後に使われてから古い順に削除する
+
+        Returns:
+            削除したファイル数
+        """
+        if not self.cache_dir.exists():
+            return 0
+
+        entries = []
+        total = 0
+        for path in self.cache_dir.glob('*/*'):
+            if path.suffix == '.tmp':
+                continue
+            stat = path.stat()
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+            total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
+
+    def summary(self):
+        """ヒット・ミスの集計を表示用の文字列で返す"""
+        total = self.hits + self.misses
+        rate = self.hits / total * 100 if total else 0.0
+        return f"ヒット {self.hits} / ミス {self.misses}（ヒット率 {rate:.0f}%）"
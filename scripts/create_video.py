@@ -6,17 +6,35 @@
 
 import sys
 import os
+import ast
 import json
 import shutil
+import hashlib
+import argparse
 import subprocess
 from pathlib import Path
+from pipeline import Stage, run_pipeline, tree_digest
+
+# 依存関係をインストールした時のロックファイルのハッシュ（node_modules に保存し、トピックに関係なく共有する）
+INSTALL_STAMP = ".install-stamp"
+# バンドル済みのプロジェクトと、そのバンドルを作った時の入力のハッシュ
+BUNDLE_DIR = "build"
+BUNDLE_STAMP = ".bundle-stamp"
+# バンドルの内容を決めるファイル（タイミング・スライドのメタデータ・音声・画像は含めず、レンダリングの時に渡す）
+BUNDLE_INPUTS = ("src", "remotion.config.ts", "tsconfig.json")
+# レンダリング時に --props で渡すデータ
+RENDER_PROPS = "render_props.json"
+
+def print_step(description):
+    """ステップの見出しを表示"""
+    print(f"\n{'='*60}")
+    print(f"{description}")
+    print(f"{'='*60}")
 
 def run_command(cmd, cwd=None, description=""):
     """コマンドを実行して結果を表示"""
     if description:
-        print(f"\n{'='*60}")
-        print(f"{description}")
-        print(f"{'='*60}")
+        print_step(description)
 
     print(f"実行: {' '.join(cmd) if isinstance(cmd, list) else cmd}")
 
@@ -38,34 +56,335 @@ def run_command(cmd, cwd=None, description=""):
 
     return result
 
-def main():
-    if len(sys.argv) < 2:
-        print("使用方法: python create_video.py <input_yaml_file>")
-        sys.exit(1)
+def listed_audio_files(audio_metadata):
+    """音声メタデータに記録された音声ファイル（連結したナレーションは1回だけ）"""
+    try:
+        with open(audio_metadata, 'r', encoding='utf-8') as f:
+            audio_data = json.load(f)
+    except FileNotFoundError:
+        return []
+    return list(dict.fromkeys(Path(info['audio_file']) for info in audio_data['audio_files']))
+
+def placed_files(timings_file, remotion_dir):
+    """Remotionプロジェクトに配置するタイミングJSONと音声ファイル"""
+    try:
+        with open(timings_file, 'r', encoding='utf-8') as f:
+            timings_data = json.load(f)
+    except FileNotFoundError:
+        return [remotion_dir / "timings.json"]
+    audio_names = dict.fromkeys(Path(slide['audioFile']).name for slide in timings_data['slides'])
+    return [remotion_dir / "timings.json"] + [remotion_dir / "public" / "audio" / name for name in audio_names]
+
+def place_remotion_files(timings_file, remotion_dir):
+    """
+    タイミングJSONと音声ファイルをRemotionプロジェクトに配置（音声のパスは public からの相対パスにする）
+
+    Args:
+        timings_file: タイミングJSONファイル、または同じプロセスで生成したタイミング情報（書き換える）
+        remotion_dir: Remotionプロジェクトのディレクトリ
+    """
+    print_step("ステップ 5/6: Remotionプロジェクトへのファイル配置")
 
-    input_file = sys.argv[1]
+    audio_public_dir = remotion_dir / "public" / "audio"
+    audio_public_dir.mkdir(exist_ok=True)
 
-    if not os.path.exists(input_file):
-        print(f"エラー: 入力ファイルが見つかりません: {input_file}")
-        sys.exit(1)
+    # タイミングデータを読み込んで、音声ファイルのパスを更新
+    if isinstance(timings_file, dict):
+        timings_data = timings_file
+    else:
+        with open(timings_file, 'r', encoding='utf-8') as f:
+            timings_data = json.load(f)
+
+    # 全スライドを連結したナレーションの場合は同じファイルを1回だけコピーする
+    copied = set()
+    for slide in timings_data['slides']:
+        audio_src = Path(slide['audioFile'])
+        if audio_src not in copied:
+            audio_dst = audio_public_dir / audio_src.name
+            shutil.copy(audio_src, audio_dst)
+            print(f"コピー: {audio_src} -> {audio_dst}")
+            copied.add(audio_src)
 
-    # プロジェクトルートディレクトリ
-    root_dir = Path(__file__).parent.parent
-    scripts_dir = root_dir / "scripts"
-    remotion_dir = root_dir / "remotion-project"
+        # パスを相対パスに更新
+        slide['audioFile'] = f"audio/{audio_src.name}"
 
-    print(f"\n{'#'*60}")
-    print(f"# ゆっくり動画生成ワークフロー開始")
-    print(f"# 入力ファイル: {input_file}")
-    print(f"{'#'*60}\n")
+    if 'narrationFile' in timings_data:
+        timings_data['narrationFile'] = f"audio/{Path(timings_data['narrationFile']).name}"
 
-    # ステップ1: スライド作成
-    run_command(
-        ["python3", str(scripts_dir / "create_slide.py"), input_file],
-        description="ステップ 1/6: スライド作成"
-    )
+    # 更新したタイミングデータを保存
+    with open(remotion_dir / "timings.json", 'w', encoding='utf-8') as f:
+        json.dump(timings_data, f, ensure_ascii=False, indent=2)
+    print(f"保存: {remotion_dir / 'timings.json'}")
 
-    # スライドファイルを取得
+    print("ファイル配置完了")
+
+def read_stamp(stamp_file):
+    """記録したハッシュを読み込む（ない場合はNone）"""
+    try:
+        return Path(stamp_file).read_text(encoding='utf-8').strip()
+    except OSError:
+        return None
+
+def dependencies_key(remotion_dir):
+    """
+    依存関係のハッシュ（ロックファイルの内容と package.json の依存パッケージ欄）
+    package.json のスクリプトなど、インストールに関係しない変更では変わらない
+    """
+    with open(remotion_dir / "package.json", 'r', encoding='utf-8') as f:
+        package = json.load(f)
+    fields = {field: package.get(field, {}) for field in ('dependencies', 'devDependencies', 'optionalDependencies')}
+    digest = hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8'))
+    lock_file = remotion_dir / "package-lock.json"
+    if lock_file.exists():
+        digest.update(lock_file.read_bytes())
+    return digest.hexdigest()
+
+def install_dependencies(remotion_dir):
+    """
+    Remotionの依存関係をインストールする
+    前回インストールした時とロックファイルが同じ場合は npm install を実行しない
+
+    Returns:
+        インストールしたか
+    """
+    stamp_file = remotion_dir / "node_modules" / INSTALL_STAMP
+    if read_stamp(stamp_file) == dependencies_key(remotion_dir):
+        print("\n依存関係はインストール済みのため省略（ロックファイルが前回と同じ）")
+        return False
+
+    run_command(["npm", "install"], cwd=remotion_dir, description="Remotionの依存関係のインストール")
+    # npm install がロックファイルを書き換える場合があるため、インストール後の内容で記録する
+    stamp_file.write_text(dependencies_key(remotion_dir) + "\n", encoding='utf-8')
+    return True
+
+def bundle_key(remotion_dir):
+    """バンドルの入力（ソース・設定・依存関係）のハッシュ"""
+    digest = hashlib.sha256(tree_digest([remotion_dir / name for name in BUNDLE_INPUTS], remotion_dir).encode('utf-8'))
+    digest.update(dependencies_key(remotion_dir).encode('utf-8'))
+    return digest.hexdigest()
+
+def bundle_project(remotion_dir):
+    """
+    Remotionプロジェクトをバンドルする
+    ソース・設定・依存関係が前回のバンドルと同じ場合はバンドル済みのディレクトリをそのまま使う
+
+    Returns:
+        バンドルしたか
+    """
+    bundle_dir = remotion_dir / BUNDLE_DIR
+    key = bundle_key(remotion_dir)
+    if read_stamp(bundle_dir / BUNDLE_STAMP) == key:
+        print(f"\nバンドル済みのため省略: {bundle_dir}")
+        return False
+
+    # 途中で失敗しても古い記録が残らないように、作り直す前に削除する
+    shutil.rmtree(bundle_dir, ignore_errors=True)
+    run_command(["npm", "run", "bundle"], cwd=remotion_dir, description="Remotionプロジェクトのバンドル")
+    (bundle_dir / BUNDLE_STAMP).write_text(key + "\n", encoding='utf-8')
+    return True
+
+def sync_public(public_dir, bundle_public_dir):
+    """
+    public の内容をバンドル内のコピーにそろえる
+    サイズと更新時刻が同じファイルはそのままにし、変わったファイルだけを置き換え、なくなったファイルは削除する
+
+    Returns:
+        置き換えたファイル数
+    """
+    expected = set()
+    updated = 0
+    for src in sorted(p for p in public_dir.rglob('*') if p.is_file()):
+        dst = bundle_public_dir / src.relative_to(public_dir)
+        expected.add(dst)
+        src_stat = src.stat()
+        try:
+            dst_stat = dst.stat()
+            if dst_stat.st_size == src_stat.st_size and dst_stat.st_mtime_ns == src_stat.st_mtime_ns:
+                continue
+        except FileNotFoundError:
+            pass
+
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        dst.unlink(missing_ok=True)
+        try:
+            # 同じファイルシステムならコピーせずにハードリンクする
+            os.link(src, dst)
+        except OSError:
+            shutil.copy2(src, dst)
+        updated += 1
+
+    if bundle_public_dir.exists():
+        for dst in [p for p in bundle_public_dir.rglob('*') if p.is_file() and p not in expected]:
+            dst.unlink()
+    return updated
+
+def write_render_props(remotion_dir):
+    """
+    レンダリング時に --props で渡すデータ（render_props.json）を作る
+    バンドルにはバンドルした時点の timings.json・slides_metadata.json が既定値として埋め込まれているため、
+    既定値が残らないように、ない項目も含めて全ての項目を渡す
+
+    Returns:
+        render_props.json のパス
+    """
+    with open(remotion_dir / "timings.json", 'r', encoding='utf-8') as f:
+        timings_data = json.load(f)
+    try:
+        with open(remotion_dir / "slides_metadata.json", 'r', encoding='utf-8') as f:
+            slides_metadata = json.load(f)
+    except FileNotFoundError:
+        slides_metadata = {'total_slides': 0, 'slides': []}
+
+    props = {
+        'slides': timings_data.get('slides', []),
+        'fps': timings_data.get('fps', 30),
+        'totalFrames': timings_data.get('totalFrames', 150),
+        'frameIndex': timings_data.get('frameIndex'),
+        'narrationFile': timings_data.get('narrationFile'),
+        'slidesMetadata': slides_metadata,
+    }
+    props_file = remotion_dir / RENDER_PROPS
+    with open(props_file, 'w', encoding='utf-8') as f:
+        json.dump(props, f, ensure_ascii=False)
+    return props_file
+
+def render_video(remotion_dir):
+    """
+    バンドル済みのRemotionプロジェクトで動画をレンダリング
+    タイミング情報とスライド画像のメタデータは --props で渡し、音声・画像はバンドル内の public を更新して使う
+    """
+    print_step("ステップ 6/6: Remotionで動画をレンダリング")
+    updated = sync_public(remotion_dir / "public", remotion_dir / BUNDLE_DIR / "public")
+    print(f"バンドルの public を更新: {updated}件")
+    print(f"保存: {write_render_props(remotion_dir)}")
+
+    # 出力ディレクトリを作成
+    (remotion_dir / "out").mkdir(exist_ok=True)
+
+    run_command(["npm", "run", "render"], cwd=remotion_dir)
+
+def module_sources(scripts_dir, *modules, exclude=()):
+    """
+    scripts/ のモジュールと、そこから（間接的に）読み込まれる scripts/ 内のモジュールのファイル
+    ステージの入力に使い、読み込むモジュールを書き換えた場合もステージを実行し直す
+
+    Args:
+        scripts_dir: scripts/ ディレクトリ
+        *modules: ステップのモジュール名
+        exclude: ステップの実行で使わないモジュール名（含めず、そこから読み込まれるモジュールもたどらない）
+
+    Returns:
+        モジュールのファイルパスのリスト（名前順）
+    """
+    found = {}
+    pending = list(modules)
+    while pending:
+        name = pending.pop()
+        source = scripts_dir / f"{name}.py"
+        if name in found or name in exclude or not source.exists():
+            continue
+        found[name] = source
+
+        # 関数内で読み込むモジュールも含める（ステップは実行する時に読み込む）
+        for node in ast.walk(ast.parse(source.read_text(encoding='utf-8'))):
+            if isinstance(node, ast.Import):
+                pending.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                pending.append(node.module)
+
+    return [found[name] for name in sorted(found)]
+
+def in_process_steps(input_file, slide_file, script_file, audio_dir, timings_file, remotion_dir):
+    """
+    各ステップの関数を同じプロセスで呼び出す処理を作る
+    ステップのモジュール（numpy・Gemini SDKなど）は実行する時に初めて読み込み、
+    生成したデータは保存したJSONを読み直さずに次のステップへ渡す（前のステップを省略した場合はファイルから読む）
+
+    Returns:
+        ステップ名 -> 引数なしの関数 の辞書
+    """
+    results = {}
+
+    def slides():
+        from create_slide import create_marp_slide
+        print_step("ステップ 1/6: スライド作成")
+        slide_file.parent.mkdir(exist_ok=True)
+        create_marp_slide(input_file, slide_file.parent)
+
+    def script():
+        from generate_script import generate_full_script
+        from script_cache import ScriptCache
+        print_step("ステップ 2/6: 原稿生成")
+        script_file.parent.mkdir(exist_ok=True)
+        results['script'] = generate_full_script(slide_file, script_file, cache=ScriptCache(), return_data=True)
+
+    def audio():
+        from generate_audio import generate_all_audio
+        from tts_cache import TTSCache
+        print_step("ステップ 3/6: 音声生成")
+        results['audio'] = generate_all_audio(results.pop('script', script_file), audio_dir, cache=TTSCache(),
+                                              return_data=True)
+
+    def timings():
+        from generate_timings import generate_timings
+        print_step("ステップ 4/6: タイミング情報生成")
+        results['timings'] = generate_timings(results.pop('audio', audio_dir / "audio_metadata.json"), timings_file,
+                                              return_data=True)
+
+    def narration():
+        from stream_pipeline import generate_narration_streaming
+        from script_cache import ScriptCache
+        from tts_cache import TTSCache
+        print_step("ステップ 2〜4/6: 原稿・音声・タイミング情報の生成（スライドごとに流す）")
+        script_file.parent.mkdir(exist_ok=True)
+        results['script'], results['audio'], results['timings'] = generate_narration_streaming(
+            slide_file, script_file, audio_dir, timings_file, script_cache=ScriptCache(), tts_cache=TTSCache())
+
+    def place():
+        place_remotion_files(results.pop('timings', timings_file), remotion_dir)
+
+    return {'slides': slides, 'script': script, 'audio': audio, 'timings': timings, 'narration': narration,
+            'place': place}
+
+def subprocess_steps(scripts_dir, input_file, slide_file, script_file, audio_dir, timings_file, remotion_dir):
+    """
+    各ステップを別のPythonプロセスとして実行する処理を作る（ステップ同士を分離したい場合）
+
+    Returns:
+        ステップ名 -> 引数なしの関数 の辞書
+    """
+
+    def python_step(script, argument, description):
+        command = ["python3", str(scripts_dir / script), str(argument)]
+        return lambda: run_command(command, description=description)
+
+    return {
+        'slides': python_step("create_slide.py", input_file, "ステップ 1/6: スライド作成"),
+        'script': python_step("generate_script.py", slide_file, "ステップ 2/6: 原稿生成"),
+        'audio': python_step("generate_audio.py", script_file, "ステップ 3/6: 音声生成"),
+        'timings': python_step("generate_timings.py", audio_dir / "audio_metadata.json",
+                               "ステップ 4/6: タイミング情報生成"),
+        'place': lambda: place_remotion_files(timings_file, remotion_dir),
+    }
+
+def build_stages(input_file, root_dir, isolate=False, stream=False):
+    """
+    動画生成の各ステップを、入力・出力・依存関係を宣言したステージとして組み立てる
+    依存パッケージのインストールとバンドルは、スライド〜タイミングの生成と並行して実行される
+
+    Args:
+        input_file: 入力YAMLファイルのパス
+        root_dir: プロジェクトルートディレクトリ
+        isolate: Trueの場合は各ステップを別のPythonプロセスで実行する（Falseの場合は同じプロセスで関数を呼ぶ）
+        stream: Trueの場合は原稿・音声・タイミングを1つのステージにまとめ、スライドごとに流して生成する
+
+    Returns:
+        (ステージのリスト, 出力動画のパス, ファイル名に使うトピック名)
+    """
+    scripts_dir = root_dir / "scripts"
+    remotion_dir = root_dir / "remotion-project"
+
+    # スライドファイル名はトピック名から決まる
     with open(input_file, 'r', encoding='utf-8') as f:
         import yaml
         data = yaml.safe_load(f)
@@ -73,96 +392,120 @@ def main():
         safe_topic = topic.replace(' ', '_').replace('/', '_').replace('\\', '_')
 
     slide_file = root_dir / "slides" / f"{safe_topic}_slide.md"
-
-    if not slide_file.exists():
-        raise RuntimeError(f"スライドファイルが見つかりません: {slide_file}")
-
-    # ステップ2: 原稿生成
-    run_command(
-        ["python3", str(scripts_dir / "generate_script.py"), str(slide_file)],
-        description="ステップ 2/6: 原稿生成"
-    )
-
     script_file = root_dir / "scripts_output" / f"{safe_topic}_slide_script.json"
-
-    if not script_file.exists():
-        raise RuntimeError(f"原稿ファイルが見つかりません: {script_file}")
-
-    # ステップ3: 音声生成
-    run_command(
-        ["python3", str(scripts_dir / "generate_audio.py"), str(script_file)],
-        description="ステップ 3/6: 音声生成"
-    )
-
     audio_metadata = root_dir / "audio_output" / "audio_metadata.json"
-
-    if not audio_metadata.exists():
-        raise RuntimeError(f"音声メタデータが見つかりません: {audio_metadata}")
-
-    # ステップ4: タイミング情報生成
-    run_command(
-        ["python3", str(scripts_dir / "generate_timings.py"), str(audio_metadata)],
-        description="ステップ 4/6: タイミング情報生成"
-    )
-
     timings_file = root_dir / "audio_output" / "video_timings.json"
+    output_video = remotion_dir / "out" / "video.mp4"
+    install_stamp = remotion_dir / "node_modules" / INSTALL_STAMP
+    bundle_stamp = remotion_dir / BUNDLE_DIR / BUNDLE_STAMP
+
+    if isolate:
+        steps = subprocess_steps(scripts_dir, input_file, slide_file, script_file, audio_metadata.parent, timings_file,
+                                 remotion_dir)
+    else:
+        steps = in_process_steps(input_file, slide_file, script_file, audio_metadata.parent, timings_file, remotion_dir)
+
+    stages = [
+        Stage("slides", steps['slides'],
+              inputs=[input_file] + module_sources(scripts_dir, "create_slide"),
+              outputs=[slide_file],
+              description="ステップ 1/6: スライド作成"),
+        Stage("script", steps['script'],
+              inputs=[slide_file] + module_sources(scripts_dir, "generate_script", "script_cache"),
+              outputs=[script_file],
+              deps=["slides"],
+              description="ステップ 2/6: 原稿生成"),
+        # 字幕の分割（subtitle_segments）はセグメント単位の合成（--chunking segment）でだけ使い、
+        # ここではスライド単位で合成するため、字幕の改行を調整しても音声は作り直さない
+        Stage("audio", steps['audio'],
+              inputs=[script_file] + module_sources(scripts_dir, "generate_audio", "tts_cache",
+                                                    exclude=("subtitle_segments",)),
+              outputs=lambda: [audio_metadata] + listed_audio_files(audio_metadata),
+              deps=["script"],
+              description="ステップ 3/6: 音声生成"),
+        Stage("timings", steps['timings'],
+              inputs=lambda: [audio_metadata] + listed_audio_files(audio_metadata)
+                             + module_sources(scripts_dir, "generate_timings"),
+              outputs=[timings_file],
+              deps=["audio"],
+              description="ステップ 4/6: タイミング情報生成"),
+        Stage("place", steps['place'],
+              inputs=lambda: [timings_file] + listed_audio_files(audio_metadata),
+              outputs=lambda: placed_files(timings_file, remotion_dir),
+              deps=["timings"],
+              description="ステップ 5/6: Remotionプロジェクトへのファイル配置"),
+        # インストールとバンドルは記録がトピックごとのため、別のトピックでも実行されるが、
+        # ロックファイル・ソースが同じなら node_modules と build の記録を見てすぐに終わる
+        Stage("install", lambda: install_dependencies(remotion_dir),
+              inputs=[remotion_dir / "package.json", remotion_dir / "package-lock.json"],
+              outputs=[install_stamp],
+              description="Remotionの依存関係のインストール"),
+        # タイミング情報に依存しないため、原稿・音声の生成と並行してバンドルできる
+        # （配置中の音声がバンドルにコピーされても、レンダリングの前に public をそろえ直す）
+        Stage("bundle", lambda: bundle_project(remotion_dir),
+              inputs=[remotion_dir / name for name in BUNDLE_INPUTS]
+                     + [remotion_dir / "package.json", remotion_dir / "package-lock.json", install_stamp],
+              outputs=[bundle_stamp],
+              deps=["install"],
+              description="Remotionプロジェクトのバンドル"),
+        Stage("render", lambda: render_video(remotion_dir),
+              inputs=[remotion_dir / "public", remotion_dir / "timings.json", remotion_dir / "slides_metadata.json",
+                      remotion_dir / "package.json", bundle_stamp],
+              outputs=[output_video],
+              deps=["place", "bundle"],
+              description="ステップ 6/6: Remotionで動画をレンダリング"),
+    ]
+
+    if stream:
+        # 原稿・音声・タイミングは1つのステージになり、どれかの入力が変わると3つとも実行する
+        # （内容が同じスライドは原稿・音声・タイミングのキャッシュから再利用される）
+        narration = Stage("narration", steps['narration'],
+                          inputs=[slide_file] + module_sources(scripts_dir, "stream_pipeline", "script_cache",
+                                                               "tts_cache"),
+                          outputs=lambda: [script_file, audio_metadata] + listed_audio_files(audio_metadata)
+                                          + [timings_file],
+                          deps=["slides"],
+                          description="ステップ 2〜4/6: 原稿・音声・タイミング情報の生成（スライドごとに流す）")
+        stages = [stages[0], narration] + [stage for stage in stages
+                                           if stage.name in ("place", "install", "bundle", "render")]
+        stages[2].deps = ["narration"]
+    return stages, output_video, safe_topic
 
-    if not timings_file.exists():
-        raise RuntimeError(f"タイミングファイルが見つかりません: {timings_file}")
-
-    # ステップ5: Remotionプロジェクトにファイルをコピー
-    print(f"\n{'='*60}")
-    print("ステップ 5/6: Remotionプロジェクトへのファイル配置")
-    print(f"{'='*60}")
-
-    # タイミングJSONをコピー
-    shutil.copy(timings_file, remotion_dir / "timings.json")
-    print(f"コピー: {timings_file} -> {remotion_dir / 'timings.json'}")
-
-    # 音声ファイルをpublicディレクトリにコピー
-    with open(audio_metadata, 'r', encoding='utf-8') as f:
-        audio_data = json.load(f)
-
-    audio_public_dir = remotion_dir / "public" / "audio"
-    audio_public_dir.mkdir(exist_ok=True)
-
-    # タイミングデータを読み込んで、音声ファイルのパスを更新
-    with open(timings_file, 'r', encoding='utf-8') as f:
-        timings_data = json.load(f)
-
-    for slide in timings_data['slides']:
-        audio_src = Path(slide['audioFile'])
-        audio_dst = audio_public_dir / audio_src.name
-        shutil.copy(audio_src, audio_dst)
-        print(f"コピー: {audio_src} -> {audio_dst}")
-
-        # パスを相対パスに更新
-        slide['audioFile'] = f"audio/{audio_src.name}"
-
-    # 更新したタイミングデータを保存
-    with open(remotion_dir / "timings.json", 'w', encoding='utf-8') as f:
-        json.dump(timings_data, f, ensure_ascii=False, indent=2)
+def main():
+    parser = argparse.ArgumentParser(description="スライドからゆっくり動画風の動画を作成")
+    parser.add_argument('input_file', help="入力YAMLファイル")
+    parser.add_argument('--jobs', type=int, default=2, help="同時に実行するステージ数")
+    parser.add_argument('--force', action='store_true', help="最新のステージも含めて全ステップを実行する")
+    parser.add_argument('--isolate', action='store_true',
+                        help="各ステップを別のPythonプロセスで実行する（既定は同じプロセスで関数を呼び、データを直接渡す）")
+    parser.add_argument('--stream', action='store_true',
+                        help="原稿ができたスライドから音声・タイミングを生成する（全スライドの原稿を待たない）")
+    args = parser.parse_args()
+    if args.stream and args.isolate:
+        parser.error("--stream は同じプロセスで実行する場合だけ使えます（--isolate とは併用できません）")
+
+    input_file = args.input_file
 
-    print("ファイル配置完了")
+    if not os.path.exists(input_file):
+        print(f"エラー: 入力ファイルが見つかりません: {input_file}")
+        sys.exit(1)
 
-    # ステップ6: Remotionで動画をレンダリング
-    run_command(
-        ["npm", "install"],
-        cwd=remotion_dir,
-        description="ステップ 6/6: Remotionで動画をレンダリング（依存関係のインストール）"
-    )
+    # プロジェクトルートディレクトリ
+    root_dir = Path(__file__).resolve().parent.parent
 
-    # 出力ディレクトリを作成
-    output_dir = remotion_dir / "out"
-    output_dir.mkdir(exist_ok=True)
+    print(f"\n{'#'*60}")
+    print(f"# ゆっくり動画生成ワークフロー開始")
+    print(f"# 入力ファイル: {input_file}")
+    print(f"{'#'*60}\n")
 
-    run_command(
-        ["npm", "run", "build"],
-        cwd=remotion_dir,
-        description="動画のレンダリング"
-    )
+    # 入力の内容が前回と同じステップは実行しない（実行記録はトピックごとに .cache/pipeline に保存）
+    stages, output_video, safe_topic = build_stages(input_file, root_dir, isolate=args.isolate, stream=args.stream)
+    state_file = root_dir / ".cache" / "pipeline" / f"{safe_topic}.json"
+    results = run_pipeline(stages, state_file, jobs=args.jobs, force=args.force)
 
-    output_video = output_dir / "video.mp4"
+    skipped = [stage.name for stage in stages if not results[stage.name]]
+    if skipped:
+        print(f"\n最新のため省略したステップ: {', '.join(skipped)}")
 
     if not output_video.exists():
         raise RuntimeError(f"動画ファイルが生成されませんでした: {output_video}")
@@ -1,115 +1,437 @@
 #!/usr/bin/env python3
 """
 原稿から音声を生成するスクリプト
-gTTS (Google Translate TTS)を使用して音声を生成します
+gTTS (Google Translate TTS)などの音声合成エンジン（tts_backends.py）で音声を生成します
 """
 
 import sys
 import os
 import json
 import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from gtts import gTTS
-from pydub import AudioSegment
+import numpy as np
+from audio_utils import (decode_audio_bytes, change_speed, encode_audio, wav_bytes, concatenate_segments, probe_duration,
+                         frame_levels, trim_silence, gated_loudness, loudness_gain, SPEED_MODES)
+from subtitle_segments import split_text_into_segments
+from rate_limit import TokenBucket, backoff_delay
+from tts_cache import TTSCache
+from content_cache import cache_key
+from tts_backends import get_backend, BACKENDS
 
-def generate_audio_for_slide(script_text, output_file, max_retries=3, speed_factor=1.2):
+# 全スライドを連結したナレーションのファイル名（拡張子は出力形式）
+MASTER_NAME = 'narration'
+
+# 合成条件（キャッシュキーにも使う）
+TTS_LANG = 'ja'
+SPEED_FACTOR = 1.2
+
+def segment_cache_key(text, backend, speed_mode='resample'):
     """
-    1つの原稿から音声を生成（リトライ機能付き）
+    セグメント単位で合成した音声のキャッシュキー
 
     Args:
-        script_text: 原稿テキスト
-        output_file: 出力ファイルパス
+        text: セグメントのテキスト（改行を除いたもの）
+        backend: 音声合成エンジン
+        speed_mode: 速度変更の方式
+
+    Returns:
+        キャッシュキー
+    """
+    return cache_key(text=text, lang=TTS_LANG, speed_factor=SPEED_FACTOR, backend=backend.name,
+                     speed_mode=speed_mode, unit='segment')
+
+def slide_cache_key(text, backend, audio_format='mp3', speed_mode='resample', trim_pad=None, target_db=None):
+    """
+    スライド単位で合成した音声ファイルのキャッシュキー
+    後処理を指定した場合だけキーに含め、指定しない場合は以前のキャッシュをそのまま使う
+
+    Args:
+        text: スライドの原稿
+        backend: 音声合成エンジン
+        audio_format: 出力形式
+        speed_mode: 速度変更の方式
+        trim_pad: 先頭・末尾に残す無音（秒）
+        target_db: 正規化する平均レベル（dBFS）
+
+    Returns:
+        キャッシュキー
+    """
+    postprocess = {name: value for name, value in (('trim_pad', trim_pad), ('target_db', target_db))
+                   if value is not None}
+    return cache_key(text=text, lang=TTS_LANG, speed_factor=SPEED_FACTOR, backend=backend.name,
+                     format=audio_format, speed_mode=speed_mode, **postprocess)
+
+def synthesize_text(text, backend, max_retries=3, speed_factor=SPEED_FACTOR, limiter=None, speed_mode='resample',
+                    label=''):
+    """
+    テキストから音声を合成し、速度を調整したサンプル配列を返す（リトライ機能付き）
+
+    Args:
+        text: 合成するテキスト
+        backend: 音声合成エンジン（tts_backends.get_backendで作成）
         max_retries: 最大リトライ回数
         speed_factor: 音声速度の倍率（1.2 = 1.2倍速）
+        limiter: TTSリクエストのレート制限（TokenBucket、Noneの場合は制限なし）
+        speed_mode: 速度変更の方式（'resample': ピッチも変わる、'wsola' / 'phase_vocoder': ピッチを保つ）
+        label: エラー表示用の名前
+
+    Returns:
+        (サンプル配列, サンプリングレート)
     """
     for attempt in range(max_retries):
         try:
-            # gTTSで日本語音声を生成（一時ファイル）
-            temp_file = str(output_file).replace('.mp3', '_temp.mp3')
-            tts = gTTS(text=script_text, lang='ja', slow=False)
-            tts.save(temp_file)
-
-            # pydubで音声を速度調整
-            audio = AudioSegment.from_mp3(temp_file)
-            # 速度を上げる（frame_rateを変更）
-            faster_audio = audio._spawn(audio.raw_data, overrides={
-                "frame_rate": int(audio.frame_rate * speed_factor)
-            })
-            # 元のサンプルレートに戻す
-            faster_audio = faster_audio.set_frame_rate(audio.frame_rate)
-            faster_audio.export(output_file, format="mp3")
-
-            # 一時ファイルを削除
-            os.remove(temp_file)
-
-            return  # 成功したら終了
+            if limiter:
+                limiter.acquire()
+
+            # 音声合成エンジンからサンプル配列で受け取り、速度を上げる
+            samples, sample_rate = backend.synthesize(text)
+            return change_speed(samples, sample_rate, speed_factor, speed_mode), sample_rate
         except Exception as e:
-            wait_time = (attempt + 1) * 5
+            wait_time = backoff_delay(attempt)
             if attempt < max_retries - 1:
-                print(f"    エラー発生（試行 {attempt + 1}/{max_retries}）: {str(e)[:100]}")
-                print(f"    {wait_time}秒待機してリトライします...")
+                print(f"    エラー発生（{label} 試行 {attempt + 1}/{max_retries}）: {str(e)[:100]}\n"
+                      f"    {wait_time:.1f}秒待機してリトライします...")
                 time.sleep(wait_time)
             else:
                 print(f"    最大リトライ回数に達しました。エラー: {e}")
                 raise
 
-def generate_all_audio(script_file, output_dir):
+def postprocess_clip(samples, sample_rate, trim_pad=None):
     """
-    原稿ファイルから全ての音声を生成
+    合成した音声のレベルを1回の走査で測り、必要なら先頭・末尾の無音を削る
 
     Args:
-        script_file: 原稿JSONファイルのパス
+        samples: サンプル配列
+        sample_rate: サンプリングレート
+        trim_pad: 残す無音（秒）、Noneの場合は削らない
+
+    Returns:
+        (サンプル配列, frame_levelsの結果)
+    """
+    levels = frame_levels(samples, sample_rate)
+    if trim_pad is not None:
+        samples, levels = trim_silence(samples, sample_rate, levels, trim_pad)
+    return samples, levels
+
+def generate_audio_for_slide(script_text, output_file, max_retries=3, speed_factor=SPEED_FACTOR, limiter=None,
+                             speed_mode='resample', backend=None, trim_pad=None, target_db=None):
+    """
+    1つの原稿から音声を生成（リトライ機能付き）
+    合成結果はメモリ上で速度調整・無音の削除・音量の正規化を行い、出力形式で1回だけエンコードする
+
+    Args:
+        script_text: 原稿テキスト
+        output_file: 出力ファイルパス（拡張子で形式を決める: .mp3 / .wav / .flac）
+        max_retries: 最大リトライ回数
+        speed_factor: 音声速度の倍率（1.2 = 1.2倍速）
+        limiter: TTSリクエストのレート制限（TokenBucket、Noneの場合は制限なし）
+        speed_mode: 速度変更の方式（'resample': ピッチも変わる、'wsola' / 'phase_vocoder': ピッチを保つ）
+        backend: 音声合成エンジン（Noneの場合はgTTS）
+        trim_pad: 先頭・末尾に残す無音（秒）、Noneの場合は削らない
+        target_db: 平均レベルの目標（dBFS）、Noneの場合は正規化しない
+
+    Returns:
+        音声の長さ（秒）
+    """
+    backend = backend or get_backend('gtts', TTS_LANG)
+    samples, sample_rate = synthesize_text(script_text, backend, max_retries, speed_factor, limiter, speed_mode,
+                                           label=Path(output_file).name)
+    samples, (powers, peaks) = postprocess_clip(samples, sample_rate, trim_pad)
+    if target_db is not None:
+        samples = samples * loudness_gain(gated_loudness(powers), peaks.max(initial=0.0), target_db)
+    encode_audio(samples, sample_rate, output_file)
+    return len(samples) / sample_rate
+
+def generate_joined_audio(slides, segment_lists, output_dir, executor, limiter, cache, backend, audio_format='mp3',
+                          speed_mode='resample', segment_gap=0.2, trim_pad=None, loudness='off', target_db=-20.0,
+                          record_segments=True, master=False, join_lines=False):
+    """
+    セグメントごとに合成した音声を、スライドごとに無音を挟んで連結する
+    同じテキストのセグメントは（スライドやデッキをまたいでも）1回だけ合成し、
+    全スライドを揃えてから音量を正規化するため、デッキ全体で1つのゲインも使える
+
+    Args:
+        slides: 原稿JSONのslides
+        segment_lists: スライドごとのセグメント（字幕セグメント、またはスライドの原稿全体）
         output_dir: 音声ファイルの出力ディレクトリ
+        executor: セグメントを並行して合成するスレッドプール
+        limiter: TTSリクエストのレート制限
+        cache: 音声キャッシュ（セグメント単位で保存、Noneの場合は使わない）
+        backend: 音声合成エンジン
+        audio_format: 出力形式
+        speed_mode: 速度変更の方式
+        segment_gap: セグメント間の無音（秒）
+        trim_pad: セグメントの先頭・末尾に残す無音（秒）、Noneの場合は削らない
+        loudness: 音量の正規化（'off', 'clip': スライドごと, 'deck': デッキ全体で1つのゲイン）
+        target_db: 平均レベルの目標（dBFS）
+        record_segments: 各セグメントの開始・終了秒をメタデータに記録するかどうか
+        master: スライドごとのファイルの代わりに、全スライドを連結した1つのファイルを1回だけエンコードする
+        join_lines: セグメント内の改行（字幕の行の区切り）を除いて合成する
+            （字幕セグメントの場合。スライドの原稿全体は段落の改行もそのまま合成する）
+
+    Returns:
+        メタデータのaudio_files
     """
-    # 原稿ファイルを読み込む
-    with open(script_file, 'r', encoding='utf-8') as f:
-        script_data = json.load(f)
+    def speech_text(segment):
+        return segment.replace('\n', '') if join_lines else segment
 
-    slides = script_data['slides']
-    output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
+    keys = {}
+    for segments in segment_lists:
+        for segment in segments:
+            text = speech_text(segment)
+            keys.setdefault(text, segment_cache_key(text, backend, speed_mode))
+
+    def synthesize_segment(text):
+        data = cache.read(keys[text]) if cache else None
+        if data is not None:
+            samples, sample_rate = decode_audio_bytes(data)
+        else:
+            samples, sample_rate = synthesize_text(text, backend, limiter=limiter, speed_mode=speed_mode,
+                                                   label=text[:20])
+            if cache:
+                cache.write(keys[text], wav_bytes(samples, sample_rate))
+        return postprocess_clip(samples, sample_rate, trim_pad), sample_rate
+
+    texts = list(keys)
+    print(f"  セグメント数: {sum(len(segments) for segments in segment_lists)}（重複を除いて {len(texts)}）")
+    chunks = dict(zip(texts, executor.map(synthesize_segment, texts)))
+
+    # スライドごとに連結する（無音のギャップはゲートで除かれるため、レベルはセグメントのものを連結すればよい）
+    rendered = []
+    for segments in segment_lists:
+        parts = [chunks[speech_text(segment)] for segment in segments]
+        samples, sample_rate, offsets = concatenate_segments([(clip, rate) for (clip, _), rate in parts], segment_gap)
+        powers = np.concatenate([levels[0] for (_, levels), _ in parts])
+        peak = max(levels[1].max(initial=0.0) for (_, levels), _ in parts)
+        rendered.append((samples, sample_rate, offsets, powers, peak))
 
-    print(f"音声生成中: {len(slides)}スライド")
+    if loudness == 'deck':
+        deck_gain = loudness_gain(gated_loudness(np.concatenate([r[3] for r in rendered])),
+                                  max(r[4] for r in rendered), target_db)
+        print(f"  デッキ全体の音量ゲイン: {20 * np.log10(deck_gain):+.1f}dB")
+
+    clips = []
+    for samples, sample_rate, offsets, powers, peak in rendered:
+        if loudness == 'deck':
+            samples = samples * deck_gain
+        elif loudness == 'clip':
+            samples = samples * loudness_gain(gated_loudness(powers), peak, target_db)
+        clips.append((samples, sample_rate))
+
+    if master:
+        # スライド間は無音を挟まずに連結する（タイミング生成でもスライドは隙間なく並ぶ）
+        master_file = output_dir / f"{MASTER_NAME}.{audio_format}"
+        master_samples, master_rate, slide_offsets = concatenate_segments(clips, 0.0)
+        master_file.unlink(missing_ok=True)
+        encode_audio(master_samples, master_rate, master_file)
+        print(f"  全スライドを連結して保存: {master_file}（{len(master_samples) / master_rate:.2f}秒）")
 
-    # 各スライドの音声を生成
     audio_files = []
-    for i, slide in enumerate(slides):
-        output_file = output_dir / f"slide_{slide['index']:02d}.mp3"
-        print(f"  スライド {slide['index']}: {slide['title']}")
+    for i, (slide, segments, (_, _, offsets, _, _)) in enumerate(zip(slides, segment_lists, rendered)):
+        samples, sample_rate = clips[i]
+        if master:
+            start, end = slide_offsets[i]
+            audio_info = {
+                'index': slide['index'],
+                'title': slide['title'],
+                'audio_file': str(master_file),
+                'script': slide['script'],
+                'audio_offset': start,
+                'duration': end - start,
+                # 連結ファイル全体は1スライドの変更でも変わるため、スライドの区間のハッシュをタイミングキャッシュに使う
+                'audio_hash': hashlib.sha256(
+                    master_samples[round(start * master_rate):round(end * master_rate)].tobytes()).hexdigest()
+            }
+        else:
+            output_file = output_dir / f"slide_{slide['index']:02d}.{audio_format}"
+            # 前回キャッシュからハードリンクした出力を上書きするとキャッシュまで書き換わるため先に削除する
+            output_file.unlink(missing_ok=True)
+            encode_audio(samples, sample_rate, output_file)
+            print(f"  スライド {slide['index']}: {slide['title']}\n    保存完了: {output_file}（{len(segments)}セグメント）")
+            audio_info = {
+                'index': slide['index'],
+                'title': slide['title'],
+                'audio_file': str(output_file),
+                'script': slide['script'],
+                'duration': len(samples) / sample_rate
+            }
 
-        generate_audio_for_slide(slide['script'], str(output_file))
+        if record_segments:
+            audio_info['segments'] = [
+                {'text': segment, 'start': start, 'end': end}
+                for segment, (start, end) in zip(segments, offsets)
+            ]
+        audio_files.append(audio_info)
 
-        audio_files.append({
-            'index': slide['index'],
-            'title': slide['title'],
-            'audio_file': str(output_file),
-            'script': slide['script']
-        })
+    return audio_files
 
-        print(f"    保存完了: {output_file}")
+def generate_slide_audio(slide, output_dir, limiter, cache, backend, audio_format='mp3', speed_mode='resample',
+                         trim_pad=None, target_db=None):
+    """
+    1スライド分の音声を生成する（キャッシュに同じ合成条件の音声がある場合は合成せずに配置する）
 
-        # レート制限対策：各スライド間に2秒待機（最後のスライドを除く）
-        if i < len(slides) - 1:
-            print(f"    2秒待機中...")
-            time.sleep(2)
+    Args:
+        slide: 原稿データのスライド（index, title, script）
+        output_dir: 音声ファイルの出力ディレクトリ
+        limiter: TTSリクエストのレート制限（TokenBucket）
+        cache: 音声キャッシュ（TTSCache、Noneの場合は使わない）
+        backend: 音声合成エンジン
+        audio_format: 出力形式
+        speed_mode: 速度変更の方式
+        trim_pad: 先頭・末尾に残す無音（秒）、Noneの場合は削らない
+        target_db: スライドごとに正規化する平均レベル（dBFS）、Noneの場合は正規化しない
 
-    # メタデータを保存
-    metadata_file = output_dir / 'audio_metadata.json'
+    Returns:
+        メタデータのaudio_filesの要素
+    """
+    output_file = Path(output_dir) / f"slide_{slide['index']:02d}.{audio_format}"
+    key = slide_cache_key(slide['script'], backend, audio_format, speed_mode, trim_pad, target_db)
+
+    audio_info = {
+        'index': slide['index'],
+        'title': slide['title'],
+        'audio_file': str(output_file),
+        'script': slide['script']
+    }
+    if cache and cache.fetch(key, output_file):
+        duration = probe_duration(output_file)
+        print(f"  スライド {slide['index']}: {slide['title']}\n    キャッシュから配置: {output_file}")
+    else:
+        # 前回キャッシュからハードリンクした出力を上書きするとキャッシュまで書き換わるため先に削除する
+        output_file.unlink(missing_ok=True)
+        duration = generate_audio_for_slide(slide['script'], str(output_file), limiter=limiter,
+                                            speed_mode=speed_mode, backend=backend, trim_pad=trim_pad,
+                                            target_db=target_db)
+        if cache:
+            cache.store(key, output_file)
+        print(f"  スライド {slide['index']}: {slide['title']}\n    保存完了: {output_file}")
+
+    # 長さをメタデータに記録し、タイミング生成で音声を読み直さなくてよいようにする
+    if duration is not None:
+        audio_info['duration'] = duration
+    return audio_info
+
+def save_audio_metadata(audio_files, output_dir):
+    """
+    音声メタデータ（audio_metadata.json）を保存
+
+    Returns:
+        (メタデータファイルのパス, メタデータ)
+    """
+    metadata_file = Path(output_dir) / 'audio_metadata.json'
+    metadata = {
+        'audio_files': audio_files,
+        'total_slides': len(audio_files)
+    }
     with open(metadata_file, 'w', encoding='utf-8') as f:
-        json.dump({
-            'audio_files': audio_files,
-            'total_slides': len(slides)
-        }, f, ensure_ascii=False, indent=2)
+        json.dump(metadata, f, ensure_ascii=False, indent=2)
 
     print(f"\n音声メタデータを保存: {metadata_file}")
-    return str(metadata_file)
+    return metadata_file, metadata
+
+def generate_all_audio(script_file, output_dir, workers=1, rate=0.5, burst=1, cache=None, audio_format='mp3',
+                       speed_mode='resample', chunking='slide', segment_gap=0.2, backend=None,
+                       trim_pad=None, loudness='off', target_db=-20.0, master=False, return_data=False):
+    """
+    原稿ファイルから全ての音声を生成
+    workers個のスライドを並行して生成し、TTSリクエストはトークンバケットで rate 回/秒 に制限する
+    キャッシュに同じ合成条件の音声がある場合は合成せずに再利用する
+
+    Args:
+        script_file: 原稿JSONファイルのパス、または読み込み済みの原稿データ
+        output_dir: 音声ファイルの出力ディレクトリ
+        workers: 同時に生成するスライド数
+        rate: TTSリクエストの上限（回/秒）
+        burst: 連続で送れるTTSリクエスト数
+        cache: 音声キャッシュ（TTSCache、Noneの場合は使わない）
+        audio_format: 出力形式（'mp3'、後段の処理向けに可逆の 'wav' / 'flac'）
+        speed_mode: 速度変更の方式（SPEED_MODESのいずれか）
+        chunking: 合成の単位（'slide': スライドごと、'segment': 字幕セグメントごとに合成して連結）
+        segment_gap: chunking='segment' の場合のセグメント間の無音（秒）
+        backend: 音声合成エンジン（Noneの場合はgTTS）
+        trim_pad: 先頭・末尾に残す無音（秒）、Noneの場合は削らない
+        loudness: 音量の正規化（'off', 'clip': スライドごと, 'deck': デッキ全体で1つのゲイン）
+        target_db: 平均レベルの目標（dBFS）
+        master: 全スライドを連結した1つのファイル（narration.<形式>）を出力し、各スライドの開始秒を記録する
+        return_data: Trueの場合はメタデータファイルのパスの代わりに保存したメタデータを返す
+    """
+    # 原稿ファイルを読み込む（同じプロセスの前の工程から受け取った場合はそのまま使う）
+    if isinstance(script_file, dict):
+        script_data = script_file
+    else:
+        with open(script_file, 'r', encoding='utf-8') as f:
+            script_data = json.load(f)
+
+    slides = script_data['slides']
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"音声生成中: {len(slides)}スライド（並列数 {workers}、{rate}回/秒、バースト {burst}、合成単位 {chunking}）")
+
+    # レート制限対策：全スレッドでトークンバケットを共有する
+    limiter = TokenBucket(rate, burst)
+    backend = backend or get_backend('gtts', TTS_LANG)
+    clip_target = target_db if loudness == 'clip' else None
+
+    # 完了順に関わらずスライド順でメタデータを作る
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        if chunking == 'segment' or loudness == 'deck' or master:
+            # 字幕と同じ区切りで分割し、音声と字幕のセグメントを1対1に対応させる
+            if chunking == 'segment':
+                segment_lists = [split_text_into_segments(slide['script']) or [slide['script']] for slide in slides]
+            else:
+                segment_lists = [[slide['script']] for slide in slides]
+            audio_files = generate_joined_audio(
+                slides, segment_lists, output_dir, executor, limiter, cache, backend,
+                audio_format=audio_format, speed_mode=speed_mode, segment_gap=segment_gap, trim_pad=trim_pad,
+                loudness=loudness, target_db=target_db, record_segments=chunking == 'segment', master=master,
+                join_lines=chunking == 'segment')
+        else:
+            audio_files = list(executor.map(
+                lambda slide: generate_slide_audio(slide, output_dir, limiter, cache, backend, audio_format=audio_format,
+                                                   speed_mode=speed_mode, trim_pad=trim_pad, target_db=clip_target),
+                slides))
+
+    if cache:
+        removed = cache.evict()
+        print(f"\n音声キャッシュ: {cache.summary()}" + (f"、{removed}件を削除" if removed else ""))
+
+    # メタデータを保存
+    metadata_file, metadata = save_audio_metadata(audio_files, output_dir)
+    return metadata if return_data else str(metadata_file)
 
 def main():
-    if len(sys.argv) < 2:
-        print("使用方法: python generate_audio.py <script_json_file>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="原稿から音声を生成")
+    parser.add_argument('script_file', help="原稿JSONファイル")
+    parser.add_argument('--workers', type=int, default=1, help="同時に生成するスライド数")
+    parser.add_argument('--rate', type=float, default=0.5, help="TTSリクエストの上限（回/秒）")
+    parser.add_argument('--burst', type=int, default=1, help="連続で送れるTTSリクエスト数")
+    parser.add_argument('--format', choices=['mp3', 'wav', 'flac'], default='mp3',
+                        help="音声の出力形式（wav/flacは可逆で後段の処理向け）")
+    parser.add_argument('--speed-mode', choices=SPEED_MODES, default='resample',
+                        help="速度変更の方式（resample: ピッチも変わる, wsola / phase_vocoder: ピッチを保つ）")
+    parser.add_argument('--chunking', choices=['slide', 'segment'], default='slide',
+                        help="合成の単位（segment: 字幕セグメントごとに合成して連結し、区切り位置をメタデータに記録）")
+    parser.add_argument('--segment-gap', type=float, default=0.2, help="セグメント間の無音（秒）")
+    parser.add_argument('--trim-pad', type=float, default=None,
+                        help="先頭・末尾の無音を削って残す長さ（秒）、指定しない場合は削らない")
+    parser.add_argument('--loudness', choices=['off', 'clip', 'deck'], default='off',
+                        help="音量の正規化（clip: スライドごと, deck: デッキ全体で1つのゲイン）")
+    parser.add_argument('--target-db', type=float, default=-20.0, help="正規化する平均レベル（dBFS）")
+    parser.add_argument('--master', action='store_true',
+                        help="スライドごとのファイルの代わりに全スライドを連結した narration.<形式> を1つ出力する")
+    parser.add_argument('--backend', choices=BACKENDS, default='gtts',
+                        help="音声合成エンジン（gtts, tone: オフラインの動作確認用, http: gTTS形式のサーバー）")
+    parser.add_argument('--tts-url', help="httpエンジンのエンドポイント（例: http://127.0.0.1:8765/translate_tts）")
+    parser.add_argument('--cache-dir', help="音声キャッシュのディレクトリ（既定: TTS_CACHE_DIR または .cache/tts）")
+    parser.add_argument('--cache-size-mb', type=int, default=1024, help="音声キャッシュの容量上限（MB）")
+    parser.add_argument('--no-cache', action='store_true', help="音声キャッシュを使わずに全スライドを合成する")
+    args = parser.parse_args()
 
-    script_file = sys.argv[1]
+    script_file = args.script_file
 
     if not os.path.exists(script_file):
         print(f"エラー: 原稿ファイルが見つかりません: {script_file}")
@@ -120,7 +442,14 @@ def main():
     output_dir = script_path.parent.parent / "audio_output"
 
     # 音声を生成
-    metadata_file = generate_all_audio(script_file, output_dir)
+    cache = None if args.no_cache else TTSCache(args.cache_dir, args.cache_size_mb * 1024 * 1024)
+    metadata_file = generate_all_audio(script_file, output_dir, workers=args.workers,
+                                       rate=args.rate, burst=args.burst, cache=cache,
+                                       audio_format=args.format, speed_mode=args.speed_mode,
+                                       chunking=args.chunking, segment_gap=args.segment_gap,
+                                       backend=get_backend(args.backend, TTS_LANG, args.tts_url),
+                                       trim_pad=args.trim_pad, loudness=args.loudness, target_db=args.target_db,
+                                       master=args.master)
 
     print(f"\n音声生成完了！")
 
@@ -9,9 +9,37 @@ import os
 import json
 import re
 import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-import google.generativeai as genai
-from google.api_core import exceptions as google_exceptions
+from rate_limit import AdaptiveTokenBucket, backoff_delay
+from script_cache import ScriptCache, DEFAULT_TTL_DAYS
+from content_cache import cache_key
+from marp_parser import load_deck
+
+MODEL_NAME = 'gemini-2.0-flash-exp'
+
+# プロンプトのバージョン（プロンプトを変えたら上げて、キャッシュ済みの原稿を使わないようにする）
+PROMPT_VERSION = 1
+
+# Gemini APIの無料枠は1分間に10リクエストまで
+DEFAULT_RPM = 10
+
+# 原稿の要件（1枚ずつの依頼とまとめての依頼で共通）
+SCRIPT_REQUIREMENTS = """要件:
+1. 自然な話し言葉で書いてください
+2. 1スライドあたり30〜60秒程度の長さにしてください
+3. 箇条書きは自然な文章に変換してください
+4. 聞き手に語りかけるような口調にしてください
+5. 「えー」「あのー」などの言葉は入れないでください
+6. スライド番号や「このスライドでは」などの言及は避けてください"""
+
+# まとめて依頼した応答のJSONを囲むコードブロック
+JSON_FENCE_PATTERN = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+# レート制限エラーのメッセージに含まれる待機時間の指示（"retry in 12.3s" / "retry_delay { seconds: 12 }"）
+RETRY_DELAY_PATTERN = re.compile(r'retry(?:_delay\s*\{\s*seconds:|\s+in)\s*([\d.]+)', re.IGNORECASE)
 
 def parse_marp_slides(slide_file):
     """
@@ -23,37 +51,81 @@ def parse_marp_slides(slide_file):
     Returns:
         スライドのリスト（各スライドは辞書形式）
     """
-    with open(slide_file, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # スライドを分割（---で区切られている）
-    slides_raw = content.split('---')
-
     slides = []
-    for i, slide_raw in enumerate(slides_raw):
-        slide_raw = slide_raw.strip()
-        if not slide_raw or slide_raw.startswith('marp:'):
-            continue
-
-        # タイトルと内容を抽出
-        lines = slide_raw.split('\n')
-        title = ''
+    for slide in load_deck(slide_file).slides:
+        # タイトルの見出しの行と空行を除いた本文
         content_lines = []
-
-        for line in lines:
-            if line.startswith('# '):
-                title = line[2:].strip()
+        title_pending = bool(slide.title)
+        for line in slide.body.split('\n'):
+            if title_pending and line.lstrip().startswith('# '):
+                title_pending = False
             elif line.strip():
                 content_lines.append(line)
 
         slides.append({
-            'index': len(slides) + 1,
-            'title': title,
+            'index': slide.index,
+            'title': slide.title,
             'content': '\n'.join(content_lines)
         })
 
     return slides
 
+# 原稿から削除する宣言的フレーズ（行頭から最初の「。」または改行まで）
+# 行頭の接続詞と、行内のキーワードのどちらかで判定する（起動時に1回だけコンパイルする）
+DECLARATIVE_OPENERS = r'(では|それでは|次に|続いて|さて|それから)'
+DECLARATIVE_KEYWORDS = [
+    # スライド作成・番号に関する言及
+    r'原稿を作成',
+    r'スライド\d+',
+
+    # プレゼン構造の言及
+    r'(このスライド|今回|今日|本日|ここ)(では|で|から|について)',
+
+    # その他のメタ的な言及
+    r'(ご紹介|説明|見て|ご覧|解説)(します|いたします|しましょう|ください)',
+]
+
+# 元の適用順（接続詞での始まり＝スライド遷移の言及は3番目）
+DECLARATIVE_PATTERNS = [
+    re.compile(pattern, re.MULTILINE | re.IGNORECASE)
+    for pattern in [rf'^.*?{keyword}.*?[。\n]' for keyword in DECLARATIVE_KEYWORDS[:2]]
+                   + [rf'^{DECLARATIVE_OPENERS}[、，]?.*?[。\n]']
+                   + [rf'^.*?{keyword}.*?[。\n]' for keyword in DECLARATIVE_KEYWORDS[2:]]
+]
+
+# いずれかのパターンが行頭で一致するかを1回の走査で判定する（キーワードの前の .*? を共通にする）
+DECLARATIVE_PATTERN = re.compile(
+    rf'^(?:{DECLARATIVE_OPENERS}[、，]?|.*?(?:{"|".join(DECLARATIVE_KEYWORDS)})).*?[。\n]',
+    re.MULTILINE | re.IGNORECASE
+)
+
+def _clean_line(script, start, stages):
+    """
+    start から始まる行の行頭にパターンを先頭から stages 個まで順に適用する
+    パターンごとに全体へ re.sub を繰り返した場合と同じ結果になるよう、
+    改行まで削除して次の行とつながった場合は、次の行にそれより前のパターンを適用してから続ける
+
+    Returns:
+        (残ったテキスト, 次の行の開始位置)
+    """
+    end = script.find('\n', start) + 1 or len(script)
+    text = script[start:end]
+    if not DECLARATIVE_PATTERN.match(text):
+        return text, end  # どのパターンにも一致しない行はそのまま
+
+    stage = 0
+    while stage < stages:
+        match = DECLARATIVE_PATTERNS[stage].match(text)
+        if not match:
+            stage += 1
+        elif match.end() == len(text) and text.endswith('\n') and end < len(script):
+            # 改行まで削除した：次の行が行頭に来るので、同じパターンをもう一度適用する
+            text, end = _clean_line(script, end, stage)
+        else:
+            text = text[match.end():]
+            stage += 1
+    return text, end
+
 def clean_declarative_phrases(script):
     """
     原稿から不要な宣言的フレーズを削除
@@ -64,45 +136,49 @@ def clean_declarative_phrases(script):
     Returns:
         クリーンアップされた原稿テキスト
     """
-    # 削除するパターン（正規表現）
-    patterns_to_remove = [
-        # スライド作成・番号に関する言及
-        r'^.*?原稿を作成.*?[。\n]',
-        r'^.*?スライド\d+.*?[。\n]',
-
-        # 接続詞での始まり（スライド遷移の言及）
-        r'^(では|それでは|次に|続いて|さて|それから)[、，]?.*?[。\n]',
-
-        # プレゼン構造の言及
-        r'^.*?(このスライド|今回|今日|本日|ここ)(では|で|から|について).*?[。\n]',
-
-        # その他のメタ的な言及
-        r'^.*?(ご紹介|説明|見て|ご覧|解説)(します|いたします|しましょう|ください).*?[。\n]',
-    ]
-
-    cleaned = script
-    for pattern in patterns_to_remove:
-        cleaned = re.sub(pattern, '', cleaned, flags=re.MULTILINE | re.IGNORECASE)
+    # 結合したパターンで一致する行だけを探し、その間の行はそのまま残す（全体を1回だけ走査する）
+    cleaned = []
+    position = 0
+    while True:
+        match = DECLARATIVE_PATTERN.search(script, position)
+        if not match:
+            cleaned.append(script[position:])
+            break
+        cleaned.append(script[position:match.start()])
+        text, position = _clean_line(script, match.start(), len(DECLARATIVE_PATTERNS))
+        cleaned.append(text)
+    cleaned = ''.join(cleaned)
 
     # 先頭の空白行を削除
     cleaned = cleaned.lstrip('\n').strip()
 
     return cleaned
 
-def generate_script_for_slide(model, slide, total_slides, max_retries=3):
+def retry_after_hint(error):
     """
-    1枚のスライドに対する原稿を生成（リトライ機能付き）
+    レート制限エラーから待機時間の指示を取り出す
+
+    Args:
+        error: ResourceExhausted例外
+
+    Returns:
+        待機する秒数、指示がない場合はNone
+    """
+    match = RETRY_DELAY_PATTERN.search(str(error))
+    return float(match.group(1)) if match else None
+
+def build_prompt(slide, total_slides):
+    """
+    1枚のスライドの原稿を依頼するプロンプトを作る
 
     Args:
-        model: Gemini モデル
         slide: スライド情報（辞書）
         total_slides: 総スライド数
-        max_retries: 最大リトライ回数
 
     Returns:
-        生成された原稿テキスト
+        プロンプト
     """
-    prompt = f"""
+    return f"""
 あなたはプレゼンテーションの原稿を作成する専門家です。
 以下のスライド情報から、自然で分かりやすい原稿を日本語で作成してください。
 
@@ -111,87 +187,324 @@ def generate_script_for_slide(model, slide, total_slides, max_retries=3):
 内容:
 {slide['content']}
 
-要件:
-1. 自然な話し言葉で書いてください
-2. 1スライドあたり30〜60秒程度の長さにしてください
-3. 箇条書きは自然な文章に変換してください
-4. 聞き手に語りかけるような口調にしてください
-5. 「えー」「あのー」などの言葉は入れないでください
-6. スライド番号や「このスライドでは」などの言及は避けてください
+{SCRIPT_REQUIREMENTS}
 
 原稿のみを出力してください（説明や補足は不要です）。
 """
 
-    for attempt in range(max_retries):
-        try:
-            response = model.generate_content(prompt)
-            script = response.text.strip()
+def build_batch_prompt(slides, total_slides):
+    """
+    複数のスライドの原稿をまとめて依頼するプロンプトを作る
+    応答はスライド番号をキー、原稿を値とするJSONで受け取る
+
+    Args:
+        slides: スライド情報のリスト
+        total_slides: 総スライド数
+
+    Returns:
+        プロンプト
+    """
+    sections = "\n".join(
+        f"""
+スライド番号: {slide['index']} / {total_slides}
+タイトル: {slide['title']}
+内容:
+{slide['content']}
+"""
+        for slide in slides
+    )
+    example = ", ".join(f'"{slide["index"]}": "原稿"' for slide in slides)
+    return f"""
+あなたはプレゼンテーションの原稿を作成する専門家です。
+以下の{len(slides)}枚のスライド情報から、スライドごとに自然で分かりやすい原稿を日本語で作成してください。
+{sections}
+{SCRIPT_REQUIREMENTS}
+
+スライド番号を文字列のキー、原稿を値とするJSONオブジェクトのみを出力してください（例: {{{example}}}）。
+"""
+
+def parse_batch_response(response, slides):
+    """
+    まとめて依頼した応答からスライドごとの原稿を取り出す
+
+    Args:
+        response: 応答のテキスト
+        slides: 依頼したスライド情報のリスト
 
-            # 不要な宣言的フレーズを削除
-            script = clean_declarative_phrases(script)
+    Returns:
+        スライド番号 -> 原稿 の辞書（取り出せなかったスライドは含まない）
+    """
+    try:
+        data = json.loads(JSON_FENCE_PATTERN.sub('', response.strip()))
+    except ValueError:
+        return {}
+    if not isinstance(data, dict):
+        return {}
+
+    scripts = {}
+    for slide in slides:
+        script = data.get(str(slide['index']))
+        if isinstance(script, str) and script.strip():
+            scripts[slide['index']] = script
+    return scripts
+
+def script_cache_key(slide):
+    """スライドの原稿のキャッシュキー（モデル・プロンプトのバージョン・タイトルと内容のハッシュ）"""
+    return cache_key(model=MODEL_NAME, prompt_version=PROMPT_VERSION, title=slide['title'], content=slide['content'])
+
+def request_script(model, prompt, label='', max_retries=5, limiter=None, generation_config=None):
+    """
+    Geminiに原稿を依頼する（リトライ機能付き）
 
-            return script
+    Args:
+        model: Gemini モデル
+        prompt: プロンプト
+        label: 表示用の名前
+        max_retries: 最大リトライ回数
+        limiter: リクエストのレート制限（AdaptiveTokenBucket、Noneの場合は制限なし）
+        generation_config: 生成の設定（JSONで応答させる場合など）
+
+    Returns:
+        応答のテキスト
+    """
+    from google.api_core import exceptions as google_exceptions
+
+    for attempt in range(max_retries):
+        try:
+            if limiter:
+                limiter.acquire()
+            if generation_config:
+                response = model.generate_content(prompt, generation_config=generation_config)
+            else:
+                response = model.generate_content(prompt)
+            if limiter:
+                limiter.on_success()
+            return response.text
         except google_exceptions.ResourceExhausted as e:
+            # レート制限エラー：全スレッドで共有するレートを下げる
+            # サーバーの待機指示はリミッターが全スレッドに適用するため、ここでは指示がない場合だけバックオフする
+            retry_after = retry_after_hint(e)
+            if limiter:
+                limiter.on_throttle(retry_after)
             if attempt < max_retries - 1:
-                wait_time = 45  # レート制限エラーの場合は45秒待機
-                print(f"  レート制限エラー（試行 {attempt + 1}/{max_retries}）")
-                print(f"  {wait_time}秒待機してリトライします...")
+                if retry_after is None:
+                    wait_time = backoff_delay(attempt)
+                else:
+                    wait_time = 0.0 if limiter else retry_after
+                print(f"  {label}: レート制限エラー（試行 {attempt + 1}/{max_retries}）")
+                if retry_after is not None:
+                    print(f"  サーバーの指示により{retry_after:.1f}秒待機してリトライします...")
+                else:
+                    print(f"  {wait_time:.1f}秒待機してリトライします...")
                 time.sleep(wait_time)
             else:
-                print(f"  最大リトライ回数に達しました。エラー: {e}")
+                print(f"  {label}: 最大リトライ回数に達しました。エラー: {e}")
                 raise
         except Exception as e:
             if attempt < max_retries - 1:
-                wait_time = 10
-                print(f"  エラー発生（試行 {attempt + 1}/{max_retries}）: {str(e)[:100]}")
-                print(f"  {wait_time}秒待機してリトライします...")
+                wait_time = backoff_delay(attempt)
+                print(f"  {label}: エラー発生（試行 {attempt + 1}/{max_retries}）: {str(e)[:100]}")
+                print(f"  {wait_time:.1f}秒待機してリトライします...")
                 time.sleep(wait_time)
             else:
-                print(f"  最大リトライ回数に達しました。エラー: {e}")
+                print(f"  {label}: 最大リトライ回数に達しました。エラー: {e}")
                 raise
 
-def generate_full_script(slide_file, output_file):
+def generate_script_for_slide(model, slide, total_slides, max_retries=5, limiter=None):
     """
-    スライドファイル全体の原稿を生成
+    1枚のスライドに対する原稿を生成（リトライ機能付き）
 
     Args:
-        slide_file: スライドファイルのパス
-        output_file: 出力ファイルのパス
+        model: Gemini モデル
+        slide: スライド情報（辞書）
+        total_slides: 総スライド数
+        max_retries: 最大リトライ回数
+        limiter: リクエストのレート制限（AdaptiveTokenBucket、Noneの場合は制限なし）
+
+    Returns:
+        生成された原稿テキスト
+    """
+    response = request_script(model, build_prompt(slide, total_slides), f"スライド {slide['index']}", max_retries, limiter)
+
+    # 不要な宣言的フレーズを削除
+    return clean_declarative_phrases(response.strip())
+
+def create_model():
+    """
+    Gemini APIのモデルを初期化
+
+    Returns:
+        Gemini モデル
     """
     # APIキーの確認
     api_key = os.environ.get('GOOGLE_AI_API_KEY')
     if not api_key:
         raise ValueError("GOOGLE_AI_API_KEY環境変数が設定されていません")
 
-    # Gemini APIの初期化
+    # Gemini APIの初期化（原稿の整形などはSDKなしでも使えるよう、ここで読み込む）
+    import google.generativeai as genai
     genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.0-flash-exp')
+    return genai.GenerativeModel(MODEL_NAME)
+
+def journal_path(output_file):
+    """原稿JSONに対応するジャーナル（生成済みの応答を1行ずつ追記するJSONL）のパス"""
+    return Path(output_file).with_suffix('.journal.jsonl')
+
+def load_journal(journal_file):
+    """
+    ジャーナルから生成済みの応答を読み込む
+    中断時に書きかけだった行など、読めない行は無視する
+
+    Args:
+        journal_file: ジャーナルのパス
+
+    Returns:
+        入力のハッシュ -> 応答 の辞書
+    """
+    responses = {}
+    try:
+        with open(journal_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    responses[entry['key']] = entry['response']
+                except (ValueError, KeyError, TypeError):
+                    continue
+    except FileNotFoundError:
+        pass
+    return responses
+
+def script_entry(slide, response):
+    """応答から宣言的フレーズを削除して、原稿データのスライド {index, title, script} を作る"""
+    return {
+        'index': slide['index'],
+        'title': slide['title'],
+        'script': clean_declarative_phrases(response.strip())
+    }
+
+def generate_full_script(slide_file, output_file, workers=4, rpm=DEFAULT_RPM, cache=None, refresh=False,
+                         batch_size=1, return_data=False, on_script=None):
+    """
+    スライドファイル全体の原稿を生成
+    workers個のリクエストを並行して送り、リクエスト数は1分間に rpm 回までに制限する
+    （レート制限エラーでは一時的に下げ、成功が続くと rpm まで戻す）
 
+    Args:
+        slide_file: スライドファイルのパス
+        output_file: 出力ファイルのパス
+        workers: 同時に送るリクエスト数
+        rpm: 1分間あたりのリクエスト数の上限
+        cache: 原稿キャッシュ（ScriptCache、Noneの場合は使わない）
+        refresh: キャッシュ・ジャーナルを読まずに全スライドを生成し直す（結果はキャッシュに保存する）
+        batch_size: 1回のリクエストでまとめて依頼するスライド数（1の場合は1枚ずつ）
+        return_data: Trueの場合は出力ファイルのパスの代わりに保存した原稿データを返す（同じプロセスの次の工程に渡す）
+        on_script: スライドの原稿が揃うたびに {index, title, script} を渡して呼ぶ関数（完了順、別スレッドから呼ばれる）
+                   全スライドが揃うのを待たずに次の工程を始めるために使う
+
+    生成した応答は完了するたびにジャーナルに追記し、途中で失敗しても再実行時に続きから生成する
+    （全スライドが揃って原稿を保存したらジャーナルは削除する）
+    """
     # スライドを解析
     print(f"スライドを解析中: {slide_file}")
     slides = parse_marp_slides(slide_file)
     print(f"スライド数: {len(slides)}")
 
-    # 各スライドの原稿を生成
-    scripts = []
-    for i, slide in enumerate(slides):
+    # 前回の実行が途中で失敗した場合は、ジャーナルにある入力が同じスライドを生成し直さない
+    # （refresh では前回の応答を使わないため、古いジャーナルは削除して今回の応答だけを記録する）
+    journal_file = journal_path(output_file)
+    if refresh:
+        journal_file.unlink(missing_ok=True)
+    journaled = load_journal(journal_file)
+
+    # 内容が変わっていないスライドはキャッシュの応答を使い、Geminiを呼ばない
+    responses = {}
+    pending = []
+    for slide in slides:
+        key = script_cache_key(slide)
+        if key in journaled:
+            print(f"原稿をジャーナルから取得: スライド {slide['index']} - {slide['title']}")
+            responses[slide['index']] = journaled[key]
+        else:
+            response = cache.get(key) if cache and not refresh else None
+            if response is None:
+                pending.append(slide)
+                continue
+            print(f"原稿をキャッシュから取得: スライド {slide['index']} - {slide['title']}")
+            responses[slide['index']] = response
+
+        if on_script:
+            on_script(script_entry(slide, responses[slide['index']]))
+
+    # Geminiに依頼するスライドがある場合だけモデルを用意する（全スライドがキャッシュにあればAPIキーなしで実行できる）
+    model = create_model() if pending else None
+
+    # レート制限対策：全スレッドでリクエストの間隔を共有する（固定の待機の代わり）
+    limiter = AdaptiveTokenBucket(rpm / 60)
+    journal_lock = threading.Lock()
+
+    def generate_single(slide):
         print(f"原稿生成中: スライド {slide['index']} - {slide['title']}")
-        script = generate_script_for_slide(model, slide, len(slides))
-
-        scripts.append({
-            'index': slide['index'],
-            'title': slide['title'],
-            'script': script
-        })
-
-        print(f"  生成完了: {len(script)}文字")
+        return request_script(model, build_prompt(slide, len(slides)), f"スライド {slide['index']}", limiter=limiter)
+
+    def generate(batch):
+        if len(batch) == 1:
+            results = {batch[0]['index']: generate_single(batch[0])}
+        else:
+            indices = ", ".join(str(slide['index']) for slide in batch)
+            print(f"原稿生成中: スライド {indices}（まとめて依頼）")
+            response = request_script(model, build_batch_prompt(batch, len(slides)), f"スライド {indices}",
+                                      limiter=limiter, generation_config={'response_mime_type': 'application/json'})
+            results = parse_batch_response(response, batch)
+
+            # 応答から取り出せなかったスライドだけ1枚ずつ依頼し直す
+            for slide in batch:
+                if slide['index'] not in results:
+                    print(f"  スライド {slide['index']}: まとめた応答から原稿を取り出せないため1枚ずつ依頼します")
+                    results[slide['index']] = generate_single(slide)
+
+        # 完了したらすぐにジャーナルへ追記する（他のスライドが失敗しても残る）
+        lines = "".join(
+            json.dumps({'key': script_cache_key(slide), 'index': slide['index'], 'response': results[slide['index']]},
+                       ensure_ascii=False) + "\n"
+            for slide in batch
+        )
+        with journal_lock, open(journal_file, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+        if cache:
+            for slide in batch:
+                cache.put(script_cache_key(slide), results[slide['index']])
+        if on_script:
+            for slide in batch:
+                on_script(script_entry(slide, results[slide['index']]))
+        return results
+
+    # 各スライドの原稿を生成（完了順に関わらずスライド順に並べる）
+    batch_size = max(1, batch_size)
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    print(f"リクエスト {len(batches)}件（{batch_size}枚ずつ）、並列数 {workers}、{rpm}回/分まで")
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for results in executor.map(generate, batches):
+                responses.update(results)
+    except Exception:
+        if journal_file.exists():
+            print(f"\n生成済みの原稿はジャーナルに保存しました: {journal_file}")
+            print("再実行すると未完了のスライドだけを生成します")
+        raise
+
+    # 応答のままキャッシュするため、フレーズの削除はスライドごとに毎回行う
+    scripts = []
+    for slide in slides:
+        entry = script_entry(slide, responses[slide['index']])
+        print(f"  スライド {slide['index']}: 生成完了 {len(entry['script'])}文字")
+        scripts.append(entry)
 
-        # レート制限対策：各スライド間に7秒待機（最後のスライドを除く）
-        # Gemini APIは1分間に10リクエストまでなので、6秒に1リクエストのペース
-        if i < len(slides) - 1:
-            wait_time = 7
-            print(f"  レート制限対策のため{wait_time}秒待機中...")
-            time.sleep(wait_time)
+    if cache:
+        removed = cache.evict()
+        print(f"原稿キャッシュ: {cache.summary()}" + (f"、{removed}件を削除" if removed else ""))
 
     # JSONとして保存
     output_data = {
@@ -214,14 +527,27 @@ def generate_full_script(slide_file, output_file):
 
     print(f"テキスト版も保存しました: {text_output}")
 
-    return output_file
+    # 原稿を保存できたのでジャーナルは不要（以降の再利用は原稿キャッシュが担う）
+    journal_file.unlink(missing_ok=True)
 
-def main():
-    if len(sys.argv) < 2:
-        print("使用方法: python generate_script.py <slide_file>")
-        sys.exit(1)
+    return output_data if return_data else output_file
 
-    slide_file = sys.argv[1]
+def main():
+    parser = argparse.ArgumentParser(description="スライドから原稿を生成")
+    parser.add_argument('slide_file', help="Marp形式のスライドファイル")
+    parser.add_argument('--workers', type=int, default=4, help="同時に送るリクエスト数")
+    parser.add_argument('--rpm', type=float, default=DEFAULT_RPM, help="1分間あたりのリクエスト数の上限")
+    parser.add_argument('--batch-size', type=int, default=1,
+                        help="1回のリクエストでまとめて依頼するスライド数（応答から取り出せないスライドは1枚ずつ依頼し直す）")
+    parser.add_argument('--refresh', action='store_true',
+                        help="キャッシュ・ジャーナルを読まずに全スライドの原稿を生成し直す（結果はキャッシュに保存）")
+    parser.add_argument('--no-cache', action='store_true', help="原稿キャッシュを使わない")
+    parser.add_argument('--cache-dir', help="原稿キャッシュのディレクトリ（既定: SCRIPT_CACHE_DIR または .cache/scripts）")
+    parser.add_argument('--cache-ttl-days', type=float, default=DEFAULT_TTL_DAYS, help="原稿キャッシュの有効期限（日）")
+    parser.add_argument('--cache-size-mb', type=int, default=64, help="原稿キャッシュの容量上限（MB）")
+    args = parser.parse_args()
+
+    slide_file = args.slide_file
 
     if not os.path.exists(slide_file):
         print(f"エラー: スライドファイルが見つかりません: {slide_file}")
@@ -235,7 +561,9 @@ def main():
     output_file = output_dir / f"{slide_path.stem}_script.json"
 
     # 原稿を生成
-    script_file = generate_full_script(slide_file, output_file)
+    cache = None if args.no_cache else ScriptCache(args.cache_dir, args.cache_size_mb * 1024 * 1024, args.cache_ttl_days)
+    script_file = generate_full_script(slide_file, output_file, workers=args.workers, rpm=args.rpm,
+                                       cache=cache, refresh=args.refresh, batch_size=args.batch_size)
 
     # GitHub Actions用に環境変数に保存
     if 'GITHUB_ENV' in os.environ:
@@ -7,12 +7,31 @@ import sys
 import os
 import json
 import re
+import argparse
+import hashlib
+import heapq
+import bisect
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
 from pathlib import Path
-from pydub import AudioSegment
+from audio_utils import probe_duration, load_pcm, detect_pauses
+from subtitle_segments import split_text_into_segments
+
+# セグメント間のギャップ（秒）- 短くして音声とのズレを減らす
+GAP_DURATION = 0.3
+
+# タイミングキャッシュ（video_timings.jsonと同じディレクトリに保存）
+TIMINGS_CACHE_NAME = 'video_timings.cache.json'
+TIMINGS_CACHE_VERSION = 1
+
+# 数値だけの配列（整形時に1行にまとめる）
+NUMBER_LIST_PATTERN = re.compile(r'\[\s*(-?\d+(?:,\s*-?\d+)*)\s*\]')
 
 def get_audio_duration(audio_file):
     """
     音声ファイルの長さを秒単位で取得
+    MP3/WAVはヘッダーのみから計算し、解析できない場合だけpydubでデコードする
 
     Args:
         audio_file: 音声ファイルのパス
@@ -20,250 +39,336 @@ def get_audio_duration(audio_file):
     Returns:
         音声の長さ（秒）
     """
+    duration = probe_duration(audio_file)
+    if duration is not None:
+        return duration
+
+    # 最終手段：ffmpegで全体をデコードして長さを取得
+    from pydub import AudioSegment
     audio = AudioSegment.from_file(audio_file)
     return len(audio) / 1000.0  # ミリ秒から秒に変換
 
-def find_line_break_position(text, max_chars):
+@lru_cache(maxsize=1)
+def _load_master_pcm(audio_file, mtime_ns, size):
+    # 連結したナレーションはスライドごとに読み直さないよう、直前に読んだものを再利用する
+    # 更新時刻とサイズもキーに含め、作り直したファイルは読み直す
+    return load_pcm(audio_file)
+
+def load_slide_pcm(audio_info):
     """
-    意味の区切りを考慮して最適な改行位置を見つける
+    スライドの音声をPCMサンプル配列として読み込む
+    全スライドを連結したナレーション（audio_offsetあり）の場合はスライドの区間だけを切り出す
 
     Args:
-        text: 分割するテキスト
-        max_chars: 1行の最大文字数
+        audio_info: メタデータのaudio_filesの要素
 
     Returns:
-        改行位置（文字インデックス）、見つからない場合はNone
+        (サンプル配列, サンプリングレート)
     """
-    if len(text) <= max_chars:
-        return None
-
-    # 改行候補位置を探す（優先順位順）
-    break_candidates = []
+    if 'audio_offset' not in audio_info:
+        return load_pcm(audio_info['audio_file'])
 
-    # 1. 読点（、）の後
-    for match in re.finditer(r'、', text[:max_chars + 5]):
-        pos = match.end()
-        if pos <= max_chars:
-            break_candidates.append((pos, 3))
+    stat = os.stat(audio_info['audio_file'])
+    samples, sample_rate = _load_master_pcm(audio_info['audio_file'], stat.st_mtime_ns, stat.st_size)
+    start = round(audio_info['audio_offset'] * sample_rate)
+    return samples[start:start + round(audio_info['duration'] * sample_rate)], sample_rate
 
-    # 2. 助詞の後（ただし形式名詞の前は除く）
-    particles = ['は', 'が', 'を', 'に', 'で', 'と', 'へ', 'や', 'の', 'から', 'まで', 'より', 'も', 'し', 'ば', 'て']
-    formal_nouns = ['こと', 'もの', 'ため', 'よう', 'ところ', 'はず', 'わけ']
+def char_ratio_timeline(segment_lengths, duration, gap_duration=GAP_DURATION):
+    """
+    文字数の割合で各セグメントの時間を配分（セグメント間に固定ギャップを挿入）
 
-    for particle in particles:
-        for match in re.finditer(re.escape(particle), text[:max_chars + 5]):
-            pos = match.end()
-            if pos > max_chars:
-                continue
+    Args:
+        segment_lengths: 各セグメントの文字数
+        duration: 音声の長さ（秒）
+        gap_duration: セグメント間のギャップ（秒）
 
-            # 形式名詞の前でないかチェック
-            next_text = text[pos:pos + 3]
-            is_before_formal_noun = any(next_text.startswith(fn) for fn in formal_nouns)
+    Returns:
+        各セグメントの (直前のセグメント終了からの間隔, 長さ) のリスト
+    """
+    total_chars = sum(segment_lengths)
 
-            if not is_before_formal_noun:
-                break_candidates.append((pos, 2))
+    # ギャップを考慮した利用可能時間を計算（最後のセグメント後にはギャップなし）
+    total_gap_time = gap_duration * (len(segment_lengths) - 1)
+    available_duration = duration - total_gap_time
 
-    # 優先度順にソート（優先度が高い順、同じ優先度なら理想的な位置に近い順）
-    if break_candidates:
-        ideal_pos = max_chars * 0.6  # 理想は60%くらいの位置
-        break_candidates.sort(key=lambda x: (-x[1], abs(x[0] - ideal_pos)))
-        return break_candidates[0][0]
+    timeline = []
+    for i, length in enumerate(segment_lengths):
+        # 文字数の割合で時間を配分（ギャップを除いた時間で）
+        char_ratio = length / total_chars if total_chars > 0 else 1.0 / len(segment_lengths)
+        timeline.append((gap_duration if i > 0 else 0, available_duration * char_ratio))
 
-    # 見つからない場合はNone
-    return None
+    return timeline
 
-def split_into_two_lines(text, max_chars_per_line):
+def align_timeline_to_pauses(segment_lengths, duration, pauses, search_window=1.0, min_segment=0.3):
     """
-    テキストを2行に分割（意味の区切りを考慮）
+    セグメント境界を実際の無音区間に合わせる
+    文字数比で境界を推定し、推定位置に最も近い無音区間へスナップする
 
     Args:
-        text: 分割するテキスト
-        max_chars_per_line: 1行の最大文字数
+        segment_lengths: 各セグメントの文字数
+        duration: 音声の長さ（秒）
+        pauses: 無音区間 (開始秒, 終了秒) のリスト（時刻順）
+        search_window: 推定位置から無音区間を探す範囲（秒）
+        min_segment: セグメントの最短の長さ（秒）
 
     Returns:
-        改行を含むテキスト、または元のテキスト（分割不可の場合）
+        各セグメントの (直前のセグメント終了からの間隔, 長さ) のリスト、
+        整列できない場合（複数のセグメントの境界がどれも無音区間に合わない場合を含む）はNone
     """
-    if len(text) <= max_chars_per_line:
-        return text
+    total_chars = sum(segment_lengths)
+    if total_chars == 0:
+        return None
 
-    if len(text) > max_chars_per_line * 2:
-        # 2行でも収まらない場合はNone（別処理が必要）
+    # 先頭・末尾の無音を除いた発話区間
+    speech_start, speech_end = 0.0, duration
+    interior = []
+    for start, end in pauses:
+        if start <= 0.0:
+            speech_start = end
+        elif end >= duration - 0.05:
+            speech_end = min(speech_end, start)
+        else:
+            interior.append((start, end))
+
+    if speech_end - speech_start < min_segment * len(segment_lengths):
         return None
 
-    # 最適な改行位置を探す
-    break_pos = find_line_break_position(text, max_chars_per_line)
+    starts = [speech_start]
+    ends = []
+    remaining_chars = total_chars
+    next_pause = 0
+    snapped = 0
+
+    for length in segment_lengths[:-1]:
+        segment_start = starts[-1]
+
+        # 残りの発話時間を残りの文字数で按分して境界を推定
+        estimate = segment_start + (speech_end - segment_start) * length / remaining_chars
+        remaining_chars -= length
+
+        best = None
+        for i in range(next_pause, len(interior)):
+            pause_start, pause_end = interior[i]
+            center = (pause_start + pause_end) / 2
+            if center > estimate + search_window:
+                break
+            if pause_start < segment_start + min_segment or pause_end > speech_end - min_segment:
+                continue
+            if abs(center - estimate) <= search_window and (best is None or abs(center - estimate) < best[0]):
+                best = (abs(center - estimate), i)
+
+        if best:
+            # 無音区間の始まりで字幕を終え、終わりで次の字幕を始める
+            pause_start, pause_end = interior[best[1]]
+            ends.append(pause_start)
+            starts.append(pause_end)
+            next_pause = best[1] + 1
+            snapped += 1
+        else:
+            # 近くに無音区間がない場合は推定位置でそのまま切り替える
+            ends.append(estimate)
+            starts.append(estimate)
 
-    if break_pos:
-        line1 = text[:break_pos].strip()
-        line2 = text[break_pos:].strip()
+    if len(segment_lengths) > 1 and not snapped:
+        # 境界がすべて推定位置のままなら、文字数ベースの配分（ギャップあり）と変わらないため整列できないとする
+        return None
 
-        # 2行目も31文字以内に収まるか確認
-        if len(line2) <= max_chars_per_line:
-            return line1 + '\n' + line2
+    ends.append(speech_end)
 
-    # 見つからない場合は強制的に分割（できるだけ良い位置で）
-    for i in range(max_chars_per_line, max(max_chars_per_line // 2, len(text) - max_chars_per_line), -1):
-        if i < len(text) and text[i] in ['、', '。', ' ', '　']:
-            line1 = text[:i + 1].strip('、。 　')
-            line2 = text[i + 1:].strip('、。 　')
-            if len(line2) <= max_chars_per_line:
-                return line1 + '\n' + line2
+    timeline = []
+    previous_end = 0.0
+    for start, end in zip(starts, ends):
+        timeline.append((start - previous_end, end - start))
+        previous_end = end
 
-    # 最後の手段：max_chars_per_lineで強制分割
-    return text[:max_chars_per_line] + '\n' + text[max_chars_per_line:]
+    return timeline
 
-def split_text_into_segments(text, max_chars_per_line=31, max_lines=2):
+def process_slide(audio_info, align='chars'):
     """
-    テキストを字幕用のセグメントに分割（最大2行、31文字/行まで）
-    意味の区切り（助詞、読点など）を考慮して改行位置を決定
+    1スライド分の音声長さ・字幕セグメント・タイムラインを計算
+    スライドの開始時刻に依存しないため、結果をキャッシュして再利用できる
+    音声メタデータに長さやセグメントの区切り位置がある場合は、音声を読まずにそれを使う
 
     Args:
-        text: 原稿テキスト
-        max_chars_per_line: 1行あたりの最大文字数
-        max_lines: 1セグメントあたりの最大行数
+        audio_info: メタデータのaudio_filesの要素
+        align: 字幕タイミングの計算方法（'chars' または 'energy'）
 
     Returns:
-        分割されたテキストのリスト（改行を含む）
-    """
-    # 句読点で分割
-    sentences = []
-    current = ""
-
-    for char in text:
-        current += char
-        if char in ['。', '！', '？', '\n']:
-            if current.strip():
-                sentences.append(current.strip())
-            current = ""
-
-    if current.strip():
-        sentences.append(current.strip())
-
-    # 各文をセグメント化
-    segments = []
-    for sentence in sentences:
-        # 1行に収まる場合
-        if len(sentence) <= max_chars_per_line:
-            segments.append(sentence)
-        # 2行に収まる可能性がある場合
-        elif len(sentence) <= max_chars_per_line * max_lines:
-            # 新しい改行ロジックを使用
-            result = split_into_two_lines(sentence, max_chars_per_line)
-            if result:
-                segments.append(result)
-            else:
-                # 2行でも収まらない場合は強制分割
-                segments.append(sentence[:max_chars_per_line] + '\n' + sentence[max_chars_per_line:max_chars_per_line * 2])
-        # 2行でも収まらない場合は複数セグメントに分割
-        else:
-            # 読点で分割
-            parts = sentence.split('、')
-            current_segment = ""
-
-            for i, part in enumerate(parts):
-                part_with_comma = part + ('、' if i < len(parts) - 1 else '')
-
-                # 現在のセグメントに追加できるか確認
-                test_segment = current_segment + part_with_comma
-
-                if len(test_segment) <= max_chars_per_line * max_lines:
-                    current_segment = test_segment
-                else:
-                    # 現在のセグメントを保存
-                    if current_segment:
-                        # 2行に分割できるか試す
-                        result = split_into_two_lines(current_segment.rstrip('、'), max_chars_per_line)
-                        if result:
-                            segments.append(result)
-                        else:
-                            segments.append(current_segment.rstrip('、'))
-                    current_segment = part_with_comma
-
-            # 残りを保存
-            if current_segment:
-                result = split_into_two_lines(current_segment.rstrip('、'), max_chars_per_line)
-                if result:
-                    segments.append(result)
-                else:
-                    segments.append(current_segment.rstrip('、'))
-
-    return segments
-
-def generate_timings(audio_metadata_file, output_file):
+        duration, segments, timeline, aligned, notes を持つ辞書
     """
-    音声メタデータから字幕タイミング情報を生成
+    audio_file = audio_info['audio_file']
+    duration = audio_info['duration'] if 'duration' in audio_info else get_audio_duration(audio_file)
+
+    if audio_info.get('segments'):
+        # セグメント単位で合成した音声は区切り位置が正確にわかっている
+        segments = [segment['text'] for segment in audio_info['segments']]
+        timeline = []
+        previous_end = 0.0
+        for segment in audio_info['segments']:
+            timeline.append([segment['start'] - previous_end, segment['end'] - segment['start']])
+            previous_end = segment['end']
+        return {
+            'duration': duration,
+            'segments': segments,
+            'timeline': timeline,
+            'aligned': True,
+            'notes': ["音声メタデータのセグメント位置を使用"]
+        }
+
+    segments = split_text_into_segments(audio_info['script'])
+    notes = []
+    timeline = None
+
+    if segments:
+        # 各セグメントの文字数を計算（改行を除く）
+        segment_lengths = [len(segment.replace('\n', '')) for segment in segments]
+
+        if align == 'energy':
+            try:
+                samples, sample_rate = load_slide_pcm(audio_info)
+                pauses = detect_pauses(samples, sample_rate)
+                timeline = align_timeline_to_pauses(segment_lengths, duration, pauses)
+                notes.append(f"無音区間: {len(pauses)}箇所")
+            except Exception as e:
+                notes.append(f"無音区間の検出に失敗しました（文字数ベースで計算します）: {str(e)[:100]}")
+
+            if timeline is None:
+                notes.append("無音区間に整列できないため文字数ベースで計算します")
+
+    aligned = timeline is not None
+    if segments and not aligned:
+        timeline = char_ratio_timeline(segment_lengths, duration)
+
+    return {
+        'duration': duration,
+        'segments': segments,
+        'timeline': [list(entry) for entry in timeline or []],
+        'aligned': aligned,
+        'notes': notes
+    }
+
+def file_sha256(path):
+    """ファイル内容のSHA-256を計算"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def code_fingerprint():
+    """
+    セグメント化・整列の実装のハッシュ
+    実装が変わったらキャッシュ全体を無効にするために使う
+    """
+    digest = hashlib.sha256()
+    for source in (Path(__file__), Path(__file__).with_name('audio_utils.py'),
+                   Path(__file__).with_name('subtitle_segments.py')):
+        digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+def load_timings_cache(cache_file):
+    """
+    タイミングキャッシュを読み込む
+    存在しない・壊れている・形式や実装が異なる場合は空のキャッシュを返す
+    """
+    empty = {'version': TIMINGS_CACHE_VERSION, 'code': code_fingerprint(), 'files': {}, 'slides': {}}
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return empty
+
+    if not isinstance(cache, dict) or cache.get('version') != empty['version'] or cache.get('code') != empty['code']:
+        return empty
+    if not isinstance(cache.get('files'), dict) or not isinstance(cache.get('slides'), dict):
+        return empty
+    return cache
+
+def save_timings_cache(cache_file, cache):
+    """タイミングキャッシュを一時ファイル経由で保存（途中で中断しても壊れないようにする）"""
+    temp_file = Path(f"{cache_file}.tmp")
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(temp_file, cache_file)
+
+def audio_content_hash(audio_file, file_records):
+    """
+    音声ファイルの内容ハッシュを取得
+    サイズと更新時刻が前回と同じならファイルを読まずに前回のハッシュを使う
 
     Args:
-        audio_metadata_file: 音声メタデータJSONファイル
-        output_file: 出力ファイルパス
+        audio_file: 音声ファイルのパス
+        file_records: ファイルパス -> {size, mtime_ns, sha256} の辞書（更新される）
+    """
+    stat = os.stat(audio_file)
+    record = file_records.get(str(audio_file))
+    if record and record['size'] == stat.st_size and record['mtime_ns'] == stat.st_mtime_ns:
+        return record['sha256']
+
+    sha256 = file_sha256(audio_file)
+    file_records[str(audio_file)] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': sha256}
+    return sha256
+
+def slide_cache_key(audio_hash, audio_info, align):
+    """スライドのキャッシュキー（音声内容・原稿・メタデータの長さと区切り位置・整列方法のハッシュ）"""
+    payload = json.dumps([audio_hash, audio_info['script'], audio_info.get('duration'), audio_info.get('segments'), align],
+                         ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def assemble_timings(audio_files, results, fps=30):
     """
-    # メタデータを読み込む
-    with open(audio_metadata_file, 'r', encoding='utf-8') as f:
-        metadata = json.load(f)
+    スライドごとの計算結果を順番につなぎ、開始時刻とフレーム番号を割り当てる
+
+    Args:
+        audio_files: メタデータのaudio_files
+        results: process_slideの結果（audio_filesと同じ順序）
+        fps: フレームレート
 
+    Returns:
+        video_timings.jsonに保存するデータ
+    """
     slides_data = []
     current_time = 0
-    fps = 30  # Remotionのフレームレート
 
-    print("字幕とタイミング情報を生成中...")
-
-    for audio_info in metadata['audio_files']:
+    for audio_info, result in zip(audio_files, results):
         audio_file = audio_info['audio_file']
-        script = audio_info['script']
+        duration = result['duration']
+        # 連結したナレーションでは、サンプル単位で正確な開始位置をそのまま使う（浮動小数点の誤差を積み上げない）
+        current_time = audio_info.get('audio_offset', current_time)
+        subtitle_segments = result['segments']
 
         print(f"\nスライド {audio_info['index']}: {audio_info['title']}")
-
-        # 音声の長さを取得
-        duration = get_audio_duration(audio_file)
         print(f"  音声長さ: {duration:.2f}秒")
-
-        # 字幕セグメントを生成
-        subtitle_segments = split_text_into_segments(script)
         print(f"  字幕セグメント数: {len(subtitle_segments)}")
+        for note in result['notes']:
+            print(f"  {note}")
 
-        # 各セグメントのタイミングを計算（文字数ベース + ギャップ追加）
+        # 各セグメントのタイミングをスライドの開始時刻からの相対値で並べる
         subtitles = []
-        GAP_DURATION = 0.3  # セグメント間のギャップ（秒）- 短くして音声とのズレを減らす
-
-        if subtitle_segments:
-            # 各セグメントの文字数を計算（改行を除く）
-            segment_lengths = [len(segment.replace('\n', '')) for segment in subtitle_segments]
-            total_chars = sum(segment_lengths)
-
-            # ギャップを考慮した利用可能時間を計算
-            total_gap_time = GAP_DURATION * (len(subtitle_segments) - 1)  # 最後のセグメント後にはギャップなし
-            available_duration = duration - total_gap_time
-
-            segment_start_time = current_time
+        segment_end_time = current_time
 
-            for i, segment in enumerate(subtitle_segments):
-                # 文字数の割合で時間を配分（ギャップを除いた時間で）
-                char_ratio = segment_lengths[i] / total_chars if total_chars > 0 else 1.0 / len(subtitle_segments)
-                segment_duration = available_duration * char_ratio
+        for i, (segment, (gap, segment_duration)) in enumerate(zip(subtitle_segments, result['timeline'])):
+            start_time = segment_end_time + gap
+            end_time = start_time + segment_duration
 
-                start_time = segment_start_time
-                end_time = start_time + segment_duration
+            subtitles.append({
+                'text': segment,
+                'start': start_time,
+                'end': end_time,
+                'startFrame': int(start_time * fps),
+                'endFrame': int(end_time * fps)
+            })
 
-                subtitles.append({
-                    'text': segment,
-                    'start': start_time,
-                    'end': end_time,
-                    'startFrame': int(start_time * fps),
-                    'endFrame': int(end_time * fps)
-                })
+            # デバッグ出力
+            print(f"    セグメント {i + 1}: \"{segment.replace(chr(10), ' / ')}\" ({len(segment.replace(chr(10), ''))}文字) = {start_time:.2f}s - {end_time:.2f}s ({segment_duration:.2f}s)")
 
-                # デバッグ出力
-                print(f"    セグメント {i + 1}: \"{segment.replace(chr(10), ' / ')}\" ({segment_lengths[i]}文字) = {start_time:.2f}s - {end_time:.2f}s ({segment_duration:.2f}s)")
-
-                # 最後以外のセグメントにはギャップを追加（待機アニメーション表示用）
-                if i < len(subtitle_segments) - 1:
-                    segment_start_time = end_time + GAP_DURATION
-                else:
-                    segment_start_time = end_time
+            segment_end_time = end_time
 
+        if subtitle_segments and not result['aligned']:
+            total_gap_time = GAP_DURATION * (len(subtitle_segments) - 1)
             print(f"  セグメント間ギャップ: {GAP_DURATION}秒 × {len(subtitle_segments) - 1}回 = {total_gap_time:.2f}秒")
 
-        slides_data.append({
+        slide_data = {
             'index': audio_info['index'],
             'title': audio_info['title'],
             'audioFile': audio_file,
@@ -274,33 +379,251 @@ def generate_timings(audio_metadata_file, output_file):
             'startFrame': int(current_time * fps),
             'endFrame': int((current_time + duration) * fps),
             'subtitles': subtitles,
-            'fullScript': script
-        })
+            'fullScript': audio_info['script']
+        }
+        if 'audio_offset' in audio_info:
+            slide_data['audioStart'] = audio_info['audio_offset']
+        slides_data.append(slide_data)
 
         current_time += duration
 
-    # タイミング情報を保存
     output_data = {
         'fps': fps,
         'totalDuration': current_time,
         'totalFrames': int(current_time * fps),
-        'slides': slides_data
+        'slides': slides_data,
+        'frameIndex': build_frame_index(slides_data)
     }
 
+    # 全スライドを連結したナレーションの場合は、動画側で1つの音声として再生する
+    master_files = {audio_info['audio_file'] for audio_info in audio_files if 'audio_offset' in audio_info}
+    if master_files:
+        if len({audio_info['audio_file'] for audio_info in audio_files}) > 1:
+            raise ValueError("連結したナレーションとスライドごとの音声が混在しています")
+        output_data['narrationFile'] = master_files.pop()
+    return output_data
+
+def _first_match_runs(intervals, lo, hi=None):
+    """
+    区間リストの「先頭から探して最初に含む区間」がフレームごとにどう変わるかを求める
+    Video.tsxのfind()と同じ結果を、境界フレームだけを走査して計算する
+
+    Args:
+        intervals: (開始フレーム, 終了フレーム) のリスト（探索順）
+        lo: 走査の開始フレーム
+        hi: 走査の終了フレーム（Noneの場合は全区間の終わりまで）
+
+    Returns:
+        (開始フレーム, 区間の位置 または -1) のリスト（値が変わるフレームのみ）
+    """
+    boundaries = {lo}
+    for start, end in intervals:
+        boundaries.update(frame for frame in (start, end) if frame > lo and (hi is None or frame < hi))
+
+    order = sorted(range(len(intervals)), key=lambda i: intervals[i][0])
+    active = []
+    next_interval = 0
+    runs = []
+
+    for frame in sorted(boundaries):
+        # 開始済みの区間を追加し、終了した区間を取り除く（探索順が最も早いものが先頭）
+        while next_interval < len(order) and intervals[order[next_interval]][0] <= frame:
+            position = order[next_interval]
+            heapq.heappush(active, (position, intervals[position][1]))
+            next_interval += 1
+        # 先頭以外の終了済み区間は先頭に出てきた時点で取り除く
+        while active and active[0][1] <= frame:
+            heapq.heappop(active)
+
+        position = active[0][0] if active else -1
+        if not runs or runs[-1][1] != position:
+            runs.append((frame, position))
+
+    return runs
+
+def build_frame_index(slides_data):
+    """
+    フレーム番号から表示中のスライド・字幕を引くためのランレングス索引を作る
+    starts[i] から starts[i + 1] の直前までのフレームでは、slides[i] 番目のスライドと
+    そのスライドの subtitles[i] 番目の字幕が表示される（-1は表示なし）
+
+    Args:
+        slides_data: video_timings.jsonのslides
+
+    Returns:
+        starts, slides, subtitles の3つの配列を持つ辞書
+    """
+    starts, slide_positions, subtitle_positions = [], [], []
+
+    slide_runs = _first_match_runs([(slide['startFrame'], slide['endFrame']) for slide in slides_data], 0)
+    for i, (frame, slide_position) in enumerate(slide_runs):
+        if slide_position < 0:
+            runs = [(frame, -1, -1)]
+        else:
+            hi = slide_runs[i + 1][0] if i + 1 < len(slide_runs) else None
+            subtitles = slides_data[slide_position]['subtitles']
+            intervals = [(subtitle['startFrame'], subtitle['endFrame']) for subtitle in subtitles]
+            runs = [(start, slide_position, position) for start, position in _first_match_runs(intervals, frame, hi)]
+
+        for start, run_slide, run_subtitle in runs:
+            if starts and slide_positions[-1] == run_slide and subtitle_positions[-1] == run_subtitle:
+                continue
+            starts.append(start)
+            slide_positions.append(run_slide)
+            subtitle_positions.append(run_subtitle)
+
+    return {'starts': starts, 'slides': slide_positions, 'subtitles': subtitle_positions}
+
+def lookup_frame(timings, frame):
+    """
+    指定フレームで表示中のスライドと字幕を二分探索で取得（O(log n)）
+
+    Args:
+        timings: video_timings.jsonの内容
+        frame: フレーム番号
+
+    Returns:
+        (スライド または None, 字幕 または None)
+    """
+    index = timings.get('frameIndex') or build_frame_index(timings['slides'])
+    run = bisect.bisect_right(index['starts'], frame) - 1
+    if run < 0 or index['slides'][run] < 0:
+        return None, None
+
+    slide = timings['slides'][index['slides'][run]]
+    subtitle_position = index['subtitles'][run]
+    return slide, slide['subtitles'][subtitle_position] if subtitle_position >= 0 else None
+
+def write_timings_json(output_data, output_file):
+    """
+    タイミング情報をJSONで保存
+    索引などの数値だけの配列は1行にまとめてファイルサイズを抑える
+    """
+    text = json.dumps(output_data, ensure_ascii=False, indent=2)
+    text = NUMBER_LIST_PATTERN.sub(lambda m: '[' + ', '.join(item.strip() for item in m.group(1).split(',')) + ']', text)
     with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(output_data, f, ensure_ascii=False, indent=2)
+        f.write(text)
+
+def process_slides(audio_files, align='chars', jobs=1):
+    """
+    複数スライドのprocess_slideを実行
+    jobsが2以上の場合はプロセスプールで並列に処理する（結果はaudio_filesと同じ順序）
+
+    Args:
+        audio_files: メタデータのaudio_filesの要素のリスト
+        align: 字幕タイミングの計算方法
+        jobs: 並列プロセス数
+
+    Returns:
+        process_slideの結果のリスト
+    """
+    if jobs <= 1 or len(audio_files) <= 1:
+        return [process_slide(audio_info, align) for audio_info in audio_files]
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(audio_files))) as executor:
+        return list(executor.map(process_slide, audio_files, repeat(align)))
+
+def timing_cache_key(audio_info, align, cache, files):
+    """
+    スライドのタイミングキャッシュのキー
+
+    Args:
+        audio_info: メタデータのaudio_filesの要素
+        align: 字幕タイミングの計算方法
+        cache: load_timings_cacheで読み込んだキャッシュ
+        files: 今回使った音声ファイルの記録を集める辞書（更新される）
+    """
+    audio_file = audio_info['audio_file']
+    if 'audio_hash' in audio_info:
+        # 連結したナレーションは音声生成時に計算したスライドの区間のハッシュを使う
+        audio_hash = audio_info['audio_hash']
+    else:
+        audio_hash = audio_content_hash(audio_file, cache['files'])
+        files[str(audio_file)] = cache['files'][str(audio_file)]
+    return slide_cache_key(audio_hash, audio_info, align)
+
+def finish_timings(audio_files, results, output_file, fps=30):
+    """
+    スライドごとの計算結果をスライド順につないでタイミング情報を保存
+
+    Returns:
+        保存したタイミング情報
+    """
+    output_data = assemble_timings(audio_files, results, fps)
+
+    # タイミング情報を保存
+    write_timings_json(output_data, output_file)
 
+    total_duration = output_data['totalDuration']
     print(f"\n字幕・タイミング情報を保存: {output_file}")
-    print(f"総再生時間: {current_time:.2f}秒 ({int(current_time * fps)}フレーム)")
+    print(f"総再生時間: {total_duration:.2f}秒 ({output_data['totalFrames']}フレーム)")
+    return output_data
 
-    return output_file
+def generate_timings(audio_metadata_file, output_file, align='chars', use_cache=True, jobs=1, return_data=False):
+    """
+    音声メタデータから字幕タイミング情報を生成
+    出力先と同じディレクトリのキャッシュに、音声と原稿が変わっていないスライドの結果を保存して再利用する
 
-def main():
-    if len(sys.argv) < 2:
-        print("使用方法: python generate_timings.py <audio_metadata_json>")
-        sys.exit(1)
+    Args:
+        audio_metadata_file: 音声メタデータJSONファイル、または読み込み済みのメタデータ
+        output_file: 出力ファイルパス
+        align: 字幕タイミングの計算方法（'chars': 文字数比, 'energy': 無音区間に整列）
+        use_cache: タイミングキャッシュを使うかどうか
+        jobs: スライドを並列に処理するプロセス数（出力は逐次処理と同一）
+        return_data: Trueの場合は出力ファイルのパスの代わりに保存したタイミング情報を返す
+    """
+    # メタデータを読み込む（同じプロセスの前の工程から受け取った場合はそのまま使う）
+    if isinstance(audio_metadata_file, dict):
+        metadata = audio_metadata_file
+    else:
+        with open(audio_metadata_file, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
 
-    audio_metadata_file = sys.argv[1]
+    fps = 30  # Remotionのフレームレート
+    audio_files = metadata['audio_files']
+
+    print("字幕とタイミング情報を生成中...")
+
+    cache_file = Path(output_file).parent / TIMINGS_CACHE_NAME
+    cache = load_timings_cache(cache_file) if use_cache else None
+
+    if cache is None:
+        results = process_slides(audio_files, align, jobs)
+    else:
+        # 今回のデッキに含まれるスライドだけをキャッシュに残す
+        files = {}
+        keys = [timing_cache_key(audio_info, align, cache, files) for audio_info in audio_files]
+
+        # キャッシュにないスライドだけを（重複を除いて）計算する
+        slides = {key: cache['slides'][key] for key in keys if key in cache['slides']}
+        reused = sum(1 for key in keys if key in slides)
+        stale = {}
+        for key, audio_info in zip(keys, audio_files):
+            if key not in slides:
+                stale.setdefault(key, audio_info)
+        slides.update(zip(stale, process_slides(list(stale.values()), align, jobs)))
+        results = [slides[key] for key in keys]
+
+        cache['files'] = files
+        cache['slides'] = slides
+        save_timings_cache(cache_file, cache)
+        print(f"タイミングキャッシュ: 再利用 {reused} / 再計算 {len(audio_files) - reused} スライド")
+
+    output_data = finish_timings(audio_files, results, output_file, fps)
+    return output_data if return_data else output_file
+
+def main():
+    parser = argparse.ArgumentParser(description="音声ファイルから字幕とタイミング情報を生成")
+    parser.add_argument('audio_metadata_file', help="音声メタデータJSONファイル")
+    parser.add_argument('--align', choices=['chars', 'energy'], default='chars',
+                        help="字幕タイミングの計算方法（chars: 文字数比, energy: 無音区間に整列）")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="タイミングキャッシュを使わずに全スライドを再計算する")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help="スライドを並列に処理するプロセス数（0: CPUコア数）")
+    args = parser.parse_args()
+
+    audio_metadata_file = args.audio_metadata_file
 
     if not os.path.exists(audio_metadata_file):
         print(f"エラー: 音声メタデータファイルが見つかりません: {audio_metadata_file}")
@@ -311,7 +634,9 @@ def main():
     output_file = metadata_path.parent / 'video_timings.json'
 
     # タイミング情報を生成
-    timings_file = generate_timings(audio_metadata_file, output_file)
+    jobs = args.jobs or os.cpu_count() or 1
+    timings_file = generate_timings(audio_metadata_file, output_file, align=args.align,
+                                    use_cache=not args.no_cache, jobs=jobs)
 
     # GitHub Actions用に環境変数に保存
     if 'GITHUB_ENV' in os.environ:
@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+"""
+Marpスライドの共通パーサー
+Markdownを1行ずつ1回だけ走査してスライドごとのレコード（番号・タイトル・本文・ディレクティブ・内容ハッシュ）を生成し、
+解析結果をスライドファイルの隣にキャッシュして、後の工程では読み込むだけで済むようにします
+コードフェンス内の「---」や、段落直後の「---」（見出しの下線）ではスライドを区切りません
+"""
+
+import os
+import re
+import json
+import hashlib
+from pathlib import Path
+from itertools import chain
+from functools import lru_cache
+from collections import namedtuple
+
+PARSER_CACHE_VERSION = 1
+
+# スライド1枚分のレコード（indexは空でないスライドの1始まりの番号、titleは最初の「# 」見出し）
+Slide = namedtuple('Slide', ['index', 'title', 'body', 'directives', 'content_hash'])
+
+# デッキ全体（front_matterはヘッダーの「---」の間のテキスト、ない場合はNone）
+Deck = namedtuple('Deck', ['front_matter', 'directives', 'slides'])
+
+# 水平線（Marpではスライドの区切り）: 3文字以上の「-」「*」「_」、間の空白は可
+HR_PATTERN = re.compile(r' {0,3}(?:(?:-[ \t]*){3,}|(?:\*[ \t]*){3,}|(?:_[ \t]*){3,})$')
+# コードフェンスの開始（3文字以上の「`」または「~」）
+FENCE_PATTERN = re.compile(r' {0,3}(`{3,}|~{3,})')
+# レベル1の見出し（末尾の「#」は除く）
+TITLE_PATTERN = re.compile(r' {0,3}# +(.*?)(?:[ \t]+#+)?[ \t]*$')
+# ディレクティブの「キー: 値」
+DIRECTIVE_PATTERN = re.compile(r'\s*(_?[A-Za-z][\w-]*)\s*:\s*(.*?)\s*$')
+# 直後の「---」を見出しの下線ではなく区切りとして扱う行（見出し・引用・HTML・リスト項目）
+BLOCK_START_PATTERN = re.compile(r' {0,3}(?:#|>|<|[-*+](?:\s|$)|\d{1,9}[.)](?:\s|$))')
+
+# 区切り・コードフェンス・見出し・コメント・リスト項目になりうる行の先頭の文字
+SPECIAL_HEADS = frozenset('-*_`~<#>+0123456789')
+
+# Marpのディレクティブ名（それ以外のキーを持つHTMLコメントは発表者ノートとして扱う）
+MARP_DIRECTIVES = {
+    # グローバルディレクティブ
+    'marp', 'theme', 'style', 'headingDivider', 'lang', 'math', 'size',
+    'title', 'description', 'author', 'image', 'keywords', 'url',
+    # ローカルディレクティブ
+    'paginate', 'header', 'footer', 'class', 'color', 'transition',
+    'backgroundColor', 'backgroundImage', 'backgroundPosition', 'backgroundRepeat', 'backgroundSize',
+}
+
+
+def parse_directives(lines, strict=True):
+    """
+    「キー: 値」の行を辞書にする（「style: |」のようなインデントされた複数行の値にも対応）
+
+    Args:
+        lines: 行のリスト
+        strict: Trueの場合はディレクティブでない行があれば全体をディレクティブとみなさない、
+                Falseの場合はその行だけを読み飛ばす（front matter用）
+
+    Returns:
+        ディレクティブの辞書、strictでディレクティブでない行を含む場合はNone
+    """
+    directives = {}
+    block_key = None
+    block_lines = []
+    for line in lines:
+        if block_key is not None:
+            if not line.strip() or line[:1] in ' \t':
+                block_lines.append(line.strip())
+                continue
+            directives[block_key] = '\n'.join(block_lines).strip()
+            block_key = None
+
+        if not line.strip():
+            continue
+        match = DIRECTIVE_PATTERN.match(line)
+        if not match or match.group(1).lstrip('_') not in MARP_DIRECTIVES:
+            if strict:
+                return None
+            continue
+        key, value = match.groups()
+        if value in ('|', '|-', '>', '>-'):
+            block_key, block_lines = key, []
+        else:
+            directives[key] = value.strip('"\'')
+
+    if block_key is not None:
+        directives[block_key] = '\n'.join(block_lines).strip()
+    return directives
+
+
+def _scan(lines):
+    """
+    行を1回だけ走査し、最初にfront matter（ない場合はNone）、続いてSlideを順に返すジェネレーター
+    """
+    lines = iter(lines)
+    front_matter = None
+    pending = []
+
+    first = next(lines, None)
+    if first is not None and first.rstrip() == '---':
+        header = []
+        for line in lines:
+            if line.rstrip() == '---':
+                front_matter = ''.join(header)
+                break
+            header.append(line)
+        else:
+            # 閉じていない場合はfront matterではなく、先頭の「---」は区切り
+            pending = [first] + header
+    elif first is not None:
+        pending = [first]
+    yield front_matter
+
+    index = 0
+    buffer = []
+    title = None
+    directives = {}
+    fence = None       # 開いているコードフェンスの記号（例: '```'）
+    comment = None     # 開いている複数行のHTMLコメントの行
+    paragraph = False  # 直前の行が段落の本文か（直後の「---」は見出しの下線になる）
+
+    for line in chain(pending, lines):
+        if fence is not None:
+            # 開始と同じ記号で同じ長さ以上、後ろに何もない行でフェンスを閉じる
+            stripped = line.strip()
+            if stripped.startswith(fence) and not stripped.strip(fence[0]) and len(line) - len(line.lstrip()) < 4:
+                fence = None
+            buffer.append(line)
+            continue
+
+        if comment is not None:
+            comment.append(line)
+            buffer.append(line)
+            if '-->' in line:
+                text = ''.join(comment)
+                found = parse_directives(text[text.index('<!--') + 4:text.rindex('-->')].splitlines())
+                if found:
+                    directives.update(found)
+                comment = None
+            continue
+
+        stripped = line.strip()
+        if not stripped:
+            paragraph = False
+            buffer.append(line)
+            continue
+
+        head = stripped[0]
+        if head not in SPECIAL_HEADS:
+            # 大半を占める普通の本文の行は正規表現を使わずに処理する
+            buffer.append(line)
+            paragraph = True
+            continue
+
+        if head in '-*+' and stripped.strip(head + ' \t'):
+            # 水平線ではない行（リスト項目・強調など）
+            buffer.append(line)
+            paragraph = stripped[1:2] not in ' \t'
+            continue
+
+        if (head in '-*_' and HR_PATTERN.match(line.rstrip('\r\n'))
+                and not (paragraph and head == '-' and set(stripped) == {'-'})):
+            body = ''.join(buffer).strip()
+            if body:
+                index += 1
+                yield Slide(index, title or '', body, directives,
+                            hashlib.sha256(body.encode('utf-8')).hexdigest())
+            buffer = []
+            title = None
+            directives = {}
+            paragraph = False
+            continue
+
+        buffer.append(line)
+        if head in '`~':
+            match = FENCE_PATTERN.match(line)
+            if match and not (head == '`' and '`' in line[match.end():]):
+                fence = match.group(1)
+                paragraph = False
+                continue
+        elif head == '<' and stripped.startswith('<!--'):
+            if '-->' in stripped[4:]:
+                found = parse_directives([stripped[4:stripped.rindex('-->')]])
+                if found:
+                    directives.update(found)
+            else:
+                comment = [line]
+            paragraph = False
+            continue
+        elif head == '#' and title is None:
+            match = TITLE_PATTERN.match(line.rstrip('\r\n'))
+            if match:
+                title = match.group(1)
+        paragraph = not BLOCK_START_PATTERN.match(line)
+
+    # 閉じていないコメント・フェンスは最後のスライドの本文に含める
+    body = ''.join(buffer).strip()
+    if body:
+        index += 1
+        yield Slide(index, title or '', body, directives, hashlib.sha256(body.encode('utf-8')).hexdigest())
+
+
+def iter_slides(lines):
+    """
+    Marpスライドを1行ずつ解析し、空でないスライドのレコードを順に返す
+
+    Args:
+        lines: 行のイテラブル（開いたファイルなど）
+
+    Yields:
+        Slide
+    """
+    scanner = _scan(lines)
+    next(scanner)  # front matter
+    yield from scanner
+
+
+def parse_deck(lines):
+    """
+    Marpスライドを1回の走査でデッキ全体に変換する
+
+    Args:
+        lines: 行のイテラブル
+
+    Returns:
+        Deck
+    """
+    scanner = _scan(lines)
+    front_matter = next(scanner)
+    directives = parse_directives(front_matter.split('\n'), strict=False) if front_matter else {}
+    return Deck(front_matter, directives, list(scanner))
+
+
+@lru_cache(maxsize=1)
+def code_fingerprint():
+    """解析の実装のハッシュ（実装が変わったらキャッシュを無効にするために使う）"""
+    return hashlib.sha256(Path(__file__).read_bytes()).hexdigest()
+
+
+def cache_path(slide_file):
+    """解析結果のキャッシュファイル（スライドファイルと同じディレクトリの .<ファイル名>.marp.json）"""
+    slide_file = Path(slide_file)
+    return slide_file.with_name(f".{slide_file.name}.marp.json")
+
+
+def _save_cache(cache_file, entry):
+    """キャッシュを一時ファイル経由で保存（書き込めない場所では保存しない）"""
+    temp_file = Path(f"{cache_file}.{os.getpid()}.tmp")
+    try:
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(temp_file, cache_file)
+    except OSError:
+        temp_file.unlink(missing_ok=True)
+
+
+def load_deck(slide_file, use_cache=True):
+    """
+    スライドファイルを解析する
+    サイズと更新時刻が前回と同じならファイルを読まずにキャッシュを使い、
+    更新時刻だけが変わった場合は内容のハッシュが同じなら解析し直さない
+
+    Args:
+        slide_file: スライドファイルのパス
+        use_cache: 解析結果のキャッシュを使う・保存するか
+
+    Returns:
+        Deck
+    """
+    if not use_cache:
+        with open(slide_file, 'r', encoding='utf-8') as f:
+            return parse_deck(f)
+
+    stat = os.stat(slide_file)
+    cache_file = cache_path(slide_file)
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+        if entry.get('version') != PARSER_CACHE_VERSION or entry.get('code') != code_fingerprint():
+            entry = None
+    except (OSError, ValueError):
+        entry = None
+
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        deck = entry['deck']
+        return Deck(deck['front_matter'], deck['directives'], [Slide(*slide) for slide in deck['slides']])
+
+    with open(slide_file, 'rb') as f:
+        data = f.read()
+    sha256 = hashlib.sha256(data).hexdigest()
+
+    if entry and entry['sha256'] == sha256:
+        deck = entry['deck']
+        result = Deck(deck['front_matter'], deck['directives'], [Slide(*slide) for slide in deck['slides']])
+    else:
+        result = parse_deck(data.decode('utf-8').splitlines(keepends=True))
+        deck = {
+            'front_matter': result.front_matter,
+            'directives': result.directives,
+            'slides': [list(slide) for slide in result.slides],
+        }
+
+    _save_cache(cache_file, {
+        'version': PARSER_CACHE_VERSION,
+        'code': code_fingerprint(),
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': sha256,
+        'deck': deck,
+    })
+    return result
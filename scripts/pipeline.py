@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+ステージの依存関係グラフを実行するパイプライン
+各ステージの入力・出力を宣言し、入力の内容が前回の実行時と同じで出力も手を加えられていなければ実行を省略します
+（CIのチェックアウトでは更新時刻がリセットされるため、更新時刻ではなく内容のハッシュで判定する）
+依存関係のないステージは並行して実行します
+"""
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+PIPELINE_STATE_VERSION = 1
+
+
+class Stage:
+    """入力・出力・依存するステージを宣言した処理の1段階"""
+
+    def __init__(self, name, action, inputs=(), outputs=(), deps=(), params=None, description=""):
+        """
+        Args:
+            name: ステージ名
+            action: 実行する関数（引数なし）
+            inputs: 入力ファイル・ディレクトリのリスト、または判定時にリストを返す関数
+                    （前のステージの出力から決まる入力は関数にする）
+            outputs: 出力ファイルのリスト、または判定時にリストを返す関数
+            deps: 先に完了している必要があるステージ名のリスト
+            params: 入力と合わせて判定に使う値（コマンドライン引数など、JSONにできる値）
+            description: 表示用の説明
+        """
+        self.name = name
+        self.action = action
+        self.inputs = inputs
+        self.outputs = outputs
+        self.deps = list(deps)
+        self.params = params
+        self.description = description or name
+
+
+def expand_paths(paths):
+    """
+    パスのリストを展開する（関数なら呼び出し、ディレクトリは中のファイルを名前順に並べる）
+
+    Returns:
+        Pathのリスト
+    """
+    if callable(paths):
+        paths = paths()
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob('*') if p.is_file()))
+        else:
+            files.append(path)
+    return files
+
+
+class ContentHasher:
+    """
+    ファイル内容のSHA-256を計算する
+    同じ実行中にサイズと更新時刻が変わっていないファイルは読み直さない
+    """
+
+    def __init__(self):
+        self._records = {}
+        self._lock = threading.Lock()
+
+    def digest(self, path):
+        """
+        Returns:
+            内容のハッシュ、ファイルがない場合はNone
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        signature = (stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            record = self._records.get(str(path))
+        if record and record[0] == signature:
+            return record[1]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+        with self._lock:
+            self._records[str(path)] = (signature, sha256)
+        return sha256
+
+    def invalidate(self, paths):
+        """ステージが書き換えたファイルの記録を捨てる（同じ更新時刻のまま書き換えられても読み直す）"""
+        with self._lock:
+            for path in paths:
+                self._records.pop(str(path), None)
+
+
+def tree_digest(paths, base, hasher=None):
+    """
+    ファイル・ディレクトリの内容全体のハッシュ
+    パスはbaseからの相対パスで含めるため、プロジェクトを別の場所にチェックアウトしても同じ値になる
+
+    Args:
+        paths: パスのリスト（ディレクトリは中のファイル全体）
+        base: 相対パスの基準ディレクトリ
+        hasher: ContentHasher（Noneの場合は新しく作る）
+
+    Returns:
+        ハッシュ（16進文字列）
+    """
+    hasher = hasher or ContentHasher()
+    payload = [(path.relative_to(base).as_posix(), hasher.digest(path)) for path in expand_paths(paths)]
+    return hashlib.sha256(json.dumps(payload).encode('utf-8')).hexdigest()
+
+
+def load_state(state_file):
+    """実行記録を読み込む（存在しない・壊れている・形式が異なる場合は空の記録）"""
+    empty = {'version': PIPELINE_STATE_VERSION, 'stages': {}}
+    try:
+        with open(state_file, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return empty
+    return state if state.get('version') == PIPELINE_STATE_VERSION else empty
+
+
+def save_state(state_file, state):
+    """実行記録を一時ファイル経由で保存"""
+    state_file = Path(state_file)
+    state_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = Path(f"{state_file}.tmp")
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(temp_file, state_file)
+
+
+def input_key(stage, hasher):
+    """ステージの入力（パラメーターと全入力ファイルの内容）のハッシュ"""
+    payload = [stage.params, [(str(path), hasher.digest(path)) for path in expand_paths(stage.inputs)]]
+    return hashlib.sha256(json.dumps(payload, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def output_digests(stage, hasher):
+    """ステージの出力ファイル -> 内容のハッシュ（ない場合はNone）"""
+    return {str(path): hasher.digest(path) for path in expand_paths(stage.outputs)}
+
+
+def run_pipeline(stages, state_file, jobs=2, force=False):
+    """
+    ステージを依存関係の順に実行する
+    入力のハッシュが前回と同じで、出力が揃っていて前回から変わっていないステージは実行しない
+
+    Args:
+        stages: Stageのリスト
+        state_file: 実行記録のJSONファイル
+        jobs: 同時に実行するステージ数
+        force: Trueの場合は全ステージを実行する
+
+    Returns:
+        ステージ名 -> 実行したか（False: 最新のため省略）の辞書
+    """
+    names = {stage.name for stage in stages}
+    for stage in stages:
+        unknown = [dep for dep in stage.deps if dep not in names]
+        if unknown:
+            raise ValueError(f"ステージ {stage.name} の依存先が見つかりません: {', '.join(unknown)}")
+
+    state = load_state(state_file)
+    hasher = ContentHasher()
+    state_lock = threading.Lock()
+
+    def execute(stage):
+        key = input_key(stage, hasher)
+        record = state['stages'].get(stage.name)
+        if not force and record and record['inputs'] == key:
+            outputs = output_digests(stage, hasher)
+            if outputs and None not in outputs.values() and outputs == record['outputs']:
+                print(f"\n最新のため省略: {stage.description}")
+                return False
+
+        stage.action()
+
+        hasher.invalidate(expand_paths(stage.outputs))
+        outputs = output_digests(stage, hasher)
+        missing = [path for path, digest in outputs.items() if digest is None]
+        if missing:
+            raise RuntimeError(f"{stage.description}: 出力ファイルが見つかりません: {', '.join(missing)}")
+
+        with state_lock:
+            state['stages'][stage.name] = {'inputs': key, 'outputs': outputs}
+            save_state(state_file, state)
+        return True
+
+    results = {}
+    started = set()
+    error = None
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = {}
+        while True:
+            if error is None:
+                for stage in stages:
+                    if stage.name not in started and all(dep in results for dep in stage.deps):
+                        started.add(stage.name)
+                        futures[executor.submit(execute, stage)] = stage
+            if not futures:
+                break
+
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = futures.pop(future)
+                try:
+                    results[stage.name] = future.result()
+                except Exception as e:
+                    # 実行中のステージの完了を待ってから最初のエラーを伝える（完了したステージの記録は残る）
+                    error = error or e
+
+    if error is not None:
+        raise error
+    if len(results) < len(stages):
+        raise ValueError("依存関係が循環しているステージがあります: "
+                         + ', '.join(stage.name for stage in stages if stage.name not in results))
+    return results
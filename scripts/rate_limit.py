@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+外部API呼び出しのレート制御ユーティリティ
+複数スレッドから共有するトークンバケット（固定レート・AIMDで変わるレート）と、リトライ時の待機時間の計算を提供します
+"""
+
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    トークンバケットによるレート制限（スレッドセーフ）
+    平均 rate 回/秒、最大 burst 回まで連続で呼び出せる
+    """
+
+    def __init__(self, rate, burst=1, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            rate: 1秒あたりに補充するトークン数
+            burst: バケットの容量（連続で取得できるトークン数）
+            clock: 現在時刻（秒）を返す関数（テストでは時刻を進められる時計に置き換える）
+            sleep: 指定した秒数だけ待機する関数
+        """
+        if rate <= 0:
+            raise ValueError(f"rateは正の値を指定してください: {rate}")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """
+        トークンを1つ取得する（足りない場合は補充されるまで待機）
+
+        Returns:
+            待機した秒数
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill(self._clock())
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait_time = (1 - self._tokens) / self.rate
+            self._sleep(wait_time)
+            waited += wait_time
+
+
+class AdaptiveTokenBucket(TokenBucket):
+    """
+    混雑に応じてレートを変えるトークンバケット（AIMD、スレッドセーフ）
+    成功するたびにレートを少しずつ上げ（加算的増加）、レート制限エラーでは一定の割合に下げる（乗算的減少）
+    サーバーから待機時間の指示があれば、その間は全スレッドの取得を止める
+    """
+
+    def __init__(self, rate, burst=1, min_rate=None, increase=None, decrease=0.5, clock=time.monotonic,
+                 sleep=time.sleep):
+        """
+        Args:
+            rate: 初期レートかつ上限（1秒あたりのトークン数）
+            burst: バケットの容量
+            min_rate: 下限レート（Noneの場合は上限の1/10）
+            increase: 成功1回ごとに上げるレート（Noneの場合は上限の1/10）
+            decrease: レート制限エラーのときにレートに掛ける係数（0〜1）
+            clock: 現在時刻（秒）を返す関数
+            sleep: 指定した秒数だけ待機する関数
+        """
+        super().__init__(rate, burst, clock, sleep)
+        self.max_rate = rate
+        self.min_rate = min_rate if min_rate is not None else rate / 10
+        self.increase = increase if increase is not None else rate / 10
+        self.decrease = decrease
+        self._resume_at = 0.0
+
+    def acquire(self):
+        """
+        トークンを1つ取得する（待機時間の指示がある間と、トークンが足りない間は待機）
+
+        Returns:
+            待機した秒数
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                if now < self._resume_at:
+                    wait_time = self._resume_at - now
+                elif self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                else:
+                    wait_time = (1 - self._tokens) / self.rate
+            self._sleep(wait_time)
+            waited += wait_time
+
+    def on_success(self):
+        """リクエストが成功したときに呼ぶ（レートを上限まで加算的に上げる）"""
+        with self._lock:
+            self._refill(self._clock())
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after=None):
+        """
+        レート制限エラーのときに呼ぶ（レートを乗算的に下げ、溜まったトークンを捨てる）
+
+        Args:
+            retry_after: サーバーが指示した待機時間（秒）、Noneの場合は指示なし
+        """
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self._tokens = min(self._tokens, 0.0)
+            if retry_after:
+                self._resume_at = max(self._resume_at, now + retry_after)
+
+
+def backoff_delay(attempt, base=2.0, cap=60.0):
+    """
+    ジッター付き指数バックオフの待機時間（full jitter）
+    同時に失敗したリクエストのリトライが同じタイミングに集中しないようにする
+
+    Args:
+        attempt: 失敗した試行の番号（0始まり）
+        base: 初回の待機時間の上限（秒）
+        cap: 待機時間の上限（秒）
+
+    Returns:
+        待機する秒数
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
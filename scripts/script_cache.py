@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+生成済み原稿のキャッシュ
+モデル名・プロンプトのバージョン・スライドの内容のハッシュをキーにしてGeminiの応答を保存し、
+同じスライドは再びAPIを呼ばずに再利用します（保存方式・容量による削除は content_cache.py の共通部分を使う）
+"""
+
+import os
+import json
+import time
+from pathlib import Path
+from content_cache import ContentCache
+
+# キャッシュの保存先（環境変数 SCRIPT_CACHE_DIR で変更可能）
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / ".cache" / "scripts"
+
+# キャッシュの容量上限と有効期限
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_TTL_DAYS = 30
+
+
+class ScriptCache(ContentCache):
+    """
+    原稿の応答を <キャッシュディレクトリ>/<キーの先頭2文字>/<キー>.json に保存するキャッシュ
+    保存してから有効期限を過ぎた応答は使わずに削除する
+    """
+
+    SUFFIX = '.json'
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES, ttl_days=DEFAULT_TTL_DAYS):
+        """
+        Args:
+            cache_dir: キャッシュディレクトリ（Noneの場合は SCRIPT_CACHE_DIR または既定の場所）
+            max_bytes: キャッシュの容量上限（バイト）
+            ttl_days: 有効期限（日）、Noneの場合は期限なし
+        """
+        super().__init__(cache_dir or os.environ.get('SCRIPT_CACHE_DIR') or DEFAULT_CACHE_DIR, max_bytes)
+        self.ttl = ttl_days * 24 * 60 * 60 if ttl_days is not None else None
+
+    def _expired(self, entry):
+        return self.ttl is not None and time.time() - entry['created'] > self.ttl
+
+    def get(self, key):
+        """
+        キャッシュから応答を取得する
+
+        Args:
+            key: キャッシュキー
+
+        Returns:
+            応答のテキスト、ない場合・期限切れの場合はNone
+        """
+        cached = self.path_for(key)
+        try:
+            entry = json.loads(cached.read_text(encoding='utf-8'))
+            if self._expired(entry):
+                entry = None
+            else:
+                os.utime(cached)
+        except (FileNotFoundError, ValueError, KeyError):
+            entry = None
+
+        self._count(entry is not None)
+        return entry['text'] if entry is not None else None
+
+    def put(self, key, text):
+        """
+        応答をキャッシュに保存する
+
+        Args:
+            key: キャッシュキー
+            text: 応答のテキスト
+        """
+        entry = json.dumps({'created': time.time(), 'text': text}, ensure_ascii=False)
+        self.write(key, entry.encode('utf-8'))
+
+    def evict(self):
+        """
+        期限切れの応答を削除してから、容量上限を超えた分を最後に使われてから古い順に削除する
+
+        Returns:
+            削除したファイル数
+        """
+        removed = 0
+        if self.ttl is not None and self.cache_dir.exists():
+            for path in self.cache_dir.glob(f'*/*{self.SUFFIX}'):
+                try:
+                    expired = self._expired(json.loads(path.read_text(encoding='utf-8')))
+                except (ValueError, KeyError):
+                    expired = True  # 壊れたファイルも削除する
+                if expired:
+                    path.unlink(missing_ok=True)
+                    removed += 1
+        return removed + super().evict()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+原稿・音声・タイミングをスライドごとに流すパイプライン
+原稿が揃ったスライドから順に音声を合成し、音声ができたスライドから字幕タイミングを計算します
+工程の間は上限付きのキューでつなぎ、Geminiの待ち時間・TTSの待ち時間・音声の解析を重ねて実行します
+（全体の時間は各工程の合計ではなく、最も遅い工程の処理時間に近づく）
+最後にスライド順に並べて、原稿・音声メタデータ・タイミング情報を通常の実行と同じ形式で保存します
+"""
+
+import queue
+import threading
+from pathlib import Path
+from generate_script import generate_full_script, DEFAULT_RPM
+from generate_audio import generate_slide_audio, save_audio_metadata, TTS_LANG
+from generate_timings import (process_slide, timing_cache_key, finish_timings, load_timings_cache, save_timings_cache,
+                              TIMINGS_CACHE_NAME)
+from rate_limit import TokenBucket
+from tts_backends import get_backend
+
+# キューの終わりを表す値
+DONE = object()
+
+
+class StreamStopped(Exception):
+    """他の工程が失敗したため処理を打ち切った"""
+
+
+def generate_narration_streaming(slide_file, script_file, audio_dir, timings_file, script_cache=None, tts_cache=None,
+                                 backend=None, audio_format='mp3', speed_mode='resample', trim_pad=None,
+                                 target_db=None, align='chars', use_timings_cache=True, script_workers=4,
+                                 rpm=DEFAULT_RPM, batch_size=1, audio_workers=2, rate=0.5, burst=1, queue_size=4):
+    """
+    スライドファイルから原稿・音声・タイミング情報をスライドごとに流して生成する
+    音声はスライドごとに合成する場合だけに対応する（デッキ全体の音量正規化や連結したナレーションは全スライドが必要）
+
+    Args:
+        slide_file: スライドファイルのパス
+        script_file: 原稿JSONファイルの出力先
+        audio_dir: 音声ファイルの出力ディレクトリ
+        timings_file: タイミングJSONファイルの出力先
+        script_cache: 原稿キャッシュ（ScriptCache、Noneの場合は使わない）
+        tts_cache: 音声キャッシュ（TTSCache、Noneの場合は使わない）
+        backend: 音声合成エンジン（Noneの場合はgTTS）
+        audio_format: 音声の出力形式
+        speed_mode: 速度変更の方式
+        trim_pad: 先頭・末尾に残す無音（秒）、Noneの場合は削らない
+        target_db: スライドごとに正規化する平均レベル（dBFS）、Noneの場合は正規化しない
+        align: 字幕タイミングの計算方法（'chars' または 'energy'）
+        use_timings_cache: タイミングキャッシュを使うかどうか
+        script_workers: 同時に送る原稿のリクエスト数
+        rpm: 原稿のリクエスト数の上限（回/分）
+        batch_size: 1回のリクエストでまとめて依頼するスライド数
+        audio_workers: 同時に合成するスライド数
+        rate: TTSリクエストの上限（回/秒）
+        burst: 連続で送れるTTSリクエスト数
+        queue_size: 工程の間で待たせておけるスライド数（前の工程が先に進みすぎないようにする）
+
+    Returns:
+        (原稿データ, 音声メタデータ, タイミング情報)
+    """
+    audio_dir = Path(audio_dir)
+    audio_dir.mkdir(parents=True, exist_ok=True)
+    backend = backend or get_backend('gtts', TTS_LANG)
+    limiter = TokenBucket(rate, burst)
+    audio_workers = max(1, audio_workers)
+
+    scripts_queue = queue.Queue(maxsize=queue_size)
+    audio_queue = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+    script_data = {}
+    audio_files = {}
+    results = {}
+
+    def put(target, item):
+        # 後の工程が失敗した場合に、空きを待ち続けないようにする
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise StreamStopped()
+
+    def get(source):
+        while not stop.is_set():
+            try:
+                return source.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        raise StreamStopped()
+
+    def run(worker):
+        def wrapper():
+            try:
+                worker()
+            except StreamStopped:
+                pass
+            except Exception as e:
+                errors.append(e)
+                stop.set()
+        thread = threading.Thread(target=wrapper, daemon=True)
+        thread.start()
+        return thread
+
+    def scripts_stage():
+        try:
+            script_data.update(generate_full_script(slide_file, script_file, workers=script_workers, rpm=rpm,
+                                                    cache=script_cache, batch_size=batch_size, return_data=True,
+                                                    on_script=lambda slide: put(scripts_queue, slide)))
+        finally:
+            # 失敗した場合も、音声の工程が待ち続けないように終わりを伝える（打ち切り中は不要）
+            if not stop.is_set():
+                for _ in range(audio_workers):
+                    put(scripts_queue, DONE)
+
+    def audio_stage():
+        try:
+            while True:
+                slide = get(scripts_queue)
+                if slide is DONE:
+                    break
+                audio_info = generate_slide_audio(slide, audio_dir, limiter, tts_cache, backend,
+                                                  audio_format=audio_format, speed_mode=speed_mode,
+                                                  trim_pad=trim_pad, target_db=target_db)
+                audio_files[audio_info['index']] = audio_info
+                put(audio_queue, audio_info)
+        finally:
+            if not stop.is_set():
+                put(audio_queue, DONE)
+
+    cache = load_timings_cache(Path(timings_file).parent / TIMINGS_CACHE_NAME) if use_timings_cache else None
+    cached_files = {}
+    keys = {}
+
+    def timings_stage():
+        remaining = audio_workers
+        while remaining:
+            audio_info = get(audio_queue)
+            if audio_info is DONE:
+                remaining -= 1
+                continue
+            if cache is None:
+                results[audio_info['index']] = process_slide(audio_info, align)
+                continue
+            key = timing_cache_key(audio_info, align, cache, cached_files)
+            keys[audio_info['index']] = key
+            results[audio_info['index']] = cache['slides'].get(key) or process_slide(audio_info, align)
+
+    threads = [run(scripts_stage)] + [run(audio_stage) for _ in range(audio_workers)] + [run(timings_stage)]
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+    if tts_cache:
+        removed = tts_cache.evict()
+        print(f"\n音声キャッシュ: {tts_cache.summary()}" + (f"、{removed}件を削除" if removed else ""))
+
+    # 完了順に関わらずスライド順に並べて保存する
+    ordered = [audio_files[slide['index']] for slide in script_data['slides']]
+    _, metadata = save_audio_metadata(ordered, audio_dir)
+
+    if cache is not None:
+        # 通常の実行と同じく、今回のデッキのスライドだけをスライド順に残す
+        cache['files'] = {info['audio_file']: cached_files[info['audio_file']]
+                          for info in ordered if info['audio_file'] in cached_files}
+        cache['slides'] = {keys[info['index']]: results[info['index']] for info in ordered}
+        save_timings_cache(Path(timings_file).parent / TIMINGS_CACHE_NAME, cache)
+    timings = finish_timings(ordered, [results[info['index']] for info in ordered], timings_file)
+    return script_data, metadata, timings
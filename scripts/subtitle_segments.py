@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+原稿テキストを字幕セグメント（最大2行、1行31文字まで）に分割する改行エンジン
+タイミング生成（generate_timings.py）と、セグメント単位の音声合成（generate_audio.py の --chunking segment）で共有します
+"""
+
+import re
+import bisect
+from functools import lru_cache
+
+# 改行候補: 読点・空白の後、または助詞の後（形式名詞や助詞が続く場合は除く）
+PARTICLES = ['は', 'が', 'を', 'に', 'で', 'と', 'へ', 'や', 'の', 'から', 'まで', 'より', 'も', 'し', 'ば', 'て']
+FORMAL_NOUNS = ['こと', 'もの', 'ため', 'よう', 'ところ', 'はず', 'わけ']
+BREAK_PUNCTUATION = ['、', '，', ' ', '　']
+# 行頭に置けない文字（閉じ括弧・句読点・長音・小書きの仮名）。この直前では改行しない
+NO_BREAK_BEFORE = '」』）)］】〉》、。，．！？!?ー…ぁぃぅぇぉっゃゅょゎ'
+
+# 改行位置の種類ごとのコスト（行内の改行, セグメントの区切り）
+# weak: 助詞の後にひらがなが続く位置。「生成し|たり」「と|いった」「に|ついて」のように
+#       語の途中や助詞の続きであることが多いため、読点や漢字・カタカナの前の助詞がない場合だけ使う
+#       WEAK_BREAKS を False にすると区別せず、通常の助詞（particle）として扱う
+BREAK_COSTS = {
+    'punct': (0.0, 0.0),
+    'particle': (2.0, 6.0),
+    'weak': (8.0, 16.0),
+    'forced': (20.0, 40.0),
+}
+# 行内の改行のコストだけの表
+LINE_COSTS = {kind: costs[0] for kind, costs in BREAK_COSTS.items()}
+SEGMENT_COST = 10.0  # セグメント（字幕1枚）ごとのコスト
+FILL_WEIGHT = 4.0  # 行の余白に対する二乗コストの重み
+
+def _build_break_pattern(kinds=('punct', 'weak', 'particle'), weak=True):
+    """
+    読点・助詞・形式名詞の除外をすべて1つのパターン（オートマトン）にまとめてコンパイル
+    先頭の先読みで候補になりうる文字だけを高速に拾い、文ごとに1回だけ走査する
+
+    Args:
+        kinds: パターンに含める改行位置の種類（一部の種類だけを探す場合も、位置と種類は全種類の場合と同じ）
+        weak: 弱い助詞を区別する（Falseの場合、kindsにweakを含めず、助詞はすべてparticleになる）
+    """
+    single = ''.join(p for p in PARTICLES if len(p) == 1)
+    multi = '|'.join(p for p in PARTICLES if len(p) > 1)
+    punctuation = ''.join(BREAK_PUNCTUATION)
+    followers = '[' + single + NO_BREAK_BEFORE + ']|' + '|'.join(FORMAL_NOUNS)
+    particle = f'(?:{multi}|[{single}])(?!{followers})'
+    branches = {
+        'punct': f'(?P<punct>[{punctuation}])',
+        'weak': f'(?P<weak>{particle}(?=[ぁ-ゖ]))',
+        'particle': f'(?P<particle>{particle}(?![ぁ-ゖ]))' if weak else f'(?P<particle>{particle})',
+    }
+    first_chars = (punctuation if 'punct' in kinds else '') + single + ''.join(p[0] for p in PARTICLES if len(p) > 1)
+    return re.compile(f'(?=[{first_chars}])(?:' + '|'.join(branches[kind] for kind in kinds) + ')')
+
+# 弱い助詞（weak）を区別するかどうか
+WEAK_BREAKS = True
+# 改行候補のパターン（WEAK_BREAKS の値ごと）
+BREAK_PATTERNS = {
+    True: _build_break_pattern(),
+    False: _build_break_pattern(('punct', 'particle'), weak=False),
+}
+# 助詞だけの改行候補（優先順位の順。窓の中で中央に最も近い位置を種類ごとに探すために使う）
+PARTICLE_PATTERNS = {
+    True: [(kind, _build_break_pattern((kind,))) for kind in ('particle', 'weak')],
+    False: [('particle', _build_break_pattern(('particle',), weak=False))],
+}
+# 読点・空白だけの改行候補
+PUNCT_PATTERN = re.compile(f'[{"".join(BREAK_PUNCTUATION)}]')
+_match_end = re.Match.end
+
+def find_break_candidates(sentence, start=1, end=None):
+    """
+    文を1回だけ走査して改行候補位置を列挙
+
+    Args:
+        sentence: 文
+        start: 候補とする最初の改行位置
+        end: 候補とする最後の改行位置
+
+    Returns:
+        (改行位置, 種類) のリスト（改行位置はその文字の直後）
+    """
+    length = len(sentence)
+    if end is None or end > length - 1:
+        end = length - 1
+
+    # 2文字の助詞と形式名詞の先読みのため、範囲の少し外側まで走査する
+    candidates = []
+    for match in BREAK_PATTERNS[WEAK_BREAKS].finditer(sentence, max(start - 2, 0), min(end + 3, length)):
+        pos = match.end()
+        if pos > end:
+            break
+        if pos >= start:
+            candidates.append((pos, match.lastgroup))
+
+    return candidates
+
+def _format_segment(lines):
+    """行のリストを字幕セグメントの文字列にする（末尾の読点は除く）"""
+    lines = [line.strip() for line in lines]
+    lines[-1] = lines[-1].rstrip('、，').strip()
+    return '\n'.join(line for line in lines if line)
+
+@lru_cache(maxsize=None)
+def _fill_costs(max_chars):
+    """行の余白（文字数）ごとの二乗コストの表"""
+    return [FILL_WEIGHT * (slack / max_chars) ** 2 for slack in range(max_chars + 1)]
+
+def _nearest_break(positions, lowest, highest):
+    """
+    昇順の改行位置のうち中央（lowestとhighestの中間）に最も近い位置（同じ距離なら前の位置）
+    範囲は中央に対して対称なため、最も近い位置が範囲外なら範囲内の位置はない
+
+    Returns:
+        改行位置、範囲内にない場合はNone
+    """
+    middle = lowest + highest
+    k = bisect.bisect_right(positions, middle // 2)
+    best = positions[k - 1] if k else None
+    if k < len(positions) and (best is None or 2 * positions[k] - middle < middle - 2 * best):
+        best = positions[k]
+    if best is None or best < lowest or best > highest:
+        return None
+    return best
+
+def _best_particle_break(sentence, lowest, highest):
+    """
+    改行位置 lowest〜highest の助詞の改行候補のうち、優先順位が最も高く中央に最も近い位置
+    種類ごとのパターンで走査し、中央以下で最後の位置と中央より後で最初の位置を比べる（_nearest_break と同じ規則）
+
+    Returns:
+        (改行位置, 種類)、候補がない場合は (None, None)
+    """
+    # 2文字の助詞と形式名詞の先読みのため、範囲の少し外側まで走査する
+    scan_start = max(lowest - 2, 0)
+    scan_end = min(highest + 3, len(sentence))
+    middle = lowest + highest
+    half = middle // 2
+    for kind, pattern in PARTICLE_PATTERNS[WEAK_BREAKS]:
+        best = None
+        for match in pattern.finditer(sentence, scan_start, scan_end):
+            pos = match.end()
+            if pos <= half:
+                best = pos
+                continue
+            if pos <= highest and (best is None or 2 * pos - middle < middle - 2 * best):
+                best = pos
+            break
+        # 範囲は中央に対して対称なため、中央以下の位置が範囲外なら範囲内の位置は中央より後にしかない
+        if best is not None and best >= lowest:
+            return best, kind
+    return None, None
+
+def _best_line_break(sentence, start, end, max_chars, nodes):
+    """
+    sentence[start:end] を2行に分ける改行位置を選ぶ
+    窓（両方の行がmax_chars以内になる範囲）の幅は最大でも1行分のため、余白の二乗コストの差は
+    改行位置の種類のコストの差より小さく、読点 > 助詞 > 弱い助詞 の順に、中央に最も近い位置が最小コストになる
+    そのため種類ごとに候補を探し、候補のある最初の種類で中央に最も近い位置を二分探索で選ぶ
+
+    Args:
+        nodes: 文全体の読点・空白の改行位置（昇順）
+
+    Returns:
+        (改行位置, 種類)、窓に改行候補がない場合は (None, None)
+    """
+    lowest = max(end - max_chars, start + 1)
+    highest = min(start + max_chars, end - 1)
+    if lowest > highest:
+        return None, None
+
+    pos = _nearest_break(nodes, lowest, highest)
+    if pos is not None:
+        return pos, 'punct'
+    return _best_particle_break(sentence, lowest, highest)
+
+def _single_line_break(sentence, max_chars):
+    """
+    2行に収まる文（max_chars より長く2行分以下）の改行位置を _best_line_break と同じ規則で選ぶ
+    区切りが「、」だけの文（ほとんどの文）は、区切りを列挙せずに中央の両側の最も近い「、」を探す
+
+    Returns:
+        改行位置、窓に改行候補がない場合はNone
+    """
+    length = len(sentence)
+    if '，' in sentence or ' ' in sentence or '　' in sentence:
+        return _best_line_break(sentence, 0, length, max_chars, _punct_nodes(sentence))[0]
+
+    # 窓は lowest〜max_chars（文末の「、」は窓の外）。中央以下で最も近い位置と中央より後で最も近い位置を比べる
+    lowest = length - max_chars
+    middle = lowest + max_chars
+    left = sentence.rfind('、', lowest - 1, middle // 2) + 1
+    right = sentence.find('、', middle // 2, max_chars) + 1
+    if right and (not left or 2 * right - middle < middle - 2 * left):
+        return right
+    if left:
+        return left
+    return _best_particle_break(sentence, lowest, max_chars)[0]
+
+def _two_line_segment(sentence, line_break):
+    """改行位置で2行にした字幕セグメント（_format_segmentと同じ結果を文字列操作だけで作る）"""
+    first = sentence[:line_break].strip()
+    second = sentence[line_break:].strip().rstrip('、，').strip()
+    if first and second:
+        return first + '\n' + second
+    return first or second
+
+def _punct_nodes(sentence):
+    """
+    文頭・読点・空白の改行位置・文末を列挙
+
+    Returns:
+        昇順の改行位置のリスト
+    """
+    length = len(sentence)
+    nodes = [0]
+    if '，' in sentence or ' ' in sentence or '　' in sentence:
+        nodes.extend(map(_match_end, PUNCT_PATTERN.finditer(sentence, 0, length - 1)))
+    else:
+        # 区切りが「、」だけの文（ほとんどの文）は正規表現を使わずに探す
+        pos = sentence.find('、', 0, length - 1)
+        while pos != -1:
+            nodes.append(pos + 1)
+            pos = sentence.find('、', pos + 1, length - 1)
+    nodes.append(length)
+    return nodes
+
+def _layout_punct_segments(sentence, max_chars, nodes, whole_checked=False):
+    """
+    読点・空白だけでセグメントを区切る動的計画法（2行のセグメント用）
+    セグメント数・セグメント内の改行位置の種類・行の余白の合計コストが最小になる区切りを選ぶ
+    セグメント内の改行は _best_line_break と同じ規則で選ぶ（読点は区切りの候補から二分探索で探す）
+    読点の間隔が2行分より長く区切れない場合は全候補を使う動的計画法に任せる
+
+    Args:
+        nodes: 文頭・読点・空白の改行位置・文末（昇順）
+        whole_checked: 文全体を1セグメントにする改行位置がないことを確認済み（_single_line_break で探した場合）
+
+    Returns:
+        セグメントのリスト、読点だけでは区切れない場合はNone
+    """
+    segment_chars = max_chars * 2
+    fill_costs = _fill_costs(max_chars)
+    particle_cost = LINE_COSTS['particle']
+    bisect_right = bisect.bisect_right
+
+    # cost[j]: 位置nodes[j]までを区切った場合の最小コスト
+    # back[j], breaks[j]: 直前の区切りとセグメント内の改行位置（1行の場合はNone）
+    # 区切りは読点だけなので区切りの種類のコストは0で、セグメントごとのコストだけを加える
+    infinity = float('inf')
+    count = len(nodes)
+    cost = [0.0] * count
+    back = [0] * count
+    breaks = [None] * count
+    first = 0
+    for j in range(1, count):
+        end = nodes[j]
+        while end - nodes[first] > segment_chars:
+            first += 1
+        # 短いセグメント（改行を探さなくてよい）から順に調べて、長いセグメントを下限で枝刈りする
+        # コストが等しい場合は前の区切りを選ぶ
+        best, best_i, best_break = infinity, -1, None
+        # 開始位置が lowest 以降なら1行に収まる
+        i = j - 1
+        lowest = end - max_chars
+        while i >= first and nodes[i] >= lowest:
+            total = cost[i] + fill_costs[nodes[i] - lowest]
+            if total <= best:
+                best, best_i = total, i
+            i -= 1
+        # 残りは2行のセグメント（文全体を1セグメントにする区切りは確認済みなら調べない）
+        last = 1 if whole_checked and j == count - 1 else 0
+        while i >= first and i >= last:
+            # 2行の余白の合計は一定のため、2行の余白が等しい場合が余白のコストの下限になる（コストは0以上）
+            cost_i = cost[i]
+            start = nodes[i]
+            slack = start - lowest + max_chars
+            lower_bound = cost_i + fill_costs[slack // 2] + fill_costs[slack - slack // 2]
+            if lower_bound > best:
+                i -= 1
+                continue
+            # 改行に使える読点はこのセグメントの内側の区切りだけなので、その範囲で中央に最も近い位置を探す
+            highest = start + max_chars
+            middle = lowest + highest
+            k = bisect_right(nodes, middle // 2, i + 1, j)
+            line_break = nodes[k - 1] if k > i + 1 and nodes[k - 1] >= lowest else None
+            if k < j and nodes[k] <= highest and (
+                    line_break is None or 2 * nodes[k] - middle < middle - 2 * line_break):
+                line_break = nodes[k]
+            if line_break is not None:
+                line_cost = 0.0
+            elif lower_bound + particle_cost > best:
+                i -= 1
+                continue
+            else:
+                line_break, kind = _best_particle_break(sentence, lowest, highest)
+                if line_break is None:
+                    i -= 1
+                    continue
+                line_cost = LINE_COSTS[kind]
+            total = cost_i + line_cost + fill_costs[highest - line_break] + fill_costs[line_break - lowest]
+            if total <= best:
+                best, best_i, best_break = total, i, line_break
+            i -= 1
+        cost[j] = best + SEGMENT_COST
+        back[j] = best_i
+        breaks[j] = best_break
+
+    if cost[-1] == infinity:
+        return None
+
+    segments = []
+    j = count - 1
+    while j > 0:
+        i = back[j]
+        line_break = breaks[j]
+        if line_break is None:
+            segment = sentence[nodes[i]:nodes[j]].strip().rstrip('、，').strip()
+        else:
+            segment = _two_line_segment(sentence[nodes[i]:nodes[j]], line_break - nodes[i])
+        if segment:
+            segments.append(segment)
+        j = i
+    segments.reverse()
+    return segments
+
+def _layout_long_sentence(sentence, max_chars, max_lines):
+    """
+    文を動的計画法で行とセグメントに分割
+    各行の余白、改行位置の種類、セグメント数の合計コストが最小になる分割を選ぶ
+    """
+    length = len(sentence)
+
+    # 改行候補（文頭と文末を含む）。候補間が1行より長い場合は強制改行位置を補う
+    positions = [0]
+    line_breaks = [0.0]
+    segment_breaks = [0.0]
+    for pos, kind in find_break_candidates(sentence) + [(length, 'punct')]:
+        while pos - positions[-1] > max_chars:
+            positions.append(positions[-1] + max_chars)
+            line_breaks.append(BREAK_COSTS['forced'][0])
+            segment_breaks.append(BREAK_COSTS['forced'][1])
+        positions.append(pos)
+        line_breaks.append(BREAK_COSTS[kind][0])
+        segment_breaks.append(BREAK_COSTS[kind][1])
+
+    infinity = float('inf')
+    node_count = len(positions)
+    fill_costs = _fill_costs(max_chars)
+
+    # cost[j][k]: 位置jでセグメントの(k+1)行目が終わる場合の最小コスト、back[j][k]: その行の開始位置
+    cost = [None] * node_count
+    back = [None] * node_count
+    # opening[i][k]: 位置iから(k+1)行目を始める場合のコスト（k=0はセグメントを区切って始める）
+    opening = [None] * node_count
+    opening[0] = [0.0] + [infinity] * (max_lines - 1)
+    # closing[j]: 位置jでセグメントを区切る場合に最小となる行番号
+    closing = [0] * node_count
+    lines_range = range(max_lines)
+
+    first = 0
+    for j in range(1, node_count):
+        end = positions[j]
+        while end - positions[first] > max_chars:
+            first += 1
+
+        cost_j = [infinity] * max_lines
+        back_j = [0] * max_lines
+        for i in range(first, j):
+            fill_cost = fill_costs[max_chars - end + positions[i]]
+            opening_i = opening[i]
+            for k in lines_range:
+                total = opening_i[k] + fill_cost
+                if total < cost_j[k]:
+                    cost_j[k] = total
+                    back_j[k] = i
+        cost[j] = cost_j
+        back[j] = back_j
+
+        # 位置jでセグメントを区切って次を始める場合と、改行して次の行を始める場合
+        k_best = cost_j.index(min(cost_j))
+        closing[j] = k_best
+        opening[j] = [cost_j[k_best] + segment_breaks[j] + SEGMENT_COST] + [
+            cost_j[k] + line_breaks[j] for k in range(max_lines - 1)
+        ]
+
+    # 文末から逆にたどって行とセグメントを復元
+    segments = []
+    lines = []
+    j = node_count - 1
+    k = closing[j]
+    while j > 0:
+        i = back[j][k]
+        lines.append(sentence[positions[i]:positions[j]])
+        if k == 0:
+            segments.append(_format_segment(lines[::-1]))
+            lines = []
+            k = closing[i]
+        else:
+            k -= 1
+        j = i
+
+    return [segment for segment in reversed(segments) if segment]
+
+def layout_sentence(sentence, max_chars_per_line=31, max_lines=2):
+    """
+    1文を字幕セグメントに分割（各セグメントは最大max_lines行、1行max_chars_per_line文字まで）
+    意味の区切り（読点、助詞）を優先し、文全体のコストが最小になるように改行する
+
+    Args:
+        sentence: 文
+        max_chars_per_line: 1行あたりの最大文字数
+        max_lines: 1セグメントあたりの最大行数
+
+    Returns:
+        セグメントのリスト（改行を含む）
+    """
+    length = len(sentence)
+    if length <= max_chars_per_line:
+        return [sentence]
+
+    if max_lines == 2:
+        # 2行に収まる文は改行位置を1つ選ぶだけでよい
+        if length <= max_chars_per_line * 2:
+            line_break = _single_line_break(sentence, max_chars_per_line)
+            if line_break is not None:
+                return [_two_line_segment(sentence, line_break)]
+        # それ以外は読点でセグメントを区切り、区切れなければ全体の最適化に任せる
+        segments = _layout_punct_segments(sentence, max_chars_per_line, _punct_nodes(sentence),
+                                          whole_checked=length <= max_chars_per_line * 2)
+        if segments is not None:
+            return segments
+
+    return _layout_long_sentence(sentence, max_chars_per_line, max_lines)
+
+# 文の区切りとなる文字で終わる文
+SENTENCE_PATTERN = re.compile('[^。！？\n]*[。！？\n]')
+
+def iter_sentences(chunks):
+    """
+    テキストのチャンク列から文を1つずつ取り出す（全体をメモリに溜めない）
+
+    Args:
+        chunks: テキストのチャンクのイテラブル（文字列そのものも可）
+
+    Yields:
+        前後の空白を除いた文
+    """
+    if isinstance(chunks, str):
+        chunks = (chunks,)
+
+    # チャンクをまたぐ文の断片だけを保持する
+    pending = []
+    for chunk in chunks:
+        # 文末の文字で終わる文はチャンクの先頭から隙間なく並ぶため、残りの長さは合計の長さから分かる
+        sentences = SENTENCE_PATTERN.findall(chunk)
+        consumed = sum(map(len, sentences))
+        if sentences:
+            if pending:
+                pending.append(sentences[0])
+                sentences[0] = ''.join(pending)
+                pending.clear()
+            yield from filter(None, map(str.strip, sentences))
+        if consumed < len(chunk):
+            pending.append(chunk[consumed:])
+
+    sentence = ''.join(pending).strip()
+    if sentence:
+        yield sentence
+
+def iter_segments(chunks, max_chars_per_line=31, max_lines=2):
+    """
+    テキストのチャンク列から字幕セグメントを1つずつ生成
+
+    Args:
+        chunks: テキストのチャンクのイテラブル（文字列そのものも可）
+        max_chars_per_line: 1行あたりの最大文字数
+        max_lines: 1セグメントあたりの最大行数
+
+    Yields:
+        字幕セグメント（改行を含む）
+    """
+    for sentence in iter_sentences(chunks):
+        yield from layout_sentence(sentence, max_chars_per_line, max_lines)
+
+def split_text_into_segments(text, max_chars_per_line=31, max_lines=2):
+    """
+    テキストを字幕用のセグメントに分割（最大2行、31文字/行まで）
+    意味の区切り（助詞、読点など）を考慮して改行位置を決定
+
+    Args:
+        text: 原稿テキスト（またはテキストのチャンクのイテラブル）
+        max_chars_per_line: 1行あたりの最大文字数
+        max_lines: 1セグメントあたりの最大行数
+
+    Returns:
+        分割されたテキストのリスト（改行を含む）
+    """
+    return list(iter_segments(text, max_chars_per_line, max_lines))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+音声合成エンジンの切り替え
+各エンジンは synthesize(text) で (サンプル配列, サンプリングレート) を返します
+- gtts: Google翻訳のTTS（ネットワークが必要）
+- tone: テキストから決まった音を作るオフラインのエンジン（ベンチマーク・動作確認用）
+- http: gTTS形式のエンドポイント（translate_tts）を持つHTTPサーバー（tts_stub_server.pyなど）
+"""
+
+import io
+import zlib
+import urllib.parse
+import urllib.request
+import numpy as np
+from audio_utils import decode_audio_bytes
+
+
+class GTTSBackend:
+    """gTTSによる音声合成"""
+
+    def __init__(self, lang='ja'):
+        self.lang = lang
+        self.name = 'gtts'
+
+    def synthesize(self, text):
+        from gtts import gTTS
+
+        # ファイルに書かずにメモリ上で受け取る
+        mp3_buffer = io.BytesIO()
+        gTTS(text=text, lang=self.lang, slow=False).write_to_fp(mp3_buffer)
+        return decode_audio_bytes(mp3_buffer.getvalue())
+
+
+class ToneBackend:
+    """
+    文字ごとに決まった高さの音を並べるオフラインのエンジン
+    同じテキストからは常に同じ音声を作り、句読点は無音にする
+    """
+
+    # 1文字あたりの長さ（秒）と句読点の無音（秒）
+    CHAR_DURATION = 0.12
+    PAUSE_DURATION = 0.25
+    PAUSE_CHARS = set('、。，．！？!?,. 　\n')
+
+    def __init__(self, lang='ja', sample_rate=24000):
+        self.lang = lang
+        self.sample_rate = sample_rate
+        self.name = 'tone'
+
+    def synthesize(self, text):
+        char_samples = int(self.CHAR_DURATION * self.sample_rate)
+        pause_samples = int(self.PAUSE_DURATION * self.sample_rate)
+
+        # 文字ごとの長さ・高さ・音量を並べてから一括で波形を作る
+        lengths = np.array([pause_samples if c in self.PAUSE_CHARS else char_samples for c in text] or [pause_samples])
+        voiced = np.array([c not in self.PAUSE_CHARS for c in text] or [False])
+        pitches = np.array([120 + zlib.crc32(c.encode('utf-8')) % 120 for c in text] or [0], dtype=np.float64)
+
+        frequency = np.repeat(pitches, lengths)
+        phase = 2 * np.pi * np.cumsum(frequency) / self.sample_rate
+        envelope = np.concatenate([np.hanning(length) for length in lengths]) * np.repeat(voiced, lengths)
+
+        # 基本周波数と倍音で声らしいスペクトルにする
+        wave = sum(np.sin(k * phase) / k for k in range(1, 5))
+        return (0.3 * wave * envelope).astype(np.float32), self.sample_rate
+
+
+class HTTPBackend:
+    """
+    gTTS形式のエンドポイント（GET {url}?ie=UTF-8&q=...&tl=ja&client=tw-ob）で音声を取得する
+    応答はMP3またはWAV
+    """
+
+    def __init__(self, url, lang='ja', timeout=30):
+        self.url = url
+        self.lang = lang
+        self.timeout = timeout
+        self.name = f"http:{url}"
+
+    def synthesize(self, text):
+        query = urllib.parse.urlencode({'ie': 'UTF-8', 'q': text, 'tl': self.lang, 'client': 'tw-ob'})
+        with urllib.request.urlopen(f"{self.url}?{query}", timeout=self.timeout) as response:
+            return decode_audio_bytes(response.read())
+
+
+BACKENDS = ('gtts', 'tone', 'http')
+
+
+def get_backend(name, lang='ja', url=None):
+    """
+    名前から音声合成エンジンを作る
+
+    Args:
+        name: BACKENDSのいずれか
+        lang: 言語
+        url: httpエンジンのエンドポイント
+
+    Returns:
+        synthesize(text) を持つエンジン
+    """
+    if name == 'gtts':
+        return GTTSBackend(lang)
+    if name == 'tone':
+        return ToneBackend(lang)
+    if name == 'http':
+        if not url:
+            raise ValueError("httpエンジンにはエンドポイントのURLが必要です")
+        return HTTPBackend(url, lang)
+    raise ValueError(f"対応していない音声合成エンジンです: {name}")
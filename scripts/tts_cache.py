@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+合成済み音声のキャッシュ
+合成条件（テキスト・言語・速度・エンジンなど）のハッシュをキーにして音声ファイルを保存し、
+同じ条件の音声は再合成せずにハードリンク（できない場合はコピー）で出力先に配置します
+（保存方式・容量による削除は content_cache.py の共通部分を使う）
+"""
+
+import os
+import shutil
+from pathlib import Path
+from content_cache import ContentCache
+
+# キャッシュの保存先（環境変数 TTS_CACHE_DIR で変更可能）
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / ".cache" / "tts"
+
+# キャッシュの容量上限（これを超えると最後に使われてから最も古いものから削除）
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+
+class TTSCache(ContentCache):
+    """
+    内容アドレス方式の音声キャッシュ
+    セグメントの音声はWAVのバイト列として読み書きし、スライドの音声はファイルとして出力先に配置する
+    """
+
+    SUFFIX = '.wav'
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        Args:
+            cache_dir: キャッシュディレクトリ（Noneの場合は TTS_CACHE_DIR または既定の場所）
+            max_bytes: キャッシュの容量上限（バイト）
+        """
+        super().__init__(cache_dir or os.environ.get('TTS_CACHE_DIR') or DEFAULT_CACHE_DIR, max_bytes)
+
+    def fetch(self, key, output_file):
+        """
+        キャッシュにあれば出力先に配置する
+
+        Args:
+            key: キャッシュキー
+            output_file: 出力ファイルパス（拡張子をキャッシュファイルにも使う）
+
+        Returns:
+            キャッシュにあった場合はTrue
+        """
+        output_file = Path(output_file)
+        cached = self.path_for(key, output_file.suffix)
+        try:
+            os.utime(cached)
+            place_file(cached, output_file)
+            hit = True
+        except FileNotFoundError:
+            hit = False
+
+        self._count(hit)
+        return hit
+
+    def store(self, key, source_file):
+        """
+        生成した音声をキャッシュに保存する（一時ファイル経由で置き換えるため途中で壊れない）
+
+        Args:
+            key: キャッシュキー
+            source_file: 保存する音声ファイル
+        """
+        source_file = Path(source_file)
+        self._write_atomic(self.path_for(key, source_file.suffix), lambda temp_file: shutil.copyfile(source_file, temp_file))
+
+
+def place_file(source_file, output_file):
+    """
+    ファイルを出力先に配置する（ハードリンク、できない場合はコピー）
+    出力先の既存ファイルは置き換える（既存ファイルの中身は書き換えない）
+    """
+    output_file = Path(output_file)
+    # 同じファイルへのリンクが既にある場合はそのまま使う（renameは同一ファイル間では何もしない）
+    if output_file.exists() and os.path.samefile(source_file, output_file):
+        return
+
+    temp_file = output_file.with_name(f".{output_file.name}.tmp")
+    temp_file.unlink(missing_ok=True)
+    try:
+        os.link(source_file, temp_file)
+    except OSError:
+        shutil.copyfile(source_file, temp_file)
+    os.replace(temp_file, output_file)
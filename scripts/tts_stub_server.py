@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+gTTS形式のエンドポイントを真似るローカルのHTTPサーバー
+GET /translate_tts?q=<テキスト>&tl=<言語> に対して tone エンジンで合成したWAVを返します
+遅延やエラー（429）を注入して、ネットワークなしでスループットやリトライを計測できます
+"""
+
+import random
+import threading
+import time
+import argparse
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from audio_utils import wav_bytes
+from tts_backends import ToneBackend
+
+
+def make_handler(latency=0.0, error_rate=0.0):
+    """
+    リクエストハンドラーを作る
+
+    Args:
+        latency: 1リクエストごとに待つ秒数（実際のTTSサーバーの処理時間の代わり）
+        error_rate: 429を返す割合（0.0〜1.0）
+    """
+    backend = ToneBackend()
+
+    class TTSHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urllib.parse.urlparse(self.path)
+            params = urllib.parse.parse_qs(url.query)
+            if url.path != '/translate_tts' or not params.get('q'):
+                self.send_error(404)
+                return
+
+            if latency:
+                time.sleep(latency)
+            if random.random() < error_rate:
+                self.send_response(429)
+                self.send_header('Retry-After', '1')
+                self.end_headers()
+                return
+
+            body = wav_bytes(*backend.synthesize(params['q'][0]))
+            self.send_response(200)
+            self.send_header('Content-Type', 'audio/wav')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # リクエストごとのログは出さない
+
+    return TTSHandler
+
+
+def start_server(host='127.0.0.1', port=0, latency=0.0, error_rate=0.0):
+    """
+    サーバーを別スレッドで起動する
+
+    Args:
+        host: 待ち受けるアドレス
+        port: ポート番号（0の場合は空いているポート）
+        latency: 1リクエストごとの遅延（秒）
+        error_rate: 429を返す割合
+
+    Returns:
+        (サーバー, エンドポイントのURL)
+    """
+    server = ThreadingHTTPServer((host, port), make_handler(latency, error_rate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/translate_tts"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="gTTS形式のローカルTTSサーバー")
+    parser.add_argument('--host', default='127.0.0.1', help="待ち受けるアドレス")
+    parser.add_argument('--port', type=int, default=8765, help="ポート番号")
+    parser.add_argument('--latency', type=float, default=0.0, help="1リクエストごとの遅延（秒）")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="429を返す割合（0.0〜1.0）")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(args.latency, args.error_rate))
+    print(f"TTSサーバーを起動: http://{args.host}:{args.port}/translate_tts")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
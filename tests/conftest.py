@@ -0,0 +1,29 @@
+"""
+テスト共通の設定
+scripts/ のモジュールはスクリプトとして直接実行する前提でフラットに置かれているため、
+テストからも同じようにインポートできるようにパスに加える
+"""
+
+import sys
+import json
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS_DIR = REPO_ROOT / "scripts"
+SAMPLE_SCRIPTS_DIR = REPO_ROOT / "presentations" / "scripts_output"
+
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+
+@pytest.fixture(scope="session")
+def sample_scripts():
+    """サンプル原稿（スライドごとの原稿テキストのリスト）"""
+    texts = []
+    for script_file in sorted(SAMPLE_SCRIPTS_DIR.glob("*_script.json")):
+        with open(script_file, 'r', encoding='utf-8') as f:
+            texts.extend(slide['script'] for slide in json.load(f)['slides'])
+    assert texts, f"サンプル原稿が見つかりません: {SAMPLE_SCRIPTS_DIR}"
+    return texts
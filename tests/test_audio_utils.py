@@ -0,0 +1,336 @@
+"""audio_utils.py のテスト"""
+
+import io
+import wave
+import struct
+
+import numpy as np
+import pytest
+
+import generate_timings
+from audio_utils import (PROBE_HEAD_SIZE, probe_duration, probe_mp3_duration, probe_wav_duration, frame_features,
+                         detect_pauses, wav_bytes, change_speed, frame_levels, trim_silence, gated_loudness,
+                         loudness_gain)
+
+# MPEG1 Layer III、44.1kHz、ステレオ、パディングなしのフレームヘッダー（3バイト目の上位4ビットがビットレート）
+MP3_SAMPLE_RATE = 44100
+MP3_SAMPLES_PER_FRAME = 1152
+MP3_BITRATE_INDEX = {128: 9, 160: 10, 192: 11}
+
+
+def mp3_frame(bitrate_kbps=128, payload=b''):
+    """フレームヘッダーと無音のデータだけのMP3フレーム"""
+    header = bytes([0xFF, 0xFB, MP3_BITRATE_INDEX[bitrate_kbps] << 4, 0x00])
+    frame_length = 144 * bitrate_kbps * 1000 // MP3_SAMPLE_RATE
+    body = payload[:frame_length - 4]
+    return header + body + bytes(frame_length - 4 - len(body))
+
+
+def xing_frame(frames, delay=576, padding=1000):
+    """Xingヘッダー（フレーム数・バイト数・TOC・品質）とLAMEタグを含む先頭フレーム"""
+    # ステレオのMPEG1ではXingタグはサイド情報（32バイト）の後ろ、フレームの36バイト目から
+    xing = b'Xing' + struct.pack('>II', 0x0F, frames) + bytes(4 + 100 + 4)
+    lame = b'LAME3.100' + bytes(12) + bytes([delay >> 4, ((delay & 0x0F) << 4) | (padding >> 8), padding & 0xFF])
+    return mp3_frame(128, bytes(32) + xing + lame)
+
+
+def id3v2_tag(payload):
+    """ID3v2.4タグ（サイズは7ビットずつのsyncsafe整数）"""
+    size = len(payload)
+    syncsafe = bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F])
+    return b'ID3\x04\x00\x00' + syncsafe + payload
+
+
+def wav_file(sample_count, sample_rate=8000, channels=1, sample_width=2):
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(sample_width)
+        w.setframerate(sample_rate)
+        w.writeframes(bytes(sample_count * channels * sample_width))
+    return buffer.getvalue()
+
+
+def flac_file(total_samples, sample_rate=44100, channels=2, bits=16):
+    """STREAMINFOブロックだけのFLAC"""
+    packed = (sample_rate << 44) | ((channels - 1) << 41) | ((bits - 1) << 36) | total_samples
+    streaminfo = struct.pack('>HH', 4096, 4096) + bytes(6) + packed.to_bytes(8, 'big') + bytes(16)
+    return b'fLaC' + bytes([0x80, 0, 0, len(streaminfo)]) + streaminfo
+
+
+def write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+def test_cbr_mp3(tmp_path):
+    path = write(tmp_path, 'cbr.mp3', mp3_frame() * 100)
+    assert probe_duration(path) == pytest.approx(100 * MP3_SAMPLES_PER_FRAME / MP3_SAMPLE_RATE)
+
+
+def test_cbr_mp3_longer_than_probe_head(tmp_path):
+    """先頭部分だけで足りない場合は残りを読んでフレームを走査する"""
+    frame = mp3_frame()
+    count = PROBE_HEAD_SIZE // len(frame) * 2
+    path = write(tmp_path, 'long.mp3', frame * count)
+    assert probe_duration(path) == pytest.approx(count * MP3_SAMPLES_PER_FRAME / MP3_SAMPLE_RATE)
+
+
+def test_vbr_mp3_uses_xing_frame_count(tmp_path):
+    """VBRはXingヘッダーのフレーム数からLAMEタグのエンコーダー遅延とパディングを引いた長さ"""
+    frames = 1000
+    # 実際のフレームは一部だけ（ヘッダーの値を使っていれば走査した数にはならない）
+    data = xing_frame(frames, delay=576, padding=1000) + mp3_frame(128) + mp3_frame(192) + mp3_frame(160)
+    path = write(tmp_path, 'vbr.mp3', data)
+    expected = (frames * MP3_SAMPLES_PER_FRAME - 576 - 1000) / MP3_SAMPLE_RATE
+    assert probe_duration(path) == pytest.approx(expected)
+
+
+def test_id3_prefixed_mp3(tmp_path):
+    """ID3v2タグの中のフレームに似たバイト列（埋め込み画像など）は読み飛ばす"""
+    tag = id3v2_tag(b'APIC' + mp3_frame() * 2 + bytes(100))
+    path = write(tmp_path, 'id3.mp3', tag + mp3_frame() * 40)
+    assert probe_duration(path) == pytest.approx(40 * MP3_SAMPLES_PER_FRAME / MP3_SAMPLE_RATE)
+
+
+def test_mp3_stops_at_id3v1_tag():
+    data = mp3_frame() * 10 + b'TAG' + bytes(125)
+    assert probe_mp3_duration(data) == pytest.approx(10 * MP3_SAMPLES_PER_FRAME / MP3_SAMPLE_RATE)
+
+
+@pytest.mark.parametrize('sample_count, sample_rate, channels', [
+    (8000, 8000, 1),
+    (12345, 22050, 2),
+    (0, 16000, 1),
+])
+def test_wav(tmp_path, sample_count, sample_rate, channels):
+    path = write(tmp_path, 'audio.wav', wav_file(sample_count, sample_rate, channels))
+    assert probe_duration(path) == pytest.approx(sample_count / sample_rate)
+
+
+def test_streaming_wav_without_data_size():
+    """ストリーミング出力の未設定のサイズ（0xFFFFFFFF）はファイルの残りから計算する"""
+    data = bytearray(wav_file(4000, 8000))
+    data_chunk = data.find(b'data')
+    data[data_chunk + 4:data_chunk + 8] = b'\xff\xff\xff\xff'
+    assert probe_wav_duration(bytes(data)) == pytest.approx(0.5)
+
+
+def test_flac(tmp_path):
+    path = write(tmp_path, 'audio.flac', flac_file(88200, 44100))
+    assert probe_duration(path) == pytest.approx(2.0)
+
+
+def test_unknown_format_is_not_probed(tmp_path):
+    assert probe_duration(write(tmp_path, 'noise.bin', bytes(range(256)) * 4)) is None
+    # 総サンプル数が未設定のFLACはヘッダーからは分からない
+    assert probe_duration(write(tmp_path, 'unknown.flac', flac_file(0))) is None
+
+
+def test_get_audio_duration_falls_back_to_decoding(tmp_path, monkeypatch):
+    """ヘッダーから長さが分からない場合だけpydubでデコードする"""
+    pydub = pytest.importorskip('pydub')
+    decoded = []
+
+    def from_file(audio_file):
+        decoded.append(audio_file)
+        return np.zeros(1500)  # 長さ（ミリ秒）だけ使われる
+
+    monkeypatch.setattr(pydub.AudioSegment, 'from_file', staticmethod(from_file))
+
+    unknown = write(tmp_path, 'unknown.flac', flac_file(0))
+    assert generate_timings.get_audio_duration(unknown) == pytest.approx(1.5)
+    assert decoded == [unknown]
+
+    known = write(tmp_path, 'known.wav', wav_file(8000, 8000))
+    assert generate_timings.get_audio_duration(known) == pytest.approx(1.0)
+    assert decoded == [unknown]
+
+
+# 無音区間の検出用の合成音声
+PCM_RATE = 16000
+
+
+def tone(duration, frequency=440.0, amplitude=0.5):
+    t = np.arange(int(duration * PCM_RATE)) / PCM_RATE
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+
+def silence(duration):
+    return np.zeros(int(duration * PCM_RATE), np.float32)
+
+
+def noise(duration, amplitude, seed=0):
+    """摩擦音の代わりの小さなホワイトノイズ"""
+    return (amplitude * np.random.default_rng(seed).uniform(-1.0, 1.0, int(duration * PCM_RATE))).astype(np.float32)
+
+
+def dominant_frequency(samples):
+    """中央部分のスペクトルのピークの周波数（端の影響を避け、ゼロ詰めで分解能を上げる）"""
+    middle = samples[len(samples) // 4:3 * len(samples) // 4]
+    spectrum = np.abs(np.fft.rfft(middle * np.hanning(len(middle)), 8 * len(middle)))
+    return np.argmax(spectrum) * PCM_RATE / (8 * len(middle))
+
+
+@pytest.mark.parametrize('speed_factor', [0.8, 1.25, 1.5])
+@pytest.mark.parametrize('mode', ['wsola', 'phase_vocoder'])
+def test_speed_change_keeps_pitch(mode, speed_factor):
+    """ピッチを保つ方式では、周波数を変えずに長さだけを 1/速度 にする"""
+    samples = tone(1.0)
+    changed = change_speed(samples, PCM_RATE, speed_factor, mode)
+    assert len(changed) == pytest.approx(len(samples) / speed_factor, abs=1)
+    assert dominant_frequency(changed) == pytest.approx(440.0, rel=0.005)
+
+
+@pytest.mark.parametrize('speed_factor', [0.8, 1.25, 1.5])
+def test_resample_shifts_pitch(speed_factor):
+    """resample は長さと一緒にピッチも速度の倍率だけ変わる"""
+    samples = tone(1.0)
+    changed = change_speed(samples, PCM_RATE, speed_factor, 'resample')
+    assert len(changed) == pytest.approx(len(samples) / speed_factor, abs=1)
+    assert dominant_frequency(changed) == pytest.approx(440.0 * speed_factor, rel=0.005)
+
+
+def test_unchanged_speed_and_unknown_mode():
+    samples = tone(0.1)
+    assert change_speed(samples, PCM_RATE, 1.0, 'wsola') is samples
+    with pytest.raises(ValueError):
+        change_speed(samples, PCM_RATE, 1.2, 'unknown')
+
+
+def test_trim_silence_keeps_padding():
+    """先頭・末尾の無音を pad 秒だけ残して削り、levels も音声のフレームだけにする"""
+    samples = np.concatenate([silence(0.5), tone(1.0), silence(0.7)])
+    trimmed, (powers, peaks) = trim_silence(samples, PCM_RATE, frame_levels(samples, PCM_RATE), pad=0.1)
+    assert np.array_equal(trimmed, samples[int(0.4 * PCM_RATE):int(1.6 * PCM_RATE)])
+    assert len(powers) == len(peaks) == 100
+    assert powers.min() > 0
+
+    trimmed, _ = trim_silence(samples, PCM_RATE, frame_levels(samples, PCM_RATE), pad=0.0)
+    assert np.array_equal(trimmed, samples[int(0.5 * PCM_RATE):int(1.5 * PCM_RATE)])
+
+    # 残す無音が元の無音より長い場合は両端で止める
+    trimmed, _ = trim_silence(samples, PCM_RATE, frame_levels(samples, PCM_RATE), pad=1.0)
+    assert np.array_equal(trimmed, samples)
+
+
+def test_trim_silence_treats_quiet_frames_as_silence():
+    """最も大きいフレームから threshold_db より小さいフレームは無音とみなす"""
+    samples = np.concatenate([tone(0.3, amplitude=0.001), tone(1.0), tone(0.3, amplitude=0.001)])
+    trimmed, _ = trim_silence(samples, PCM_RATE, frame_levels(samples, PCM_RATE), pad=0.05)
+    assert len(trimmed) == int(1.1 * PCM_RATE)
+
+
+@pytest.mark.parametrize('samples', [silence(0.5), np.zeros(0, np.float32)])
+def test_trim_silence_of_silent_or_empty_input(samples):
+    levels = frame_levels(samples, PCM_RATE)
+    trimmed, trimmed_levels = trim_silence(samples, PCM_RATE, levels)
+    assert trimmed is samples
+    assert trimmed_levels is levels
+
+
+def test_gated_loudness_ignores_silence_and_quiet_frames():
+    # 振幅0.5の正弦波の平均パワーは 0.125
+    expected = 10 * np.log10(0.125)
+    assert gated_loudness(frame_levels(tone(1.0), PCM_RATE)[0]) == pytest.approx(expected, abs=0.01)
+    # 無音（絶対ゲート）と、平均より10dB以上小さい音（相対ゲート）は平均に含めない
+    samples = np.concatenate([silence(1.0), tone(1.0), tone(1.0, amplitude=0.05), silence(0.5)])
+    assert gated_loudness(frame_levels(samples, PCM_RATE)[0]) == pytest.approx(expected, abs=0.01)
+
+
+@pytest.mark.parametrize('powers', [[], [0.0, 0.0], [1e-9]])
+def test_gated_loudness_without_speech(powers):
+    assert gated_loudness(np.array(powers)) is None
+    assert loudness_gain(gated_loudness(np.array(powers)), 0.0) == 1.0
+
+
+def test_loudness_gain_reaches_target():
+    samples = tone(1.0, amplitude=0.05)
+    powers, peaks = frame_levels(samples, PCM_RATE)
+    gain = loudness_gain(gated_loudness(powers), peaks.max(), target_db=-20.0)
+    assert gain > 1
+    assert gated_loudness(frame_levels(samples * gain, PCM_RATE)[0]) == pytest.approx(-20.0, abs=0.01)
+
+
+def test_loudness_gain_limits_peak():
+    """目標まで上げるとピークが peak_db を超える場合は、ピークが peak_db になるゲインに抑える"""
+    samples = tone(1.0)
+    powers, peaks = frame_levels(samples, PCM_RATE)
+    gain = loudness_gain(gated_loudness(powers), peaks.max(), target_db=-3.0, peak_db=-1.0)
+    assert np.abs(samples * gain).max() == pytest.approx(10 ** (-1.0 / 20), rel=1e-4)
+
+
+def test_frame_features():
+    rms_db, zcr = frame_features(np.concatenate([tone(0.5), silence(0.5)]), PCM_RATE)
+    assert len(rms_db) == len(zcr) == 100
+
+    # 振幅0.5の正弦波のRMSは 0.5/√2
+    assert rms_db[:50] == pytest.approx(20 * np.log10(0.5 / np.sqrt(2)), abs=0.1)
+    assert np.all(rms_db[50:] < -150)
+    # 440Hzの正弦波は1秒に880回ゼロを横切る
+    assert zcr[:50] == pytest.approx(2 * 440 / PCM_RATE, abs=0.01)
+    assert np.all(zcr[50:] == 0)
+
+
+def test_frame_features_of_short_input():
+    rms_db, zcr = frame_features(np.zeros(10, np.float32), PCM_RATE)
+    assert len(rms_db) == len(zcr) == 0
+    assert detect_pauses(np.zeros(10, np.float32), PCM_RATE) == []
+
+
+def test_detect_pauses_between_tones():
+    samples = np.concatenate([tone(1.0), silence(0.5), tone(1.0)])
+    pauses = detect_pauses(samples, PCM_RATE)
+    assert len(pauses) == 1
+    assert pauses[0] == pytest.approx((1.0, 1.5), abs=0.011)
+
+
+def test_detect_pauses_at_edges_and_ignores_short_gaps():
+    """先頭・末尾の無音も検出し、min_pauseより短い無音は無視する"""
+    samples = np.concatenate([silence(0.3), tone(0.5), silence(0.1), tone(0.5), silence(0.4)])
+    pauses = detect_pauses(samples, PCM_RATE, min_pause=0.15)
+    assert pauses == [pytest.approx((0.0, 0.3), abs=0.011), pytest.approx((1.4, 1.8), abs=0.011)]
+
+
+def test_detect_pauses_keeps_fricatives():
+    """エネルギーが低くてもゼロ交差率が高い区間（摩擦音）は無音として扱わない"""
+    samples = np.concatenate([tone(1.0), noise(0.3, 0.005), silence(0.3), tone(1.0)])
+    pauses = detect_pauses(samples, PCM_RATE)
+    assert len(pauses) == 1
+    assert pauses[0] == pytest.approx((1.3, 1.6), abs=0.011)
+
+
+def write_wav(tmp_path, name, samples):
+    return write(tmp_path, name, wav_bytes(samples, PCM_RATE))
+
+
+# 2つのセグメントに分かれる原稿
+TWO_SEGMENT_SCRIPT = '最初の文です。次の文はもう少しだけ長いです。'
+
+
+def test_energy_alignment_snaps_to_pause(tmp_path):
+    """--align energy では、セグメントの境界が検出した無音区間に合う"""
+    audio_file = write_wav(tmp_path, 'slide.wav', np.concatenate([tone(1.0), silence(0.5), tone(1.0)]))
+    result = generate_timings.process_slide({'audio_file': str(audio_file), 'script': TWO_SEGMENT_SCRIPT},
+                                            align='energy')
+
+    assert result['aligned']
+    assert len(result['segments']) == 2
+    (gap1, length1), (gap2, length2) = result['timeline']
+    assert gap1 == pytest.approx(0.0, abs=0.011)
+    assert gap1 + length1 == pytest.approx(1.0, abs=0.011)
+    assert gap1 + length1 + gap2 == pytest.approx(1.5, abs=0.011)
+    assert gap1 + length1 + gap2 + length2 == pytest.approx(2.5, abs=0.011)
+
+
+def test_energy_alignment_without_pauses_falls_back_to_chars(tmp_path):
+    """無音区間がない音声では文字数の割合によるタイミングに戻す"""
+    audio_file = write_wav(tmp_path, 'slide.wav', tone(2.5))
+    result = generate_timings.process_slide({'audio_file': str(audio_file), 'script': TWO_SEGMENT_SCRIPT},
+                                            align='energy')
+
+    assert not result['aligned']
+    lengths = [len(segment) for segment in result['segments']]
+    assert result['timeline'] == [list(entry) for entry in generate_timings.char_ratio_timeline(lengths, 2.5)]
+    assert any('文字数ベース' in note for note in result['notes'])
@@ -0,0 +1,207 @@
+"""create_video.py のステージの入力と、Remotionの依存関係・バンドルを作り直すかどうかのテスト"""
+
+import os
+import re
+import json
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from conftest import REPO_ROOT, SCRIPTS_DIR
+import create_video
+from create_video import (build_stages, bundle_project, install_dependencies, module_sources, sync_public,
+                          write_render_props)
+from pipeline import ContentHasher, input_key
+
+# 行頭の import 文（関数内の読み込みも含む）
+IMPORT_PATTERN = re.compile(r'^\s*(?:from\s+(\w+)\s+import|import\s+(\w+))', re.MULTILINE)
+
+
+def local_imports(source):
+    """ファイルが読み込む scripts/ 内のモジュールのファイル"""
+    names = {a or b for a, b in IMPORT_PATTERN.findall(source.read_text(encoding='utf-8'))}
+    return {SCRIPTS_DIR / f"{name}.py" for name in names if (SCRIPTS_DIR / f"{name}.py").exists()}
+
+
+@pytest.fixture
+def stages(tmp_path):
+    pytest.importorskip('yaml')
+    input_file = tmp_path / 'input.yaml'
+    input_file.write_text('topic: テスト\n', encoding='utf-8')
+    return {
+        stream: {stage.name: stage for stage in build_stages(input_file, REPO_ROOT, stream=stream)[0]}
+        for stream in (False, True)
+    }
+
+
+def inputs(stage):
+    return set(stage.inputs() if callable(stage.inputs) else stage.inputs)
+
+
+def test_module_sources_follow_imports():
+    sources = module_sources(SCRIPTS_DIR, 'generate_audio')
+    for source in sources:
+        assert local_imports(source) <= set(sources), source
+    assert {path.name for path in sources} >= {
+        'generate_audio.py', 'audio_utils.py', 'tts_cache.py', 'content_cache.py', 'rate_limit.py',
+        'tts_backends.py', 'subtitle_segments.py'}
+    # 読み込まないモジュールは含めない（変更しても音声を作り直さない）
+    assert SCRIPTS_DIR / 'benchmark.py' not in sources
+    assert SCRIPTS_DIR / 'generate_timings.py' not in sources
+
+    excluded = module_sources(SCRIPTS_DIR, 'generate_audio', exclude=('subtitle_segments',))
+    assert set(excluded) == set(sources) - {SCRIPTS_DIR / 'subtitle_segments.py'}
+
+
+@pytest.mark.parametrize('stream, name, modules, unused', [
+    (False, 'slides', ['create_slide'], []),
+    (False, 'script', ['generate_script', 'script_cache'], []),
+    # 音声はスライド単位で合成し、字幕の分割を使わない
+    (False, 'audio', ['generate_audio', 'tts_cache'], ['subtitle_segments']),
+    (False, 'timings', ['generate_timings'], []),
+    (True, 'narration', ['stream_pipeline', 'script_cache', 'tts_cache'], []),
+])
+def test_stage_inputs_include_every_imported_module(stages, stream, name, modules, unused):
+    """ステップと、そこから読み込まれる scripts/ 内のモジュールは（使わないものを除き）すべてステージの入力"""
+    stage_inputs = inputs(stages[stream][name])
+    unused = {SCRIPTS_DIR / f"{module}.py" for module in unused}
+    expected = {SCRIPTS_DIR / f"{module}.py" for module in modules}
+    while True:
+        closure = expected.union(*(local_imports(source) for source in expected)) - unused
+        if closure == expected:
+            break
+        expected = closure
+    assert expected <= stage_inputs
+    assert not unused & stage_inputs
+
+
+def test_script_and_audio_stage_inputs(stages):
+    script_inputs = {path.name for path in inputs(stages[False]['script'])}
+    assert {'generate_script.py', 'marp_parser.py', 'rate_limit.py', 'script_cache.py',
+            'content_cache.py'} <= script_inputs
+    audio_inputs = {path.name for path in inputs(stages[False]['audio'])}
+    assert {'tts_cache.py', 'rate_limit.py', 'tts_backends.py', 'content_cache.py'} <= audio_inputs
+    assert not {'generate_timings.py', 'subtitle_segments.py'} & audio_inputs
+
+
+@pytest.mark.parametrize('module', ['generate_timings.py', 'subtitle_segments.py'])
+def test_subtitle_change_reruns_timings_but_not_audio(tmp_path, module):
+    """字幕（タイミング・改行）の実装だけを変えた場合は、タイミング生成を実行し直し、音声は最新のまま"""
+    pytest.importorskip('yaml')
+    shutil.copytree(SCRIPTS_DIR, tmp_path / 'scripts', ignore=shutil.ignore_patterns('__pycache__'))
+    input_file = tmp_path / 'input.yaml'
+    input_file.write_text('topic: テスト\n', encoding='utf-8')
+    stages = {stage.name: stage for stage in build_stages(input_file, tmp_path)[0]}
+
+    before = {name: input_key(stages[name], ContentHasher()) for name in ('script', 'audio', 'timings')}
+    with open(tmp_path / 'scripts' / module, 'a', encoding='utf-8') as f:
+        f.write('\n# 字幕だけの調整\n')
+    after = {name: input_key(stages[name], ContentHasher()) for name in ('script', 'audio', 'timings')}
+
+    assert after['script'] == before['script']
+    assert after['audio'] == before['audio']
+    assert after['timings'] != before['timings']
+
+
+@pytest.fixture
+def remotion(tmp_path, monkeypatch):
+    """npm を実行したことにする Remotion プロジェクト（実行したコマンドを記録する）"""
+    project = tmp_path / 'remotion'
+    (project / 'src').mkdir(parents=True)
+    (project / 'public' / 'audio').mkdir(parents=True)
+    (project / 'package.json').write_text(json.dumps({
+        'scripts': {'bundle': 'remotion bundle'}, 'dependencies': {'remotion': '4.0.0'}}), encoding='utf-8')
+    (project / 'package-lock.json').write_text('{"lockfileVersion": 3}', encoding='utf-8')
+    (project / 'src' / 'index.ts').write_text('export {};\n', encoding='utf-8')
+    (project / 'remotion.config.ts').write_text('// 設定\n', encoding='utf-8')
+    (project / 'tsconfig.json').write_text('{}', encoding='utf-8')
+    (project / 'timings.json').write_text('{"slides": []}', encoding='utf-8')
+
+    commands = []
+
+    def run(cmd, cwd=None, **kwargs):
+        commands.append(' '.join(cmd))
+        if cmd == ['npm', 'install']:
+            (Path(cwd) / 'node_modules').mkdir(exist_ok=True)
+        elif cmd == ['npm', 'run', 'bundle']:
+            shutil.copytree(Path(cwd) / 'public', Path(cwd) / 'build' / 'public')
+        return subprocess.CompletedProcess(cmd, 0, '', '')
+
+    monkeypatch.setattr(create_video.subprocess, 'run', run)
+    return project, commands
+
+
+def test_install_only_when_dependencies_change(remotion):
+    project, commands = remotion
+    assert install_dependencies(project)
+    assert not install_dependencies(project)
+    assert commands == ['npm install']
+
+    # インストールに関係しない変更では実行しない
+    package = json.loads((project / 'package.json').read_text(encoding='utf-8'))
+    package['scripts']['render'] = 'remotion render'
+    (project / 'package.json').write_text(json.dumps(package), encoding='utf-8')
+    (project / 'src' / 'index.ts').write_text('export const x = 1;\n', encoding='utf-8')
+    assert not install_dependencies(project)
+
+    (project / 'package-lock.json').write_text('{"lockfileVersion": 3, "packages": {}}', encoding='utf-8')
+    assert install_dependencies(project)
+    assert not install_dependencies(project)
+    assert commands == ['npm install'] * 2
+
+
+@pytest.mark.parametrize('change, rebundle', [
+    (lambda project: (project / 'src' / 'index.ts').write_text('export const x = 1;\n', encoding='utf-8'), True),
+    (lambda project: (project / 'src' / 'Slide.tsx').write_text('export {};\n', encoding='utf-8'), True),
+    (lambda project: (project / 'remotion.config.ts').write_text('// 変更\n', encoding='utf-8'), True),
+    (lambda project: (project / 'package-lock.json').write_text('{"lockfileVersion": 2}', encoding='utf-8'), True),
+    # レンダリング時に渡すデータ・素材はバンドルし直さない
+    (lambda project: (project / 'timings.json').write_text('{"slides": [{}]}', encoding='utf-8'), False),
+    (lambda project: (project / 'public' / 'audio' / 'slide_01.wav').write_bytes(b'audio'), False),
+])
+def test_bundle_only_when_sources_change(remotion, change, rebundle):
+    project, commands = remotion
+    install_dependencies(project)
+    assert bundle_project(project)
+    assert not bundle_project(project)
+    assert commands == ['npm install', 'npm run bundle']
+
+    change(project)
+    assert bundle_project(project) == rebundle
+    assert commands.count('npm run bundle') == 1 + rebundle
+    assert not bundle_project(project)
+
+
+def test_sync_public_replaces_only_changed_files(tmp_path):
+    public, bundled = tmp_path / 'public', tmp_path / 'build' / 'public'
+    (public / 'audio').mkdir(parents=True)
+    for name in ('slide_01.wav', 'slide_02.wav'):
+        (public / 'audio' / name).write_bytes(name.encode('utf-8'))
+    (public / 'slide.png').write_bytes(b'png')
+
+    assert sync_public(public, bundled) == 3
+    assert sync_public(public, bundled) == 0
+
+    # 別のファイルで置き換える（バンドル側のハードリンクは元のファイルのまま）
+    (public / 'audio' / 'new.tmp').write_bytes(b'new audio')
+    os.replace(public / 'audio' / 'new.tmp', public / 'audio' / 'slide_02.wav')
+    (public / 'audio' / 'slide_01.wav').unlink()
+    assert sync_public(public, bundled) == 1
+    assert sorted(p.relative_to(bundled).as_posix() for p in bundled.rglob('*') if p.is_file()) \
+        == ['audio/slide_02.wav', 'slide.png']
+    assert (bundled / 'audio' / 'slide_02.wav').read_bytes() == b'new audio'
+
+
+def test_render_props_include_every_field(tmp_path):
+    """バンドルに埋め込まれた既定値が残らないように、ない項目も含めて渡す"""
+    (tmp_path / 'timings.json').write_text(json.dumps({'slides': [{'index': 1}], 'fps': 30, 'totalFrames': 90}),
+                                           encoding='utf-8')
+    props = json.loads(write_render_props(tmp_path).read_text(encoding='utf-8'))
+    assert props == {'slides': [{'index': 1}], 'fps': 30, 'totalFrames': 90, 'frameIndex': None,
+                     'narrationFile': None, 'slidesMetadata': {'total_slides': 0, 'slides': []}}
+
+    metadata = {'total_slides': 1, 'slides': [{'index': 1, 'image': 'slide_01.png'}]}
+    (tmp_path / 'slides_metadata.json').write_text(json.dumps(metadata), encoding='utf-8')
+    assert json.loads(write_render_props(tmp_path).read_text(encoding='utf-8'))['slidesMetadata'] == metadata
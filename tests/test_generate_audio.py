@@ -0,0 +1,168 @@
+"""generate_audio.py の音声生成（スライド単位・連結・セグメント単位）のテスト"""
+
+import numpy as np
+import pytest
+
+import generate_audio
+from audio_utils import frame_levels, gated_loudness, load_pcm
+from generate_audio import generate_all_audio, generate_audio_for_slide, synthesize_text
+from generate_timings import process_slide
+from subtitle_segments import split_text_into_segments
+from tts_backends import ToneBackend
+
+SLIDES = [
+    {'index': 1, 'title': '導入', 'script': '見出し\n本文です。'},
+    {'index': 2, 'title': '本題', 'script': '次に、具体的な例を見ていきます。\n\n最後に補足します。'},
+    {'index': 3, 'title': 'まとめ', 'script': 'まとめです。'},
+]
+
+
+class RecordingBackend(ToneBackend):
+    """合成したテキストを記録するオフラインのエンジン"""
+
+    def __init__(self):
+        super().__init__()
+        self.texts = []
+
+    def synthesize(self, text):
+        self.texts.append(text)
+        return super().synthesize(text)
+
+
+def generate(tmp_path, name, backend=None, **kwargs):
+    return generate_all_audio({'slides': SLIDES}, tmp_path / name, rate=1000, burst=100, audio_format='wav',
+                              backend=backend or ToneBackend(), return_data=True, **kwargs)
+
+
+@pytest.mark.parametrize('options', [{'master': True}, {'loudness': 'deck'}, {'master': True, 'loudness': 'deck'}])
+def test_joined_audio_matches_slide_mode(tmp_path, options):
+    """連結・デッキ単位の正規化でも、原稿全体（段落の改行を含む）をスライド単位と同じように合成する"""
+    slide_backend, joined_backend = RecordingBackend(), RecordingBackend()
+    slide_files = generate(tmp_path, 'slide', slide_backend)['audio_files']
+    joined_files = generate(tmp_path, 'joined', joined_backend, **options)['audio_files']
+
+    assert sorted(joined_backend.texts) == sorted(slide_backend.texts) == sorted(s['script'] for s in SLIDES)
+    assert [info['duration'] for info in joined_files] == pytest.approx([info['duration'] for info in slide_files])
+    # スライド単位の合成では字幕セグメントの区切りを記録しない
+    assert not any('segments' in info for info in joined_files)
+
+    if options.get('master'):
+        # 各スライドは連結ファイルの中で隙間なく並ぶ
+        offset = 0.0
+        for info in joined_files:
+            assert info['audio_offset'] == pytest.approx(offset)
+            offset += info['duration']
+        samples, sample_rate = load_pcm(joined_files[0]['audio_file'])
+        assert len(samples) / sample_rate == pytest.approx(offset, abs=1 / sample_rate)
+
+
+LONG_SLIDES = [
+    {'index': 1, 'title': '背景', 'script': '生成AIの進歩により、文章や画像だけでなく音声や動画も自動で作れるようになりました。'
+                                            '一方で、著作権や誤情報への対策も重要になっています。'},
+    {'index': 2, 'title': '本題', 'script': '本日は、その両面について具体的な事例を交えながら順番に見ていきます。\n\n'
+                                            'まずは音声です。'},
+]
+
+
+@pytest.mark.parametrize('master', [False, True])
+def test_recorded_segments_match_subtitle_segments(tmp_path, master):
+    """セグメント単位の合成で記録する区間は、字幕セグメントごとの音声の位置と一致する"""
+    segment_gap = 0.2
+    audio_files = generate_all_audio({'slides': LONG_SLIDES}, tmp_path / 'out', rate=1000, burst=100,
+                                     audio_format='wav', backend=ToneBackend(), chunking='segment',
+                                     segment_gap=segment_gap, master=master, return_data=True)['audio_files']
+
+    for slide, info in zip(LONG_SLIDES, audio_files):
+        subtitles = split_text_into_segments(slide['script'])
+        assert len(subtitles) > 1
+        assert [segment['text'] for segment in info['segments']] == subtitles
+
+        # 各区間の長さは、そのセグメントを（字幕の改行を除いて）単独で合成した長さ
+        position = 0.0
+        for segment, text in zip(info['segments'], subtitles):
+            samples, sample_rate = synthesize_text(text.replace('\n', ''), ToneBackend())
+            assert segment['start'] == pytest.approx(position, abs=1 / sample_rate)
+            assert segment['end'] - segment['start'] == pytest.approx(len(samples) / sample_rate, abs=1 / sample_rate)
+            position = segment['end'] + segment_gap
+        assert info['segments'][-1]['end'] == pytest.approx(info['duration'], abs=1 / sample_rate)
+
+        # 字幕タイミングは記録した区間をそのまま使う
+        result = process_slide(info)
+        assert result['aligned']
+        assert result['segments'] == subtitles
+        assert [sum(entry) for entry in result['timeline']] \
+            == pytest.approx([segment['end'] - previous for segment, previous in
+                              zip(info['segments'], [0.0] + [s['end'] for s in info['segments'][:-1]])])
+
+    if not master:
+        for info in audio_files:
+            samples, sample_rate = load_pcm(info['audio_file'])
+            assert len(samples) / sample_rate == pytest.approx(info['duration'], abs=1 / sample_rate)
+
+
+class VaryingLevelBackend(ToneBackend):
+    """スライドごとに音量の違う音声を作るエンジン（'まとめ' を含む原稿は半分の音量）"""
+
+    def synthesize(self, text):
+        samples, sample_rate = super().synthesize(text)
+        return (samples * 0.5 if 'まとめ' in text else samples), sample_rate
+
+
+def load_samples(files):
+    return [load_pcm(info['audio_file'])[0] for info in files]
+
+
+@pytest.mark.parametrize('chunking', ['slide', 'segment'])
+def test_deck_loudness_reaches_target(tmp_path, chunking):
+    """デッキ単位の正規化では、全スライドに同じゲインを掛けて平均レベルを目標にする（スライド間の音量差は保つ）"""
+    options = {'chunking': chunking, 'target_db': -20.0}
+    raw = load_samples(generate(tmp_path, 'off', VaryingLevelBackend(), **options)['audio_files'])
+    deck = load_samples(generate(tmp_path, 'deck', VaryingLevelBackend(), loudness='deck', **options)['audio_files'])
+    clip = load_samples(generate(tmp_path, 'clip', VaryingLevelBackend(), loudness='clip', **options)['audio_files'])
+
+    gains = [np.sqrt(np.sum(d ** 2) / np.sum(r ** 2)) for d, r in zip(deck, raw)]
+    assert gains == pytest.approx([gains[0]] * 3, rel=1e-3)
+
+    # レベルは合成した単位（スライドの原稿全体、または字幕セグメント）ごとにフレームを区切って測る
+    if chunking == 'segment':
+        texts = [segment.replace('\n', '') for slide in SLIDES for segment in split_text_into_segments(slide['script'])]
+    else:
+        texts = [slide['script'] for slide in SLIDES]
+    levels = [frame_levels(*synthesize_text(text, VaryingLevelBackend())) for text in texts]
+    powers = np.concatenate([level[0] for level in levels])
+    expected_gain = 10 ** ((-20.0 - gated_loudness(powers)) / 20)
+    # ゲインを掛けると絶対ゲート付近のフレームが出入りするため、わずかにずれる
+    assert gated_loudness(powers * expected_gain ** 2) == pytest.approx(-20.0, abs=0.05)
+    # 16ビットに量子化したファイルから求めたゲインとの比較
+    assert gains[0] == pytest.approx(expected_gain, rel=2e-3)
+
+    def loudness(samples):
+        return gated_loudness(frame_levels(samples, ToneBackend().sample_rate)[0])
+
+    # ファイル全体で測り直すと、フレームの区切りとセグメント間の無音の分だけ少しずれる
+    assert loudness(np.concatenate(deck)) == pytest.approx(-20.0, abs=0.3)
+    # スライドごとの正規化では、どのスライドも目標になる
+    assert [loudness(samples) for samples in clip] == pytest.approx([-20.0] * 3, abs=0.3)
+
+
+class FailingBackend(ToneBackend):
+    """合成に毎回失敗するエンジン"""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def synthesize(self, text):
+        self.calls += 1
+        raise RuntimeError('合成に失敗')
+
+
+def test_slide_audio_retries_three_times_by_default(tmp_path, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(generate_audio.time, 'sleep', sleeps.append)
+    backend = FailingBackend()
+    with pytest.raises(RuntimeError, match='合成に失敗'):
+        generate_audio_for_slide('原稿です。', tmp_path / 'slide_01.wav', backend=backend)
+    assert backend.calls == 3
+    assert len(sleeps) == 2
+    assert not (tmp_path / 'slide_01.wav').exists()
@@ -0,0 +1,367 @@
+"""generate_script.py のテスト"""
+
+import re
+import sys
+import json
+import random
+import types
+
+import pytest
+
+import generate_script
+from generate_script import (build_batch_prompt, clean_declarative_phrases, create_model, generate_full_script,
+                             journal_path, load_journal, parse_batch_response, request_script)
+from rate_limit import AdaptiveTokenBucket
+from script_cache import ScriptCache
+
+# Geminiの応答によく含まれる宣言的な文
+DECLARATIVE_SENTENCES = [
+    "それでは、原稿を作成します。", "では、始めましょう。", "このスライドでは全体像を説明します。",
+    "次に、具体例を見ていきます。", "今回はスライド3の内容をご紹介します。", "本日のテーマを見てください。",
+]
+
+# 削除の条件に関わる断片（ランダムな原稿の材料）
+FRAGMENTS = [
+    '原稿を作成', 'スライド', '3', '１', 'では', 'それでは', '次に', '続いて', 'さて', 'それから', '、', '，',
+    'このスライド', '今回', '今日', '本日', 'ここ', 'で', 'から', 'について', 'ご紹介', '説明', '見て', 'ご覧',
+    '解説', 'します', 'いたします', 'しましょう', 'ください', '。', '\n', '\n\n', ' ', 'AI', '技術', 'です',
+]
+
+
+def legacy_clean_declarative_phrases(script):
+    """パターンを結合する前の実装（パターンごとに全体へ re.sub を繰り返す）"""
+    patterns_to_remove = [
+        r'^.*?原稿を作成.*?[。\n]',
+        r'^.*?スライド\d+.*?[。\n]',
+        r'^(では|それでは|次に|続いて|さて|それから)[、，]?.*?[。\n]',
+        r'^.*?(このスライド|今回|今日|本日|ここ)(では|で|から|について).*?[。\n]',
+        r'^.*?(ご紹介|説明|見て|ご覧|解説)(します|いたします|しましょう|ください).*?[。\n]',
+    ]
+    cleaned = script
+    for pattern in patterns_to_remove:
+        cleaned = re.sub(pattern, '', cleaned, flags=re.MULTILINE | re.IGNORECASE)
+    return cleaned.lstrip('\n').strip()
+
+
+def test_sample_scripts_match_legacy(sample_scripts):
+    """サンプル原稿（宣言的な文を先頭・途中に混ぜたものを含む）で従来の実装と同じ結果になる"""
+    rng = random.Random(0)
+    for text in sample_scripts:
+        assert clean_declarative_phrases(text) == legacy_clean_declarative_phrases(text)
+
+        body = text.split('。')
+        for _ in range(3):
+            body.insert(rng.randint(0, len(body)), rng.choice(DECLARATIVE_SENTENCES).rstrip('。') + '\n')
+        mixed = rng.choice(DECLARATIVE_SENTENCES) + '\n' + '。'.join(body)
+        assert clean_declarative_phrases(mixed) == legacy_clean_declarative_phrases(mixed)
+
+
+@pytest.mark.parametrize('script', [
+    '',
+    '\n',
+    '\n\n\n',
+    'それでは、原稿を作成します。',
+    'それでは、原稿を作成します。\n',
+    '\nでは\nでは\n本文です。',
+    'このスライドではAIを説明します。\nAIは便利です。',
+    # 行の削除で次の行が行頭に来て、前のパターンに一致する（入れ子になった削除）
+    '原稿を作成\n原稿を作成\nスライド1\nでは\n本文です。',
+    'スライド2\n原稿を作成します。本文です。',
+    'それから\n今回はスライド3\nをご紹介します。\n本文です。',
+    # 1行に複数の宣言的な文
+    'では、始めましょう。今回はご紹介します。本文です。',
+    # 宣言的な語が行頭以外にだけある
+    '本文です。\n最後にご覧ください',
+    '本文の途中で、では続けます。',
+])
+def test_edge_cases_match_legacy(script):
+    assert clean_declarative_phrases(script) == legacy_clean_declarative_phrases(script)
+
+
+def test_random_scripts_match_legacy():
+    """削除の条件に関わる断片を組み合わせたランダムな原稿で従来の実装と同じ結果になる"""
+    rng = random.Random(1)
+    for _ in range(3000):
+        script = ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 30)))
+        assert clean_declarative_phrases(script) == legacy_clean_declarative_phrases(script), repr(script)
+
+
+def write_deck(path, count):
+    path.write_text('---\nmarp: true\n---\n\n' +
+                    '\n\n---\n\n'.join(f'# タイトル{i}\n\n- 項目{i}' for i in range(1, count + 1)) + '\n',
+                    encoding='utf-8')
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """Geminiへの依頼を置き換え、依頼したスライド番号を記録する（failに入れた番号は失敗させる）"""
+    monkeypatch.setattr(generate_script, 'create_model', lambda: None)
+    requests = []
+    fail = set()
+
+    def request_script(model, prompt, label='', max_retries=5, limiter=None, generation_config=None):
+        index = int(label.split()[-1])
+        requests.append(index)
+        if index in fail:
+            raise RuntimeError(f"{label}: 失敗")
+        return f"{index}枚目の原稿です。"
+
+    monkeypatch.setattr(generate_script, 'request_script', request_script)
+    return requests, fail
+
+
+def test_journal_ignores_unreadable_lines(tmp_path):
+    """壊れた行・書きかけの行・形式の違う行は無視する"""
+    journal_file = tmp_path / 'deck_script.journal.jsonl'
+    journal_file.write_text(
+        json.dumps({'key': 'a', 'index': 1, 'response': '原稿A'}, ensure_ascii=False) + '\n'
+        + 'not json\n'
+        + '[1, 2]\n'
+        + 'null\n'
+        + json.dumps({'index': 2, 'response': 'キーなし'}, ensure_ascii=False) + '\n'
+        + json.dumps({'key': 'b', 'index': 2, 'response': '原稿B'}, ensure_ascii=False) + '\n'
+        + '{"key": "c", "index": 3, "resp',
+        encoding='utf-8')
+    assert load_journal(journal_file) == {'a': '原稿A', 'b': '原稿B'}
+    assert load_journal(tmp_path / 'missing.jsonl') == {}
+
+
+def test_resume_skips_journaled_slides(tmp_path, gemini):
+    """失敗したスライドだけを再実行で生成し、ジャーナルの原稿と合わせて保存する"""
+    requests, fail = gemini
+    deck = tmp_path / 'deck.md'
+    write_deck(deck, 4)
+    output_file = tmp_path / 'deck_script.json'
+
+    fail.add(3)
+    with pytest.raises(RuntimeError):
+        generate_full_script(deck, output_file, workers=1)
+    journal_file = journal_path(output_file)
+    assert sorted(entry['index'] for entry in map(json.loads, journal_file.read_text(encoding='utf-8').splitlines())) \
+        == [1, 2, 4]
+    assert not output_file.exists()
+
+    # 中断で書きかけになった行が残っていても続きから生成できる
+    with open(journal_file, 'a', encoding='utf-8') as f:
+        f.write('{"key": "')
+    fail.clear()
+    requests.clear()
+    data = generate_full_script(deck, output_file, workers=1, return_data=True)
+
+    assert requests == [3]
+    assert [slide['script'] for slide in data['slides']] == [f"{i}枚目の原稿です。" for i in range(1, 5)]
+    assert json.loads(output_file.read_text(encoding='utf-8')) == data
+    assert '=== スライド 3: タイトル3 ===' in (tmp_path / 'deck_script.txt').read_text(encoding='utf-8')
+    assert not journal_file.exists()
+
+
+def test_changed_slide_is_not_taken_from_journal(tmp_path, gemini):
+    """ジャーナルにあっても内容が変わったスライドは生成し直す"""
+    requests, fail = gemini
+    deck = tmp_path / 'deck.md'
+    write_deck(deck, 3)
+    output_file = tmp_path / 'deck_script.json'
+
+    fail.add(3)
+    with pytest.raises(RuntimeError):
+        generate_full_script(deck, output_file, workers=1)
+
+    deck.write_text(deck.read_text(encoding='utf-8').replace('項目2', '書き換えた項目'), encoding='utf-8')
+    fail.clear()
+    requests.clear()
+    generate_full_script(deck, output_file, workers=1)
+    assert sorted(requests) == [2, 3]
+
+
+def test_refresh_ignores_journal(tmp_path, gemini):
+    """refresh ではジャーナルの応答も使わずに全スライドを生成し直す"""
+    requests, fail = gemini
+    deck = tmp_path / 'deck.md'
+    write_deck(deck, 3)
+    output_file = tmp_path / 'deck_script.json'
+
+    fail.add(3)
+    with pytest.raises(RuntimeError):
+        generate_full_script(deck, output_file, workers=1)
+    journal_file = journal_path(output_file)
+    assert journal_file.exists()
+
+    # refresh の途中で失敗した場合も、ジャーナルには今回の応答だけが残る
+    requests.clear()
+    fail.clear()
+    fail.add(2)
+    with pytest.raises(RuntimeError):
+        generate_full_script(deck, output_file, workers=1, refresh=True)
+    assert sorted(requests) == [1, 2, 3]
+    assert sorted(entry['index'] for entry in map(json.loads, journal_file.read_text(encoding='utf-8').splitlines())) \
+        == [1, 3]
+
+    requests.clear()
+    fail.clear()
+    generate_full_script(deck, output_file, workers=1, refresh=True)
+    assert sorted(requests) == [1, 2, 3]
+    assert not journal_file.exists()
+
+
+def test_cached_deck_does_not_need_api_key(tmp_path, gemini, monkeypatch):
+    """全スライドがキャッシュにある場合はモデルを作らず、APIキーがなくても原稿を保存できる"""
+    requests, _ = gemini
+    cache = ScriptCache(tmp_path / 'cache')
+    deck = tmp_path / 'deck.md'
+    write_deck(deck, 3)
+    first = generate_full_script(deck, tmp_path / 'first_script.json', workers=1, cache=cache, return_data=True)
+
+    monkeypatch.setattr(generate_script, 'create_model', create_model)
+    monkeypatch.delenv('GOOGLE_AI_API_KEY', raising=False)
+    requests.clear()
+    second = generate_full_script(deck, tmp_path / 'second_script.json', workers=1, cache=cache, return_data=True)
+    assert second == first
+    assert requests == []
+
+    # キャッシュにないスライドがあれば、依頼する前にAPIキーがないことを伝える
+    deck.write_text(deck.read_text(encoding='utf-8').replace('項目2', '書き換えた項目'), encoding='utf-8')
+    with pytest.raises(ValueError, match='GOOGLE_AI_API_KEY'):
+        generate_full_script(deck, tmp_path / 'third_script.json', workers=1, cache=cache)
+    assert requests == []
+
+
+BATCH = [{'index': i, 'title': f'タイトル{i}', 'content': f'- 項目{i}'} for i in (2, 3, 4)]
+
+
+def test_batch_prompt_lists_every_slide():
+    prompt = build_batch_prompt(BATCH, 5)
+    for slide in BATCH:
+        assert f"スライド番号: {slide['index']} / 5" in prompt
+        assert slide['title'] in prompt and slide['content'] in prompt
+    assert '{"2": "原稿", "3": "原稿", "4": "原稿"}' in prompt
+
+
+@pytest.mark.parametrize('response', [
+    '{"2": "原稿2", "3": "原稿3", "4": "原稿4"}',
+    '```json\n{"2": "原稿2", "3": "原稿3", "4": "原稿4"}\n```',
+    '```\n{"2": "原稿2", "3": "原稿3", "4": "原稿4"}\n```\n',
+    # 依頼していないスライドや余分なキーは無視する
+    '{"1": "原稿1", "2": "原稿2", "3": "原稿3", "4": "原稿4", "note": "補足"}',
+])
+def test_parse_batch_response(response):
+    assert parse_batch_response(response, BATCH) == {2: '原稿2', 3: '原稿3', 4: '原稿4'}
+
+
+@pytest.mark.parametrize('response, expected', [
+    # 欠けているスライド・空や文字列でない原稿は取り出さない
+    ('{"2": "原稿2", "4": "原稿4"}', {2: '原稿2', 4: '原稿4'}),
+    ('{"2": "原稿2", "3": "  ", "4": ["原稿4"]}', {2: '原稿2'}),
+    # JSONのオブジェクトでない応答からは何も取り出さない
+    ('["原稿2", "原稿3", "原稿4"]', {}),
+    ('"原稿2"', {}),
+    ('null', {}),
+    ('2枚目の原稿です。', {}),
+    ('{"2": "原稿2", "3": ', {}),
+    ('', {}),
+])
+def test_parse_incomplete_batch_response(response, expected):
+    assert parse_batch_response(response, BATCH) == expected
+
+
+@pytest.mark.parametrize('response, retried', [
+    ('```json\n{"1": "1枚目の原稿です。", "3": "3枚目の原稿です。", "extra": "無視"}\n```', [2]),
+    ('{"1": "1枚目の原稿です。", "2": 2, "3": "3枚目の原稿です。"}', [2]),
+    ('原稿を作成できませんでした。', [1, 2, 3]),
+])
+def test_batch_falls_back_to_single_requests(tmp_path, monkeypatch, response, retried):
+    """まとめた応答から取り出せなかったスライドだけを1枚ずつ依頼し直す"""
+    monkeypatch.setattr(generate_script, 'create_model', lambda: None)
+    batches, singles = [], []
+
+    def request_script(model, prompt, label='', max_retries=5, limiter=None, generation_config=None):
+        if generation_config:
+            batches.append(label)
+            return response
+        index = int(label.split()[-1])
+        singles.append(index)
+        return f"{index}枚目の原稿です。"
+
+    monkeypatch.setattr(generate_script, 'request_script', request_script)
+    deck = tmp_path / 'deck.md'
+    write_deck(deck, 3)
+    output_file = tmp_path / 'deck_script.json'
+    data = generate_full_script(deck, output_file, workers=1, batch_size=3, return_data=True)
+
+    assert batches == ['スライド 1, 2, 3']
+    assert sorted(singles) == retried
+    assert [slide['script'] for slide in data['slides']] == [f"{i}枚目の原稿です。" for i in range(1, 4)]
+
+
+class ResourceExhausted(Exception):
+    """google.api_core.exceptions.ResourceExhausted の代わり"""
+
+
+@pytest.fixture
+def api_exceptions(monkeypatch):
+    """request_script が読み込むレート制限エラーの例外を用意する（SDKがなくても実行できるように）"""
+    google = types.ModuleType('google')
+    api_core = types.ModuleType('google.api_core')
+    exceptions = types.ModuleType('google.api_core.exceptions')
+    exceptions.ResourceExhausted = ResourceExhausted
+    google.api_core = api_core
+    api_core.exceptions = exceptions
+    for name, module in (('google', google), ('google.api_core', api_core),
+                         ('google.api_core.exceptions', exceptions)):
+        monkeypatch.setitem(sys.modules, name, module)
+
+
+class ThrottledModel:
+    """最初の呼び出しだけレート制限エラーを返すモデル"""
+
+    def __init__(self, message):
+        self.message = message
+        self.calls = 0
+
+    def generate_content(self, prompt, generation_config=None):
+        self.calls += 1
+        if self.calls == 1:
+            raise ResourceExhausted(self.message)
+        return types.SimpleNamespace(text='原稿です。')
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_retry_after_is_applied_through_limiter(api_exceptions, monkeypatch):
+    """サーバーの待機指示はリミッターに渡し、全スレッドの次の取得をその時間だけ止める"""
+    sleeps = []
+    monkeypatch.setattr(generate_script.time, 'sleep', sleeps.append)
+    clock = FakeClock()
+    limiter = AdaptiveTokenBucket(1, burst=1, clock=clock, sleep=clock.sleep)
+    model = ThrottledModel('429 Quota exceeded. Please retry in 7.5s.')
+
+    assert request_script(model, 'プロンプト', 'スライド 1', limiter=limiter) == '原稿です。'
+    assert model.calls == 2
+    # 自前のバックオフはせず、リミッターが指示された時間だけ待たせる
+    assert sleeps == [0.0]
+    assert clock.now == pytest.approx(7.5)
+    # 失敗で下げたレートは成功で上げ直す
+    assert limiter.rate == pytest.approx(0.6)
+
+
+@pytest.mark.parametrize('message, wait', [
+    ('429 Resource exhausted. retry_delay { seconds: 12 }', 12.0),
+    ('429 Resource exhausted.', None),
+])
+def test_retry_without_limiter(api_exceptions, monkeypatch, message, wait):
+    """リミッターがない場合は指示された時間（指示がなければバックオフ）だけ待ってリトライする"""
+    sleeps = []
+    monkeypatch.setattr(generate_script.time, 'sleep', sleeps.append)
+    monkeypatch.setattr(generate_script, 'backoff_delay', lambda attempt: 1.5)
+    model = ThrottledModel(message)
+
+    assert request_script(model, 'プロンプト', 'スライド 1') == '原稿です。'
+    assert sleeps == [wait if wait is not None else 1.5]
@@ -0,0 +1,212 @@
+"""generate_timings.py のテスト"""
+
+import os
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import generate_timings
+from audio_utils import wav_bytes
+from generate_timings import load_slide_pcm
+
+
+def test_master_pcm_is_reloaded_after_regeneration(tmp_path):
+    """連結したナレーションを作り直したら、前に読んだPCMを使い回さない"""
+    narration = tmp_path / 'narration.wav'
+    audio_info = {'audio_file': str(narration), 'audio_offset': 0.5, 'duration': 0.25}
+
+    narration.write_bytes(wav_bytes(np.full(8000, 0.25, np.float32), 8000))
+    samples, sample_rate = load_slide_pcm(audio_info)
+    assert sample_rate == 8000 and len(samples) == 2000
+    assert samples == pytest.approx(0.25, abs=1e-4)
+
+    # 同じ長さで内容だけ違うファイルに作り直す（更新時刻は確実に変える）
+    stat = os.stat(narration)
+    narration.write_bytes(wav_bytes(np.full(8000, -0.5, np.float32), 8000))
+    os.utime(narration, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    samples, _ = load_slide_pcm(audio_info)
+    assert samples == pytest.approx(-0.5, abs=1e-4)
+
+
+def write_narration(path, seconds, value=0.25, sample_rate=8000):
+    path.write_bytes(wav_bytes(np.full(int(seconds * sample_rate), value, np.float32), sample_rate))
+
+
+@pytest.fixture
+def deck(tmp_path, monkeypatch):
+    """3スライドの音声メタデータと、process_slide の呼び出しを数える仕組み"""
+    audio_files = []
+    for i, seconds in enumerate([1.0, 2.0, 1.5], start=1):
+        audio_file = tmp_path / f"slide_{i:02d}.wav"
+        write_narration(audio_file, seconds)
+        audio_files.append({'index': i, 'title': f"スライド{i}", 'audio_file': str(audio_file),
+                            'script': f"{i}枚目の原稿です。字幕に分けて表示します。"})
+
+    calls = []
+    process_slide = generate_timings.process_slide
+
+    def counting_process_slide(audio_info, align='chars'):
+        calls.append(audio_info['index'])
+        return process_slide(audio_info, align)
+
+    monkeypatch.setattr(generate_timings, 'process_slide', counting_process_slide)
+    return {'audio_files': audio_files}, calls, tmp_path / 'video_timings.json'
+
+
+def run_timings(metadata, output_file, **kwargs):
+    return generate_timings.generate_timings(metadata, output_file, return_data=True, **kwargs)
+
+
+def test_timings_cache_recomputes_only_changed_slides(deck):
+    metadata, calls, output_file = deck
+    first = run_timings(metadata, output_file)
+    assert calls == [1, 2, 3]
+    assert (output_file.parent / generate_timings.TIMINGS_CACHE_NAME).exists()
+
+    # 何も変わっていなければ再計算しない
+    assert run_timings(metadata, output_file) == first
+    assert calls == [1, 2, 3]
+
+    # 原稿だけが変わったスライド
+    metadata['audio_files'][0]['script'] = '書き換えた1枚目の原稿です。'
+    run_timings(metadata, output_file)
+    assert calls[3:] == [1]
+
+    # 音声が長くなったスライドだけを再計算し、後ろのスライドの開始フレームはずらしてつなぎ直す
+    write_narration(Path(metadata['audio_files'][1]['audio_file']), 3.0, value=-0.25)
+    updated = run_timings(metadata, output_file)
+    assert calls[4:] == [2]
+    assert updated['slides'][2]['startFrame'] == first['slides'][2]['startFrame'] + 30
+    assert updated['slides'][2]['subtitles'][0]['startFrame'] == first['slides'][2]['subtitles'][0]['startFrame'] + 30
+    assert updated == run_timings(metadata, output_file, use_cache=False)
+
+
+def test_timings_cache_keeps_only_current_slides(deck):
+    metadata, calls, output_file = deck
+    run_timings(metadata, output_file)
+    metadata['audio_files'] = metadata['audio_files'][:2]
+    run_timings(metadata, output_file)
+
+    cache = generate_timings.load_timings_cache(output_file.parent / generate_timings.TIMINGS_CACHE_NAME)
+    assert len(cache['slides']) == 2
+    assert sorted(cache['files']) == sorted(info['audio_file'] for info in metadata['audio_files'])
+
+
+@pytest.mark.parametrize('content', ['', '{"version": 1, "code": "', '[1, 2, 3]\n', 'CACHE_WITHOUT_SLIDES'])
+def test_broken_timings_cache_is_ignored(deck, content):
+    """途中で切れた・形式の違うキャッシュは無視して全スライドを計算し直す"""
+    metadata, calls, output_file = deck
+    expected = run_timings(metadata, output_file, use_cache=False)
+    if content == 'CACHE_WITHOUT_SLIDES':
+        content = json.dumps({'version': generate_timings.TIMINGS_CACHE_VERSION,
+                              'code': generate_timings.code_fingerprint(), 'files': {}})
+    (output_file.parent / generate_timings.TIMINGS_CACHE_NAME).write_text(content, encoding='utf-8')
+
+    assert run_timings(metadata, output_file) == expected
+    assert calls == [1, 2, 3, 1, 2, 3]
+    # 作り直したキャッシュは次から使われる
+    run_timings(metadata, output_file)
+    assert len(calls) == 6
+
+
+def test_timings_cache_is_invalidated_when_code_changes(deck, monkeypatch):
+    metadata, calls, output_file = deck
+    run_timings(metadata, output_file)
+    monkeypatch.setattr(generate_timings, 'code_fingerprint', lambda: 'changed')
+    run_timings(metadata, output_file)
+    assert calls == [1, 2, 3, 1, 2, 3]
+
+
+def test_audio_hash_is_reused_while_file_is_unchanged(tmp_path, monkeypatch):
+    audio_file = tmp_path / 'slide.wav'
+    write_narration(audio_file, 0.5)
+    records = {}
+    digest = generate_timings.audio_content_hash(audio_file, records)
+    assert digest == generate_timings.file_sha256(audio_file)
+
+    # サイズと更新時刻が同じなら読み直さない
+    monkeypatch.setattr(generate_timings, 'file_sha256', lambda path: pytest.fail('再計算された'))
+    assert generate_timings.audio_content_hash(audio_file, records) == digest
+    monkeypatch.undo()
+
+    # 同じサイズで内容が変わった（更新時刻が変わる）場合は計算し直す
+    stat = os.stat(audio_file)
+    write_narration(audio_file, 0.5, value=-0.25)
+    os.utime(audio_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert generate_timings.audio_content_hash(audio_file, records) != digest
+
+
+def linear_lookup(slides, frame):
+    """Video.tsx の索引がない場合と同じ、先頭から探す検索"""
+    slide = next((s for s in slides if s['startFrame'] <= frame < s['endFrame']), None)
+    if slide is None:
+        return None, None
+    return slide, next((s for s in slide['subtitles'] if s['startFrame'] <= frame < s['endFrame']), None)
+
+
+def assert_lookup_matches_linear_scan(slides):
+    timings = {'slides': slides, 'frameIndex': generate_timings.build_frame_index(slides)}
+    last = max([s['endFrame'] for s in slides] + [0])
+    for frame in range(-2, last + 3):
+        expected = linear_lookup(slides, frame)
+        actual = generate_timings.lookup_frame(timings, frame)
+        assert actual[0] is expected[0] and actual[1] is expected[1], frame
+
+
+def interval(start, end, **fields):
+    return {'startFrame': start, 'endFrame': end, **fields}
+
+
+def test_frame_index_matches_linear_scan_for_generated_timings(deck):
+    """字幕の間のギャップ・最後のフレームの後も、生成したタイミングで線形探索と同じ結果"""
+    metadata, _, output_file = deck
+    data = run_timings(metadata, output_file, use_cache=False)
+    assert_lookup_matches_linear_scan(data['slides'])
+
+    # 保存したファイルの索引（1行にまとめた配列）からも同じ結果
+    saved = json.loads(output_file.read_text(encoding='utf-8'))
+    assert saved['frameIndex'] == data['frameIndex']
+    for frame in range(data['totalFrames'] + 3):
+        expected = linear_lookup(saved['slides'], frame)
+        assert generate_timings.lookup_frame(saved, frame) == expected
+
+
+@pytest.mark.parametrize('slides', [
+    # スライドの間のギャップ・字幕のないスライド・先頭フレームより前
+    [interval(5, 20, subtitles=[interval(6, 10), interval(12, 20)]),
+     interval(25, 30, subtitles=[]),
+     interval(30, 40, subtitles=[interval(30, 35), interval(38, 45)])],
+    # 重なる区間は先に見つかるもの、長さ0の区間は表示しない
+    [interval(0, 10, subtitles=[interval(0, 8), interval(3, 5), interval(7, 7), interval(6, 12)]),
+     interval(8, 15, subtitles=[interval(8, 9)]),
+     interval(12, 12, subtitles=[interval(12, 13)])],
+    # 探索順と開始フレームの順が逆
+    [interval(10, 20, subtitles=[interval(15, 20), interval(10, 16)]),
+     interval(0, 12, subtitles=[interval(0, 11)])],
+    [],
+])
+def test_frame_index_matches_linear_scan_for_edge_cases(slides):
+    assert_lookup_matches_linear_scan(slides)
+
+
+def test_frame_index_matches_linear_scan_for_random_intervals():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        slides = []
+        for _ in range(rng.integers(1, 5)):
+            start = int(rng.integers(0, 40))
+            subtitles = []
+            for _ in range(rng.integers(0, 5)):
+                sub_start = start + int(rng.integers(-3, 15))
+                subtitles.append(interval(sub_start, sub_start + int(rng.integers(0, 10))))
+            slides.append(interval(start, start + int(rng.integers(0, 20)), subtitles=subtitles))
+        assert_lookup_matches_linear_scan(slides)
+
+
+def test_lookup_without_saved_index():
+    """索引のない古いタイミング情報でも引ける"""
+    slides = [interval(0, 10, subtitles=[interval(2, 4)])]
+    assert generate_timings.lookup_frame({'slides': slides}, 3) == (slides[0], slides[0]['subtitles'][0])
+    assert generate_timings.lookup_frame({'slides': slides}, 10) == (None, None)
@@ -0,0 +1,175 @@
+"""marp_parser.py（scripts/ と PresentationWorkFlow/scripts/ で共有する）のテスト"""
+
+import os
+import shutil
+import importlib.util
+
+import pytest
+
+import marp_parser
+from conftest import REPO_ROOT
+from generate_script import parse_marp_slides
+
+WORKFLOW_SCRIPTS_DIR = REPO_ROOT / "PresentationWorkFlow" / "scripts"
+
+# リポジトリにあるデッキ
+REPO_DECKS = sorted(list((REPO_ROOT / "slides").glob("*.md")) + list((REPO_ROOT / "presentations").glob("*/*.md")))
+
+
+def load_workflow_module(name):
+    """PresentationWorkFlow/scripts のモジュールを読み込む（scripts/ の同名モジュールと区別するため別名で登録）"""
+    spec = importlib.util.spec_from_file_location(f"workflow_{name}", WORKFLOW_SCRIPTS_DIR / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def legacy_parse_marp_slides(slide_file):
+    """共通パーサー導入前の generate_script.parse_marp_slides"""
+    with open(slide_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    slides = []
+    for slide_raw in content.split('---'):
+        slide_raw = slide_raw.strip()
+        if not slide_raw or slide_raw.startswith('marp:'):
+            continue
+        title = ''
+        content_lines = []
+        for line in slide_raw.split('\n'):
+            if line.startswith('# '):
+                title = line[2:].strip()
+            elif line.strip():
+                content_lines.append(line)
+        slides.append({'index': len(slides) + 1, 'title': title, 'content': '\n'.join(content_lines)})
+    return slides
+
+
+def legacy_parse_slides(slide_file):
+    """共通パーサー導入前の embed_images.parse_slides（generate_image_prompts はこの slides だけを使っていた）"""
+    with open(slide_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    parts = content.split('---\n')
+    header = '---\n' + parts[1] + '---\n'
+    slides = [part.strip() for part in parts[2:] if part.strip()]
+    return header, slides
+
+
+@pytest.fixture
+def decks(tmp_path):
+    """リポジトリのデッキのコピー（解析結果のキャッシュをリポジトリに書かないように一時ディレクトリで解析する）"""
+    assert REPO_DECKS, "リポジトリにデッキが見つかりません"
+    copies = []
+    for deck in REPO_DECKS:
+        copy = tmp_path / deck.parent.name / deck.name
+        copy.parent.mkdir(exist_ok=True)
+        shutil.copy2(deck, copy)
+        copies.append(copy)
+    return copies
+
+
+def test_workflow_uses_shared_parser():
+    """PresentationWorkFlow 側にコピーを置かず、scripts/marp_parser.py を読み込む"""
+    assert not (WORKFLOW_SCRIPTS_DIR / "marp_parser.py").exists()
+    assert load_workflow_module('embed_images').load_deck is marp_parser.load_deck
+
+
+def test_generate_script_matches_legacy(decks):
+    for deck in decks:
+        assert parse_marp_slides(deck) == legacy_parse_marp_slides(deck)
+
+
+def test_embed_images_matches_legacy(decks):
+    embed_images = load_workflow_module('embed_images')
+    for deck in decks:
+        assert embed_images.parse_slides(deck) == legacy_parse_slides(deck)
+
+
+def test_generate_image_prompts_matches_legacy(decks):
+    pytest.importorskip('google.genai')
+    generate_image_prompts = load_workflow_module('generate_image_prompts')
+    for deck in decks:
+        assert generate_image_prompts.parse_slides(deck) == legacy_parse_slides(deck)[1]
+
+
+def test_separator_inside_code_fence_is_ignored(tmp_path):
+    deck = tmp_path / 'deck.md'
+    deck.write_text('---\nmarp: true\n---\n\n# A\n\n```\n---\n```\n\n---\n\n# B\n', encoding='utf-8')
+    slides = marp_parser.load_deck(deck, use_cache=False).slides
+    assert [slide.title for slide in slides] == ['A', 'B']
+    assert '---' in slides[0].body
+
+
+@pytest.fixture
+def parser(monkeypatch):
+    """parse_deck の呼び出し回数を数える"""
+    calls = []
+    parse_deck = marp_parser.parse_deck
+
+    def counting_parse_deck(lines):
+        calls.append(1)
+        return parse_deck(lines)
+
+    monkeypatch.setattr(marp_parser, 'parse_deck', counting_parse_deck)
+    monkeypatch.setattr(marp_parser, 'calls', calls, raising=False)
+    return marp_parser
+
+
+def write_deck(path, titles, mtime_ns=None):
+    path.write_text('---\nmarp: true\n---\n\n' + '\n\n---\n\n'.join(f'# {title}\n\n本文' for title in titles) + '\n',
+                    encoding='utf-8')
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def titles(deck):
+    return [slide.title for slide in deck.slides]
+
+
+def test_cache_is_reused_while_unchanged(tmp_path, parser):
+    deck = tmp_path / 'deck.md'
+    write_deck(deck, ['A', 'B'], mtime_ns=1_000_000_000_000_000_000)
+
+    assert titles(parser.load_deck(deck)) == ['A', 'B']
+    assert parser.cache_path(deck).exists()
+    assert titles(parser.load_deck(deck)) == ['A', 'B']
+    assert len(parser.calls) == 1
+
+    # 更新時刻だけが変わった場合は内容のハッシュが同じなので解析し直さない
+    os.utime(deck, ns=(2_000_000_000_000_000_000, 2_000_000_000_000_000_000))
+    assert titles(parser.load_deck(deck)) == ['A', 'B']
+    assert len(parser.calls) == 1
+
+
+def test_cache_is_invalidated_when_source_changes(tmp_path, parser):
+    deck = tmp_path / 'deck.md'
+    write_deck(deck, ['A', 'B'], mtime_ns=1_000_000_000_000_000_000)
+    assert titles(parser.load_deck(deck)) == ['A', 'B']
+
+    # 同じサイズで内容だけが違う
+    write_deck(deck, ['C', 'D'], mtime_ns=2_000_000_000_000_000_000)
+    assert titles(parser.load_deck(deck)) == ['C', 'D']
+
+    # サイズが違う
+    write_deck(deck, ['C', 'D', 'E'], mtime_ns=3_000_000_000_000_000_000)
+    assert titles(parser.load_deck(deck)) == ['C', 'D', 'E']
+    assert len(parser.calls) == 3
+
+
+def test_cache_is_invalidated_when_parser_changes(tmp_path, parser, monkeypatch):
+    deck = tmp_path / 'deck.md'
+    write_deck(deck, ['A'])
+    parser.load_deck(deck)
+
+    monkeypatch.setattr(parser, 'code_fingerprint', lambda: 'changed')
+    assert titles(parser.load_deck(deck)) == ['A']
+    assert len(parser.calls) == 2
+
+
+def test_broken_cache_is_ignored(tmp_path, parser):
+    deck = tmp_path / 'deck.md'
+    write_deck(deck, ['A'])
+    parser.cache_path(deck).write_text('{broken', encoding='utf-8')
+    assert titles(parser.load_deck(deck)) == ['A']
+    assert len(parser.calls) == 1
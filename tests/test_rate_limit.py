@@ -0,0 +1,76 @@
+"""rate_limit.py のトークンバケットのテスト（時計を置き換えて待たずに確かめる）"""
+
+import pytest
+
+from rate_limit import AdaptiveTokenBucket, TokenBucket
+
+
+class FakeClock:
+    """呼び出すと現在時刻を返し、sleepで時刻を進める時計"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def test_token_bucket_waits_for_refill():
+    clock = FakeClock()
+    bucket = TokenBucket(2, burst=2, clock=clock, sleep=clock.sleep)
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == 0.0
+    assert bucket.acquire() == pytest.approx(0.5)
+    clock.now += 10
+    # 長く空いても burst 回までしか連続で取得できない
+    assert [bucket.acquire() for _ in range(3)] == pytest.approx([0.0, 0.0, 0.5])
+
+
+def test_adaptive_rate_decreases_to_floor_and_increases_to_ceiling():
+    """レート制限エラーで半分ずつ下限まで下げ、成功ごとに一定量ずつ上限まで戻す"""
+    clock = FakeClock()
+    bucket = AdaptiveTokenBucket(10, clock=clock, sleep=clock.sleep)
+    assert (bucket.min_rate, bucket.increase) == (1, 1)
+
+    rates = []
+    for _ in range(5):
+        bucket.on_throttle()
+        rates.append(bucket.rate)
+    assert rates == pytest.approx([5, 2.5, 1.25, 1, 1])
+
+    rates = []
+    for _ in range(11):
+        bucket.on_success()
+        rates.append(bucket.rate)
+    assert rates == pytest.approx([2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10])
+
+
+def test_throttle_discards_tokens_and_slows_acquire():
+    clock = FakeClock()
+    bucket = AdaptiveTokenBucket(4, burst=4, min_rate=1, increase=2, clock=clock, sleep=clock.sleep)
+    bucket.on_throttle()
+    # 溜まっていたトークンを捨て、下げたレート（2回/秒）で補充を待つ
+    assert bucket.acquire() == pytest.approx(0.5)
+    assert bucket.acquire() == pytest.approx(0.5)
+    bucket.on_success()
+    assert bucket.acquire() == pytest.approx(0.25)
+
+
+def test_retry_after_pauses_every_acquire():
+    """サーバーが指示した待機時間の間は、レートに関わらず取得を止める"""
+    clock = FakeClock()
+    bucket = AdaptiveTokenBucket(10, burst=10, clock=clock, sleep=clock.sleep)
+    bucket.on_throttle(retry_after=3.0)
+    start = clock.now
+    assert bucket.acquire() == pytest.approx(3.0)
+    assert clock.now - start == pytest.approx(3.0)
+
+    # 後から届いた短い指示で、先の長い指示を縮めない
+    bucket.on_throttle(retry_after=5.0)
+    bucket.on_throttle(retry_after=1.0)
+    assert bucket.acquire() == pytest.approx(5.0)
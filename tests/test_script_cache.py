@@ -0,0 +1,85 @@
+"""script_cache.py と generate_script の原稿キャッシュキーのテスト"""
+
+import os
+
+import generate_script
+import script_cache
+from content_cache import ContentCache
+from generate_script import script_cache_key
+from script_cache import ScriptCache
+
+SLIDE = {'index': 1, 'title': 'AIの動向', 'content': '- 生成AI\n- マルチモーダル'}
+
+
+def test_key_depends_on_slide_and_prompt(monkeypatch):
+    key = script_cache_key(SLIDE)
+    assert script_cache_key(dict(SLIDE)) == key
+    # 番号はキーに含めない（並べ替えたスライドも再利用できる）
+    assert script_cache_key({**SLIDE, 'index': 5}) == key
+    assert script_cache_key({**SLIDE, 'title': 'AIの未来'}) != key
+    assert script_cache_key({**SLIDE, 'content': '- 生成AI'}) != key
+
+    monkeypatch.setattr(generate_script, 'PROMPT_VERSION', generate_script.PROMPT_VERSION + 1)
+    assert script_cache_key(SLIDE) != key
+    monkeypatch.undo()
+    monkeypatch.setattr(generate_script, 'MODEL_NAME', 'another-model')
+    assert script_cache_key(SLIDE) != key
+
+
+def test_hit_after_put(tmp_path):
+    cache = ScriptCache(tmp_path)
+    key = script_cache_key(SLIDE)
+    assert cache.get(key) is None
+    cache.put(key, '生成された原稿です。')
+    assert cache.get(key) == '生成された原稿です。'
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.path_for(key).name == f"{key}.json"
+
+
+def test_only_script_methods_are_exposed(tmp_path):
+    """原稿キャッシュは共通部分だけを継承し、音声ファイル用のメソッドを持たない"""
+    cache = ScriptCache(tmp_path)
+    assert isinstance(cache, ContentCache)
+    assert not hasattr(cache, 'fetch') and not hasattr(cache, 'store')
+
+
+def test_expired_entry_is_not_used(tmp_path, monkeypatch):
+    cache = ScriptCache(tmp_path, ttl_days=1)
+    now = 1_700_000_000.0
+    monkeypatch.setattr(script_cache.time, 'time', lambda: now)
+    cache.put('ab' * 32, '古い原稿')
+
+    now += 2 * 24 * 60 * 60
+    assert cache.get('ab' * 32) is None
+    assert cache.evict() == 1
+    assert not cache.path_for('ab' * 32).exists()
+
+
+def test_corrupt_entry_is_a_miss_and_evicted(tmp_path):
+    cache = ScriptCache(tmp_path)
+    key = 'cd' * 32
+    path = cache.path_for(key)
+    path.parent.mkdir(parents=True)
+    path.write_text('{"created": 1', encoding='utf-8')  # 書き込み途中で切れたファイル
+    assert cache.get(key) is None
+    assert cache.evict() == 1
+
+
+def test_evict_removes_least_recently_used_down_to_limit(tmp_path):
+    cache = ScriptCache(tmp_path, max_bytes=0)
+    keys = [f"{i:02x}" * 32 for i in range(5)]
+    for i, key in enumerate(keys):
+        cache.put(key, 'x' * 100)
+        os.utime(cache.path_for(key), ns=(i * 10 ** 9, (i + 1) * 10 ** 9))
+    sizes = [cache.path_for(key).stat().st_size for key in keys]
+
+    # 最も古い2件を消せば上限内に収まる（保存時刻の桁数でファイルサイズが1バイト程度変わるため、実際のサイズで決める）
+    cache.max_bytes = sizes[0] + sizes[3] + sizes[4]
+    # 読み出し（最後に使われた時刻の更新）で一番古いものが新しくなる
+    assert cache.get(keys[0]) is not None
+    assert cache.evict() == 2
+    assert [cache.path_for(key).exists() for key in keys] == [True, False, False, True, True]
+
+
+def test_evict_without_directory(tmp_path):
+    assert ScriptCache(tmp_path / 'missing').evict() == 0
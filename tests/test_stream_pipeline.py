@@ -0,0 +1,123 @@
+"""stream_pipeline.py のスライドごとに流すパイプラインのテスト"""
+
+import threading
+
+import pytest
+
+import generate_script
+from script_cache import ScriptCache
+from stream_pipeline import generate_narration_streaming
+from tts_backends import ToneBackend
+from tts_cache import TTSCache
+
+SLIDE_COUNT = 3
+
+
+def write_deck(path, count):
+    path.write_text('---\nmarp: true\n---\n\n' +
+                    '\n\n---\n\n'.join(f'# タイトル{i}\n\n- 項目{i}' for i in range(1, count + 1)) + '\n',
+                    encoding='utf-8')
+
+
+class RecordingBackend(ToneBackend):
+    """合成したテキストを順に記録するオフラインのエンジン（failに含むテキストは失敗させる）"""
+
+    def __init__(self, fail=()):
+        super().__init__()
+        self.texts = []
+        self.fail = set(fail)
+        self.last_done = threading.Event()
+
+    def synthesize(self, text):
+        if text in self.fail:
+            raise RuntimeError(f"合成に失敗: {text}")
+        self.texts.append(text)
+        if text == script_text(SLIDE_COUNT):
+            self.last_done.set()
+        return super().synthesize(text)
+
+
+def script_text(index):
+    return f"{index}枚目の原稿です。"
+
+
+@pytest.fixture
+def gemini(monkeypatch):
+    """Geminiへの依頼を置き換え、依頼したスライド番号を記録する（holdに入れた番号は合図を待ってから返す）"""
+    monkeypatch.setattr(generate_script, 'create_model', lambda: None)
+    requests = []
+    hold = {}
+
+    def request_script(model, prompt, label='', max_retries=5, limiter=None, generation_config=None):
+        index = int(label.split()[-1])
+        requests.append(index)
+        if index in hold:
+            assert hold[index].wait(timeout=10)
+        return script_text(index)
+
+    monkeypatch.setattr(generate_script, 'request_script', request_script)
+    return requests, hold
+
+
+def run(tmp_path, name, backend, **kwargs):
+    deck = tmp_path / 'deck.md'
+    if not deck.exists():
+        write_deck(deck, SLIDE_COUNT)
+    out = tmp_path / name
+    out.mkdir()
+    return generate_narration_streaming(deck, out / 'deck_script.json', out / 'audio', out / 'timings.json',
+                                        backend=backend, audio_format='wav', rate=1000, burst=100, **kwargs)
+
+
+def test_results_are_in_slide_order(tmp_path, gemini):
+    """完了順がスライド順と違っても、原稿・音声・タイミングはスライド順に揃える"""
+    requests, hold = gemini
+    backend = RecordingBackend()
+    # 1枚目の原稿は最後のスライドの音声ができるまで返さない
+    hold[1] = backend.last_done
+
+    script_data, metadata, timings = run(tmp_path, 'out', backend, script_workers=SLIDE_COUNT)
+
+    assert sorted(requests) == list(range(1, SLIDE_COUNT + 1))
+    assert backend.texts[-1] == script_text(1)
+    assert backend.texts != [script_text(i) for i in range(1, SLIDE_COUNT + 1)]
+    assert [slide['index'] for slide in script_data['slides']] == list(range(1, SLIDE_COUNT + 1))
+    assert [slide['script'] for slide in script_data['slides']] == [script_text(i) for i in range(1, SLIDE_COUNT + 1)]
+    assert [info['index'] for info in metadata['audio_files']] == list(range(1, SLIDE_COUNT + 1))
+    assert [slide['index'] for slide in timings['slides']] == list(range(1, SLIDE_COUNT + 1))
+    assert (tmp_path / 'out' / 'deck_script.json').exists()
+    assert (tmp_path / 'out' / 'timings.json').exists()
+
+
+def test_audio_failure_is_raised_and_stops_every_thread(tmp_path, gemini):
+    """音声の工程が失敗したら、その例外を送出し、どの工程のスレッドも残さない"""
+    before = set(threading.enumerate())
+    backend = RecordingBackend(fail={script_text(2)})
+
+    with pytest.raises(RuntimeError, match='合成に失敗'):
+        run(tmp_path, 'out', backend, script_workers=1, audio_workers=2, queue_size=1)
+
+    assert set(threading.enumerate()) <= before
+    assert not (tmp_path / 'out' / 'timings.json').exists()
+
+
+def test_second_run_is_served_from_caches(tmp_path, gemini):
+    """2回目は原稿も音声もキャッシュから取り、Geminiにも音声合成にも依頼しない"""
+    requests, _ = gemini
+    script_cache = ScriptCache(tmp_path / 'script_cache')
+    tts_cache = TTSCache(tmp_path / 'tts_cache')
+
+    first = run(tmp_path, 'first', RecordingBackend(), script_cache=script_cache, tts_cache=tts_cache)
+    assert sorted(requests) == list(range(1, SLIDE_COUNT + 1))
+
+    requests.clear()
+    backend = RecordingBackend()
+    second = run(tmp_path, 'second', backend, script_cache=script_cache, tts_cache=tts_cache)
+
+    assert requests == []
+    assert backend.texts == []
+    assert second[0] == first[0]
+    assert [info['duration'] for info in second[1]['audio_files']] \
+        == [info['duration'] for info in first[1]['audio_files']]
+    for info in second[1]['audio_files']:
+        assert info['audio_file'].startswith(str(tmp_path / 'second'))
@@ -0,0 +1,117 @@
+"""subtitle_segments.py（字幕の改行・セグメント分割）のテスト"""
+
+import re
+
+import pytest
+
+import subtitle_segments
+from subtitle_segments import (
+    _layout_long_sentence,
+    iter_segments,
+    iter_sentences,
+    layout_sentence,
+    split_text_into_segments,
+)
+
+MAX_CHARS = 31
+MAX_LINES = 2
+
+# 改行の前後がどちらもひらがな（「生成し|たり」「と|いった」のような語の途中・助詞の続き）
+HIRAGANA_BREAK = re.compile('[ぁ-ゖ]\n[ぁ-ゖ]')
+
+
+def normalize(text):
+    """比較用に空白・改行・読点を除く（セグメントの前後の空白と末尾の読点は字幕では省かれる）"""
+    return re.sub('[\\s、，]', '', text)
+
+
+def test_sample_segments_fit_limits(sample_scripts):
+    """サンプル原稿の全セグメントが2行・1行31文字以内"""
+    for text in sample_scripts:
+        for segment in split_text_into_segments(text, MAX_CHARS, MAX_LINES):
+            lines = segment.split('\n')
+            assert len(lines) <= MAX_LINES, segment
+            assert all(0 < len(line) <= MAX_CHARS for line in lines), segment
+
+
+def test_sample_segments_keep_all_characters(sample_scripts):
+    """セグメントをつなぐと、空白と読点以外は原稿と同じ文字列に戻る"""
+    for text in sample_scripts:
+        segments = split_text_into_segments(text, MAX_CHARS, MAX_LINES)
+        assert normalize(''.join(segments)) == normalize(text)
+
+
+def test_sample_segments_do_not_break_inside_hiragana(sample_scripts):
+    """サンプル原稿ではひらがなの間で改行しない（読点・助詞の後の漢字・カタカナの前で改行する）"""
+    for text in sample_scripts:
+        for segment in split_text_into_segments(text, MAX_CHARS, MAX_LINES):
+            assert not HIRAGANA_BREAK.search(segment), segment
+
+
+@pytest.mark.parametrize('sentence, bad_break', [
+    ('具体的には、動画の内容を深く理解したり、まるで本物のような動画を生成したりする技術がどんどん高度化しています。',
+     '生成し\nたり'),
+    ('そして、これらの技術がARやVRといった没入感のある体験と統合されることで、'
+     '私たちの生活や仕事は大きく変わっていくのではないでしょうか。',
+     'と\nいった'),
+])
+def test_weak_particle_break_avoided(sentence, bad_break):
+    """助詞の後にひらがなが続く位置では、ほかに候補があれば改行しない"""
+    text = '\n\n'.join(layout_sentence(sentence, MAX_CHARS, MAX_LINES))
+    assert bad_break not in text
+    assert normalize(text) == normalize(sentence)
+
+
+def test_weak_breaks_can_be_disabled(monkeypatch):
+    """弱い助詞を区別しない場合も改行候補の位置は同じで、種類だけが通常の助詞になる"""
+    sentence = '具体的には、動画の内容を深く理解したり、まるで本物のような動画を生成したりする技術です。'
+    candidates = subtitle_segments.find_break_candidates(sentence)
+    monkeypatch.setattr(subtitle_segments, 'WEAK_BREAKS', False)
+    plain = subtitle_segments.find_break_candidates(sentence)
+
+    assert [pos for pos, _ in plain] == [pos for pos, _ in candidates]
+    assert 'weak' in {kind for _, kind in candidates}
+    assert {kind for _, kind in plain} == {'punct', 'particle'}
+
+
+def test_short_sentence_is_kept():
+    sentence = '今日はいい天気です。'
+    assert layout_sentence(sentence) == [sentence]
+
+
+def test_sentence_without_candidates_is_forced_within_limits():
+    """改行候補がない文も、強制改行で行の上限を守り文字を失わない"""
+    sentence = 'Ａ' * 100 + '。'
+    segments = layout_sentence(sentence, MAX_CHARS, MAX_LINES)
+    for segment in segments:
+        assert all(len(line) <= MAX_CHARS for line in segment.split('\n'))
+    assert normalize(''.join(segments)) == normalize(sentence)
+
+
+@pytest.mark.parametrize('weak_breaks', [True, False])
+def test_two_line_sentences_match_full_optimization(sample_scripts, monkeypatch, weak_breaks):
+    """2行に収まる文の改行位置の選び方は、全候補を使う動的計画法の最小コストの結果と同じ"""
+    monkeypatch.setattr(subtitle_segments, 'WEAK_BREAKS', weak_breaks)
+    sentences = {s.strip() for text in sample_scripts for s in re.split('(?<=[。！？\n])', text)}
+    checked = 0
+    for sentence in sentences:
+        if MAX_CHARS < len(sentence) <= MAX_CHARS * 2:
+            result = layout_sentence(sentence, MAX_CHARS, MAX_LINES)
+            if len(result) == 1:
+                assert result == _layout_long_sentence(sentence, MAX_CHARS, MAX_LINES)
+                checked += 1
+    assert checked > 0
+
+
+def test_chunked_input_matches_whole_text(sample_scripts):
+    """チャンクに分けて渡しても、文の途中で分かれても結果は同じ"""
+    text = '\n'.join(sample_scripts)
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+    assert list(iter_segments(chunks)) == split_text_into_segments(text)
+
+
+def test_sentences_span_chunks():
+    """チャンクをまたぐ文はつなげ、空の文は出さず、文末の文字がない最後の文も出す"""
+    chunks = ['はじめ', 'に。次', 'の文！\n', '\n', '', '　最後']
+    assert list(iter_sentences(chunks)) == ['はじめに。', '次の文！', '最後']
+    assert list(iter_sentences(''.join(chunks))) == ['はじめに。', '次の文！', '最後']
@@ -0,0 +1,121 @@
+"""tts_cache.py と generate_audio の音声キャッシュキーのテスト"""
+
+import os
+
+import generate_audio
+from generate_audio import generate_slide_audio, segment_cache_key, slide_cache_key
+from tts_backends import ToneBackend
+from tts_cache import TTSCache, place_file
+
+
+class CountingBackend(ToneBackend):
+    """合成した回数を数えるオフラインのエンジン"""
+
+    def __init__(self, name='tone'):
+        super().__init__()
+        self.name = name
+        self.calls = []
+
+    def synthesize(self, text):
+        self.calls.append(text)
+        return super().synthesize(text)
+
+
+def test_keys_change_with_text_voice_and_speed(monkeypatch):
+    backend = ToneBackend()
+    slide_key = slide_cache_key('こんにちは。', backend, 'wav')
+    segment_key = segment_cache_key('こんにちは。', backend)
+    assert slide_cache_key('こんにちは。', ToneBackend(), 'wav') == slide_key
+    assert segment_cache_key('こんにちは。', ToneBackend()) == segment_key
+    assert slide_key != segment_key
+
+    # テキスト
+    assert slide_cache_key('こんばんは。', backend, 'wav') != slide_key
+    assert segment_cache_key('こんばんは。', backend) != segment_key
+    # 声（エンジン・言語）
+    assert slide_cache_key('こんにちは。', CountingBackend('http:localhost'), 'wav') != slide_key
+    assert segment_cache_key('こんにちは。', CountingBackend('http:localhost')) != segment_key
+    # 速度変更の方式
+    assert slide_cache_key('こんにちは。', backend, 'wav', speed_mode='wsola') != slide_key
+    assert segment_cache_key('こんにちは。', backend, speed_mode='wsola') != segment_key
+    # 出力形式・後処理（指定しない場合は以前のキーのまま）
+    assert slide_cache_key('こんにちは。', backend, 'mp3') != slide_key
+    assert slide_cache_key('こんにちは。', backend, 'wav', trim_pad=0.1) != slide_key
+    assert slide_cache_key('こんにちは。', backend, 'wav', target_db=-20.0) != slide_key
+
+    monkeypatch.setattr(generate_audio, 'SPEED_FACTOR', 1.5)
+    assert slide_cache_key('こんにちは。', backend, 'wav') != slide_key
+    assert segment_cache_key('こんにちは。', backend) != segment_key
+    monkeypatch.setattr(generate_audio, 'TTS_LANG', 'en')
+    assert slide_cache_key('こんにちは。', backend, 'wav') != slide_key
+
+
+def test_slide_audio_is_synthesized_once(tmp_path):
+    """2回目はキャッシュから配置し、再合成しない"""
+    cache = TTSCache(tmp_path / 'cache')
+    backend = CountingBackend()
+    slide = {'index': 1, 'title': 'タイトル', 'script': 'こんにちは、世界。'}
+    for name in ('out1', 'out2', 'out3'):
+        (tmp_path / name).mkdir()
+
+    first = generate_slide_audio(slide, tmp_path / 'out1', None, cache, backend, audio_format='wav')
+    second = generate_slide_audio(slide, tmp_path / 'out2', None, cache, backend, audio_format='wav')
+
+    assert backend.calls == ['こんにちは、世界。']
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert first['duration'] == second['duration'] > 0
+    with open(first['audio_file'], 'rb') as f1, open(second['audio_file'], 'rb') as f2:
+        assert f1.read() == f2.read()
+
+    # 原稿が変われば合成し直す
+    generate_slide_audio({**slide, 'script': '別の原稿です。'}, tmp_path / 'out3', None, cache, backend,
+                         audio_format='wav')
+    assert len(backend.calls) == 2
+
+
+def test_read_after_write(tmp_path):
+    cache = TTSCache(tmp_path)
+    key = 'ab' * 32
+    assert cache.read(key) is None
+    cache.write(key, b'RIFF....')
+    assert cache.read(key) == b'RIFF....'
+    assert cache.path_for(key).name == f"{key}.wav"
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert not list(tmp_path.glob('*/*.tmp'))
+
+
+def test_overwriting_placed_file_keeps_cache_intact(tmp_path):
+    """キャッシュからハードリンクした出力を置き換えても、キャッシュの中身は変わらない"""
+    cache = TTSCache(tmp_path / 'cache')
+    source = tmp_path / 'source.wav'
+    source.write_bytes(b'cached audio')
+    cache.store('cd' * 32, source)
+
+    output = tmp_path / 'out' / 'slide_01.wav'
+    output.parent.mkdir()
+    assert cache.fetch('cd' * 32, output)
+    place_file(source, output)  # 同じファイルへの配置は何もしない
+
+    replacement = tmp_path / 'new.wav'
+    replacement.write_bytes(b'new audio')
+    place_file(replacement, output)
+    assert output.read_bytes() == b'new audio'
+    assert cache.path_for('cd' * 32, '.wav').read_bytes() == b'cached audio'
+
+
+def test_evict_removes_least_recently_used_down_to_limit(tmp_path):
+    cache = TTSCache(tmp_path, max_bytes=250)
+    keys = [f"{i:02x}" * 32 for i in range(5)]
+    for i, key in enumerate(keys):
+        cache.write(key, bytes(100))
+        os.utime(cache.path_for(key), ns=((i + 1) * 10 ** 9, (i + 1) * 10 ** 9))
+    # 書き込み途中の一時ファイルは数えない・消さない
+    temp_file = cache.path_for(keys[0]).with_name('partial.wav.1.2.tmp')
+    temp_file.write_bytes(bytes(1000))
+
+    # 読み出すと最後に使われた時刻が新しくなる
+    assert cache.read(keys[1]) is not None
+    assert cache.evict() == 3
+    assert [cache.path_for(key).exists() for key in keys] == [False, True, False, False, True]
+    assert temp_file.exists()
+    assert cache.evict() == 0